@@ -5,9 +5,11 @@ import urllib.parse
 from collections import Counter
 from pathlib import Path
 
+from output_writer import open_input
+
 def analyze_path_structure(urls_file, output_dir):
     """Analyze URL path structure to identify common patterns."""
-    with open(urls_file, 'r', encoding='utf-8') as f:
+    with open_input(urls_file) as f:
         urls = [line.strip() for line in f if line.strip()]
     
     print(f"Analyzing path structure of {len(urls)} URLs...")
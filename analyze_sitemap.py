@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import xml.etree.ElementTree as ET
 from lxml import etree
-from bs4 import BeautifulSoup
 import requests
 import argparse
 from urllib.parse import urlparse
@@ -10,8 +9,18 @@ import sys
 from pathlib import Path
 import json
 from collections import Counter
+import hashlib
+import heapq
+import math
 import os
 
+from sitemap_ingest import (
+    add_local_source_arguments, child_sitemap_filename, fetch_child_sitemap, resolver_from_args
+)
+from output_writer import write_lines
+from url_classifier import URLClassifier
+from sitemap_scanner import recover_sitemap_locs
+
 # Predefined blacklist patterns
 DEFAULT_BLACKLIST = [
     # Game-specific markers in titles
@@ -42,27 +51,20 @@ def parse_sitemap_index(file_path):
         for sitemap in root.xpath('.//sm:sitemap/sm:loc', namespaces=ns):
             sitemap_urls.append(sitemap.text)
             
-        # If no URLs found, try alternative approach with BeautifulSoup
+        # If no URLs found, try the recovery parser
         if not sitemap_urls:
-            return parse_sitemap_index_bs4(file_path)
+            return parse_sitemap_index_recover(file_path)
             
         return sitemap_urls
     except Exception as e:
         print(f"Error parsing with lxml: {e}")
-        # Fallback to BeautifulSoup
-        return parse_sitemap_index_bs4(file_path)
-        
-def parse_sitemap_index_bs4(file_path):
-    """Parse sitemap index using BeautifulSoup as fallback."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'xml')
-    sitemap_urls = []
-    
-    for loc in soup.find_all('loc'):
-        sitemap_urls.append(loc.text)
+        # Fall back to the recovery parser
+        return parse_sitemap_index_recover(file_path)
         
+def parse_sitemap_index_recover(file_path):
+    """Parse a malformed sitemap index with the streaming recovery parser."""
+    sitemap_urls, skipped = recover_sitemap_locs(file_path)
+    print(f"Recovered {len(sitemap_urls)} sitemaps from {file_path} (skipped {skipped} bytes)")
     return sitemap_urls
 
 def download_sitemap(url, output_dir):
@@ -72,13 +74,7 @@ def download_sitemap(url, output_dir):
         print(f"Failed to download {url}")
         return None
     
-    # Create a filename based on the URL
-    parsed_url = urlparse(url)
-    filename = Path(parsed_url.path).name
-    if not filename:
-        filename = f"sitemap-{hash(url)}.xml"
-    
-    output_path = Path(output_dir) / filename
+    output_path = Path(output_dir) / child_sitemap_filename(url)
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(response.text)
     
@@ -109,87 +105,204 @@ def parse_urls_from_sitemap(file_path):
         for url_element in loc_elements:
             urls.append(url_element.text)
         
-        # If still no URLs found, try with BeautifulSoup
+        # If still no URLs found, try the recovery parser
         if not urls:
-            return parse_urls_from_sitemap_bs4(file_path)
+            return parse_urls_from_sitemap_recover(file_path)
         
         return urls
     except Exception as e:
         print(f"Error parsing {file_path} with lxml: {e}")
-        return parse_urls_from_sitemap_bs4(file_path)
+        return parse_urls_from_sitemap_recover(file_path)
 
-def parse_urls_from_sitemap_bs4(file_path):
-    """Parse URLs from sitemap using BeautifulSoup as fallback."""
+def parse_urls_from_sitemap_recover(file_path):
+    """Parse URLs from a malformed sitemap with the streaming recovery parser."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'xml')
-        urls = []
-        
-        # Try to find all loc elements (could be under url or directly)
-        for loc in soup.find_all('loc'):
-            # Check if this is part of a sitemap index
-            if loc.parent.name != 'sitemap':
-                urls.append(loc.text)
-        
+        urls, skipped = recover_sitemap_locs(file_path, include_sitemap_locs=False)
+        print(f"  Recovered {len(urls)} URLs from {file_path} (skipped {skipped} bytes)")
         return urls
     except Exception as e:
-        print(f"Error parsing {file_path} with BeautifulSoup: {e}")
+        print(f"Error recovering URLs from {file_path}: {e}")
         return []
 
 def filter_urls(urls, blacklist_patterns):
     """Filter URLs based on blacklist patterns."""
-    filtered_urls = []
-    blacklisted_urls = []
-    
-    compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist_patterns]
-    
-    for url in urls:
-        is_blacklisted = any(pattern.search(url) for pattern in compiled_patterns)
-        if is_blacklisted:
-            blacklisted_urls.append(url)
-        else:
-            filtered_urls.append(url)
-    
-    return filtered_urls, blacklisted_urls
+    return URLClassifier(blacklist_patterns).split(urls)
+
+class SpaceSavingCounter:
+    """Approximate top-k counter (Space-Saving) holding at most `capacity` keys.
+
+    Every reported count overestimates the true count by at most
+    total / capacity.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        self._heap = []  # (count, key) entries, possibly stale
+
+    def add(self, key, count=1):
+        self.total += count
+        if key in self.counts:
+            self.counts[key] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (count, key))
+            return
+
+        # Evict the key with the smallest count; stale heap entries are
+        # refreshed lazily
+        while True:
+            min_count, min_key = heapq.heappop(self._heap)
+            current = self.counts[min_key]
+            if current == min_count:
+                break
+            heapq.heappush(self._heap, (current, min_key))
+        del self.counts[min_key]
+        del self.errors[min_key]
+        self.counts[key] = min_count + count
+        self.errors[key] = min_count
+        heapq.heappush(self._heap, (min_count + count, key))
+
+    def most_common(self, n=None):
+        items = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)
+        return items if n is None else items[:n]
 
-def analyze_urls(urls, top_n=20):
-    """Analyze URLs to find common patterns."""
+    @property
+    def error_bound(self):
+        return self.total / self.capacity if self.capacity else 0
+
+class CountMinSketch:
+    """Count-Min sketch: overestimates by at most error * total with probability 1 - delta.
+
+    Each row hashes keys with its own salted blake2b, so the rows are
+    independent (as the bound requires) and estimates do not depend on the
+    per-process salt of hash().
+    """
+
+    def __init__(self, error=0.001, delta=0.01):
+        if not 0 < error < 1 or not 0 < delta < 1:
+            raise ValueError("error and delta must be between 0 and 1")
+        self.error = error
+        self.delta = delta
+        self.width = math.ceil(math.e / error)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.total = 0
+        self.tables = [[0] * self.width for _ in range(self.depth)]
+        self._salts = [row.to_bytes(16, 'little') for row in range(self.depth)]
+
+    def _indexes(self, key):
+        data = key.encode('utf-8') if isinstance(key, str) else key
+        return [int.from_bytes(hashlib.blake2b(data, digest_size=8, salt=salt).digest(), 'little') % self.width
+                for salt in self._salts]
+
+    def add(self, key, count=1):
+        self.total += count
+        for table, index in zip(self.tables, self._indexes(key)):
+            table[index] += count
+
+    def estimate(self, key):
+        return min(table[index] for table, index in zip(self.tables, self._indexes(key)))
+
+class HeavyHitters:
+    """Space-Saving candidates refined with Count-Min estimates, in bounded memory."""
+
+    def __init__(self, capacity=1000, error=0.001, delta=0.01):
+        self.candidates = SpaceSavingCounter(capacity)
+        self.sketch = CountMinSketch(error, delta)
+
+    def add(self, key):
+        self.candidates.add(key)
+        self.sketch.add(key)
+
+    def most_common(self, n=None):
+        # Both structures only overestimate, so the smaller value is the tighter bound
+        items = [(key, min(count, self.sketch.estimate(key)))
+                 for key, count in self.candidates.counts.items()]
+        items.sort(key=lambda x: x[1], reverse=True)
+        return items if n is None else items[:n]
+
+    def summary(self):
+        return {
+            "total": self.candidates.total,
+            "tracked_keys": len(self.candidates.counts),
+            "capacity": self.candidates.capacity,
+            "space_saving_error_bound": self.candidates.error_bound,
+            "count_min_error_bound": self.sketch.error * self.sketch.total,
+            "count_min_confidence": 1 - self.sketch.delta,
+        }
+
+def analyze_urls(urls, top_n=20, streaming=False, sketch_capacity=1000, sketch_error=0.001):
+    """Analyze URLs to find common patterns.
+
+    With streaming=True, domains, path components, path prefixes and file
+    extensions are tracked with bounded-memory heavy-hitter sketches and only
+    the top_n of each is reported.
+    """
+    if streaming:
+        domains = HeavyHitters(sketch_capacity, sketch_error)
+        path_components = HeavyHitters(sketch_capacity, sketch_error)
+        file_extensions = HeavyHitters(sketch_capacity, sketch_error)
+        path_prefixes = HeavyHitters(sketch_capacity, sketch_error)
+    else:
+        domains = Counter()
+        path_components = Counter()
+        file_extensions = Counter()
+        path_prefixes = Counter()
+    
     analysis = {
-        "total_urls": len(urls),
-        "domains": Counter(),
-        "path_components": Counter(),
-        "file_extensions": Counter(),
-        "common_path_prefixes": Counter(),
+        "total_urls": 0,
+        "domains": domains,
+        "path_components": path_components,
+        "file_extensions": file_extensions,
+        "common_path_prefixes": path_prefixes,
         "common_patterns": [],
     }
     
     # Analyze each URL
     for url in urls:
+        analysis["total_urls"] += 1
+        
         # Parse URL
         parsed = urlparse(url)
         
         # Count domains
-        analysis["domains"][parsed.netloc] += 1
+        if streaming:
+            domains.add(parsed.netloc)
+        else:
+            domains[parsed.netloc] += 1
         
         # Count path components
         path_parts = [p for p in parsed.path.split('/') if p]
-        for part in path_parts:
-            analysis["path_components"][part] += 1
+        if streaming:
+            for part in path_parts:
+                path_components.add(part)
+        else:
+            path_components.update(path_parts)
         
         # Count file extensions
         if '.' in path_parts[-1] if path_parts else '':
             ext = path_parts[-1].split('.')[-1]
-            analysis["file_extensions"][ext] += 1
+            if streaming:
+                file_extensions.add(ext)
+            else:
+                file_extensions[ext] += 1
         
         # Count common path prefixes (first 1-3 components)
         for i in range(1, min(4, len(path_parts) + 1)):
             prefix = '/'.join(path_parts[:i])
-            analysis["common_path_prefixes"][prefix] += 1
+            if streaming:
+                path_prefixes.add(prefix)
+            else:
+                path_prefixes[prefix] += 1
     
     # Find potential patterns for filtering
-    for component, count in analysis["path_components"].most_common(top_n):
+    for component, count in path_components.most_common(top_n):
         if count > 10 and any(c.isalpha() for c in component):
             # Check if this is a game-specific component that appears in multiple URLs
             if any(game_name.lower() in component.lower() for game_name in 
@@ -198,9 +311,16 @@ def analyze_urls(urls, top_n=20):
                 analysis["common_patterns"].append({
                     "pattern": pattern,
                     "count": count,
-                    "percent": count / len(urls) * 100
+                    "percent": count / analysis["total_urls"] * 100
                 })
     
+    if streaming:
+        # Only the heavy hitters are kept in the report
+        statistics = ("domains", "path_components", "file_extensions", "common_path_prefixes")
+        analysis["sketch"] = {name: analysis[name].summary() for name in statistics}
+        for name in statistics:
+            analysis[name] = dict(analysis[name].most_common(top_n))
+    
     return analysis
 
 def main():
@@ -218,7 +338,20 @@ def main():
                         help='Do not use the default blacklist patterns')
     parser.add_argument('--search-term', type=str, default=None,
                         help='Search for URLs containing this term and show examples')
+    parser.add_argument('--top-n', type=int, default=20,
+                        help='Number of top path components and prefixes to report')
+    parser.add_argument('--streaming-stats', action='store_true',
+                        help='Use bounded-memory heavy-hitter sketches for path statistics')
+    parser.add_argument('--sketch-counters', type=int, default=1000,
+                        help='Memory budget: keys tracked per statistic in streaming mode')
+    parser.add_argument('--sketch-error', type=float, default=0.001,
+                        help='Count-Min error bound as a fraction of total count in streaming mode')
+    add_local_source_arguments(parser)
     args = parser.parse_args()
+    if args.sketch_counters < 1:
+        parser.error('--sketch-counters must be at least 1')
+    if not 0 < args.sketch_error < 1:
+        parser.error('--sketch-error must be between 0 and 1 (exclusive)')
 
     # Set up blacklist patterns
     blacklist_patterns = []
@@ -246,11 +379,16 @@ def main():
     sitemap_urls = parse_sitemap_index(args.sitemap_index)
     print(f"Found {len(sitemap_urls)} sitemaps in the index")
     
+    resolver = resolver_from_args(args)
+    if resolver:
+        sitemap_urls = resolver.children(sitemap_urls)
+        print(f"Reading {len(sitemap_urls)} child sitemaps from local files")
+    
     # Download and parse all sitemaps
     all_urls = []
     for i, sitemap_url in enumerate(sitemap_urls):
         print(f"Downloading sitemap [{i+1}/{len(sitemap_urls)}]: {sitemap_url}")
-        sitemap_file = download_sitemap(sitemap_url, output_dir)
+        sitemap_file = fetch_child_sitemap(sitemap_url, output_dir, download_sitemap, resolver)
         if sitemap_file:
             urls = parse_urls_from_sitemap(sitemap_file)
             print(f"  Found {len(urls)} URLs in sitemap")
@@ -260,9 +398,7 @@ def main():
     
     # Write out all URLs for reference
     all_urls_file = output_dir / "all_urls.txt"
-    with open(all_urls_file, 'w', encoding='utf-8') as f:
-        for url in all_urls:
-            f.write(f"{url}\n")
+    write_lines(all_urls_file, all_urls)
     
     # Search for specific term if requested
     if args.search_term:
@@ -276,14 +412,13 @@ def main():
                 print(f"  {i+1}. {url}")
             
             search_results_file = output_dir / f"search_results_{args.search_term}.txt"
-            with open(search_results_file, 'w', encoding='utf-8') as f:
-                for url in matching_urls:
-                    f.write(f"{url}\n")
+            write_lines(search_results_file, matching_urls)
             print(f"\nSaved search results to: {search_results_file}")
     
     # Analyze URL patterns
     print("\nAnalyzing URL patterns...")
-    analysis = analyze_urls(all_urls)
+    analysis = analyze_urls(all_urls, top_n=args.top_n, streaming=args.streaming_stats,
+                            sketch_capacity=args.sketch_counters, sketch_error=args.sketch_error)
     
     # Save analysis
     analysis_file = output_dir / "url_analysis.json"
@@ -296,7 +431,7 @@ def main():
     print(f"  Domains: {len(analysis['domains'])}")
     
     print("\nTop path components (might indicate content categories):")
-    for component, count in list(analysis["path_components"].items())[:20]:
+    for component, count in list(analysis["path_components"].items())[:args.top_n]:
         if count > 100:  # Only show components that appear frequently
             print(f"  {component}: {count} ({count/analysis['total_urls']*100:.2f}%)")
     
@@ -314,19 +449,13 @@ def main():
     
     # Save results
     output_file = output_dir / "filtered_urls.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for url in filtered_urls:
-            f.write(f"{url}\n")
+    write_lines(output_file, filtered_urls)
     
     blacklist_output = output_dir / "blacklisted_urls.txt"
-    with open(blacklist_output, 'w', encoding='utf-8') as f:
-        for url in blacklisted_urls:
-            f.write(f"{url}\n")
+    write_lines(blacklist_output, blacklisted_urls)
     
     patterns_output = output_dir / "blacklist_patterns.txt"
-    with open(patterns_output, 'w', encoding='utf-8') as f:
-        for pattern in blacklist_patterns:
-            f.write(f"{pattern}\n")
+    write_lines(patterns_output, blacklist_patterns)
     
     print(f"\nFiltering Results:")
     print(f"  Total URLs: {len(all_urls)}")
@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 import xml.etree.ElementTree as ET
 from lxml import etree
-from bs4 import BeautifulSoup
 import requests
 import argparse
-from urllib.parse import urlparse
-import re
 import sys
 from pathlib import Path
 import json
 from collections import Counter
 import os
 
+from sitemap_ingest import (
+    add_local_source_arguments, child_sitemap_filename, fetch_child_sitemap, resolver_from_args
+)
+from output_writer import write_lines
+from corpus_index import CorpusIndex, coverage_counts, open_corpus_index
+from pattern_cache import load_compiled_patterns
+from sitemap_scanner import recover_sitemap_locs
+from url_fields import FieldRuleSet
+
 def parse_sitemap_index(file_path):
     """Parse the sitemap index XML file and return all sitemap URLs."""
     try:
@@ -27,24 +33,17 @@ def parse_sitemap_index(file_path):
             sitemap_urls.append(sitemap.text)
             
         if not sitemap_urls:
-            return parse_sitemap_index_bs4(file_path)
+            return parse_sitemap_index_recover(file_path)
             
         return sitemap_urls
     except Exception as e:
         print(f"Error parsing with lxml: {e}")
-        return parse_sitemap_index_bs4(file_path)
-        
-def parse_sitemap_index_bs4(file_path):
-    """Parse sitemap index using BeautifulSoup as fallback."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'xml')
-    sitemap_urls = []
-    
-    for loc in soup.find_all('loc'):
-        sitemap_urls.append(loc.text)
+        return parse_sitemap_index_recover(file_path)
         
+def parse_sitemap_index_recover(file_path):
+    """Parse a malformed sitemap index with the streaming recovery parser."""
+    sitemap_urls, skipped = recover_sitemap_locs(file_path)
+    print(f"Recovered {len(sitemap_urls)} sitemaps from {file_path} (skipped {skipped} bytes)")
     return sitemap_urls
 
 def download_sitemap(url, output_dir):
@@ -55,13 +54,7 @@ def download_sitemap(url, output_dir):
             print(f"Failed to download {url}: Status code {response.status_code}")
             return None
         
-        # Create a filename based on the URL
-        parsed_url = urlparse(url)
-        filename = Path(parsed_url.path).name
-        if not filename:
-            filename = f"sitemap-{hash(url)}.xml"
-        
-        output_path = Path(output_dir) / filename
+        output_path = Path(output_dir) / child_sitemap_filename(url)
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(response.text)
         
@@ -93,29 +86,21 @@ def parse_urls_from_sitemap(file_path):
             urls.append(url_element.text)
         
         if not urls:
-            return parse_urls_from_sitemap_bs4(file_path)
+            return parse_urls_from_sitemap_recover(file_path)
         
         return urls
     except Exception as e:
         print(f"Error parsing {file_path} with lxml: {e}")
-        return parse_urls_from_sitemap_bs4(file_path)
+        return parse_urls_from_sitemap_recover(file_path)
 
-def parse_urls_from_sitemap_bs4(file_path):
-    """Parse URLs from sitemap using BeautifulSoup as fallback."""
+def parse_urls_from_sitemap_recover(file_path):
+    """Parse URLs from a malformed sitemap with the streaming recovery parser."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'xml')
-        urls = []
-        
-        for loc in soup.find_all('loc'):
-            if loc.parent.name != 'sitemap':
-                urls.append(loc.text)
-        
+        urls, skipped = recover_sitemap_locs(file_path, include_sitemap_locs=False)
+        print(f"  Recovered {len(urls)} URLs from {file_path} (skipped {skipped} bytes)")
         return urls
     except Exception as e:
-        print(f"Error parsing {file_path} with BeautifulSoup: {e}")
+        print(f"Error recovering URLs from {file_path}: {e}")
         return []
 
 def read_pattern_file(file_path):
@@ -132,23 +117,24 @@ def read_pattern_file(file_path):
         print(f"Error reading pattern file {file_path}: {e}")
         return []
 
-def analyze_patterns(urls, whitelist_patterns, blacklist_patterns=None):
+def analyze_patterns(urls, whitelist_patterns, blacklist_patterns=None, index=None):
     """Analyze how patterns match URLs."""
-    compiled_whitelist = [re.compile(pattern, re.IGNORECASE) for pattern in whitelist_patterns]
-    
-    if blacklist_patterns:
-        compiled_blacklist = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist_patterns]
-    else:
-        compiled_blacklist = []
+    pattern_sets = {'whitelist': whitelist_patterns, 'blacklist': blacklist_patterns}
+    compiled = load_compiled_patterns(pattern_sets)
+    folded = load_compiled_patterns(pattern_sets, fold=True)
+    whitelist_rules = FieldRuleSet(whitelist_patterns, compiled['whitelist'], folded['whitelist'])
+    blacklist_rules = FieldRuleSet(blacklist_patterns or [], compiled['blacklist'], folded['blacklist'])
     
-    # Match counts
-    whitelist_matches = {}
-    for pattern in whitelist_patterns:
-        whitelist_matches[pattern] = 0
+    # Match counts (prefix and exact-page patterns are range queries on the index)
+    if index is None:
+        index = CorpusIndex.build(urls)
+    whitelist_matches = coverage_counts(whitelist_patterns, urls, index)
+    blacklist_matches = coverage_counts(blacklist_patterns or [], urls, index)
     
-    blacklist_matches = {}
-    for pattern in blacklist_patterns or []:
-        blacklist_matches[pattern] = 0
+    # A pattern listed more than once is counted once per entry
+    for matches, patterns in ((whitelist_matches, whitelist_patterns), (blacklist_matches, blacklist_patterns or [])):
+        for pattern, entries in Counter(patterns).items():
+            matches[pattern] *= entries
     
     # URL categorization
     whitelist_only = []
@@ -157,18 +143,8 @@ def analyze_patterns(urls, whitelist_patterns, blacklist_patterns=None):
     neither_match = []
     
     for url in urls:
-        w_match = any(re.search(pattern, url, re.IGNORECASE) for pattern in whitelist_patterns)
-        b_match = blacklist_patterns and any(re.search(pattern, url, re.IGNORECASE) for pattern in blacklist_patterns)
-        
-        # Count individual pattern matches
-        for i, pattern in enumerate(whitelist_patterns):
-            if re.search(pattern, url, re.IGNORECASE):
-                whitelist_matches[pattern] += 1
-        
-        if blacklist_patterns:
-            for i, pattern in enumerate(blacklist_patterns):
-                if re.search(pattern, url, re.IGNORECASE):
-                    blacklist_matches[pattern] += 1
+        w_match = whitelist_rules.first_match(url) >= 0
+        b_match = blacklist_patterns and blacklist_rules.first_match(url) >= 0
         
         # Categorize URL
         if w_match and not b_match:
@@ -198,6 +174,7 @@ def main():
                         help='File containing whitelist patterns (one per line)')
     parser.add_argument('--blacklist-file', '-b', default=None,
                         help='File containing blacklist patterns (one per line)')
+    add_local_source_arguments(parser)
     args = parser.parse_args()
 
     # Create output directory
@@ -218,11 +195,16 @@ def main():
     sitemap_urls = parse_sitemap_index(args.sitemap_index)
     print(f"Found {len(sitemap_urls)} sitemaps in the index")
     
+    resolver = resolver_from_args(args)
+    if resolver:
+        sitemap_urls = resolver.children(sitemap_urls)
+        print(f"Reading {len(sitemap_urls)} child sitemaps from local files")
+    
     # Download and parse all sitemaps
     all_urls = []
     for i, sitemap_url in enumerate(sitemap_urls):
         print(f"Processing sitemap [{i+1}/{len(sitemap_urls)}]: {sitemap_url}")
-        sitemap_file = download_sitemap(sitemap_url, output_dir)
+        sitemap_file = fetch_child_sitemap(sitemap_url, output_dir, download_sitemap, resolver)
         if sitemap_file:
             urls = parse_urls_from_sitemap(sitemap_file)
             print(f"  Found {len(urls)} URLs in sitemap")
@@ -230,8 +212,10 @@ def main():
     
     print(f"\nTotal URLs found: {len(all_urls)}")
     
-    # Analyze pattern matching
-    analysis = analyze_patterns(all_urls, whitelist_patterns, blacklist_patterns)
+    # Analyze pattern matching against a sorted index of the corpus
+    index_file = CorpusIndex.write(all_urls, output_dir / "corpus_index.bin")
+    with open_corpus_index(index_file) as index:
+        analysis = analyze_patterns(all_urls, whitelist_patterns, blacklist_patterns, index)
     
     # Print summary
     print("\nPattern Matching Summary:")
@@ -242,38 +226,27 @@ def main():
     print(f"  URLs matching neither: {len(analysis['neither_match'])} ({len(analysis['neither_match'])/len(all_urls)*100:.2f}%)")
     
     # Save results
-    with open(output_dir / "whitelist_only.txt", 'w', encoding='utf-8') as f:
-        for url in analysis['whitelist_only']:
-            f.write(f"{url}\n")
+    write_lines(output_dir / "whitelist_only.txt", analysis['whitelist_only'])
     
     if blacklist_patterns:
-        with open(output_dir / "blacklist_only.txt", 'w', encoding='utf-8') as f:
-            for url in analysis['blacklist_only']:
-                f.write(f"{url}\n")
-        
-        with open(output_dir / "both_match.txt", 'w', encoding='utf-8') as f:
-            for url in analysis['both_match']:
-                f.write(f"{url}\n")
+        write_lines(output_dir / "blacklist_only.txt", analysis['blacklist_only'])
+        write_lines(output_dir / "both_match.txt", analysis['both_match'])
     
-    with open(output_dir / "neither_match.txt", 'w', encoding='utf-8') as f:
-        for url in analysis['neither_match']:
-            f.write(f"{url}\n")
+    write_lines(output_dir / "neither_match.txt", analysis['neither_match'])
     
     # Save pattern match counts
     whitelist_counts = [(pattern, count) for pattern, count in analysis['whitelist_matches'].items()]
     whitelist_counts.sort(key=lambda x: x[1], reverse=True)
     
-    with open(output_dir / "whitelist_pattern_counts.txt", 'w', encoding='utf-8') as f:
-        for pattern, count in whitelist_counts:
-            f.write(f"{pattern}: {count} matches\n")
+    write_lines(output_dir / "whitelist_pattern_counts.txt",
+                (f"{pattern}: {count} matches" for pattern, count in whitelist_counts))
     
     if blacklist_patterns:
         blacklist_counts = [(pattern, count) for pattern, count in analysis['blacklist_matches'].items()]
         blacklist_counts.sort(key=lambda x: x[1], reverse=True)
         
-        with open(output_dir / "blacklist_pattern_counts.txt", 'w', encoding='utf-8') as f:
-            for pattern, count in blacklist_counts:
-                f.write(f"{pattern}: {count} matches\n")
+        write_lines(output_dir / "blacklist_pattern_counts.txt",
+                    (f"{pattern}: {count} matches" for pattern, count in blacklist_counts))
     
     # Print top matching patterns
     print("\nTop 10 whitelist patterns by match count:")
@@ -0,0 +1,177 @@
+"""Asyncio variant of the final_filter.py pipeline.
+
+Child sitemaps are downloaded concurrently, parsed and classified in a
+process pool, and written out in sitemap order. The stages are connected by
+bounded queues and downloads stay within queue_size sitemaps of the last
+one written, so a slow stage applies back-pressure to the ones before it
+while network waits, parsing and disk writes overlap.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from final_filter import parse_sitemap_index, parse_urls_from_sitemap
+from pattern_cache import DEFAULT_CACHE_DIR
+from sitemap_ingest import child_sitemap_filename, decode_url_batch, encode_url_batch
+from url_classifier import URLClassifier
+
+def _parse_and_classify(parse_func, file_path, blacklist_patterns, whitelist_patterns, cache_dir, backend):
+    """Worker: parse one sitemap and classify its URLs.
+
+    Returns the URLs as a compact batch and one keep flag byte per URL, so
+    the writer can still drop duplicates before splitting them.
+    """
+    urls = [url for url in parse_func(file_path) if url is not None]
+    classifier = URLClassifier(blacklist_patterns, whitelist_patterns, cache_dir, backend, urls)
+    return encode_url_batch(urls), bytes(keep for keep, _ in classifier.classify_batch(urls))
+
+async def _fetch_bytes(session, url, timeout):
+    """Fetch a URL body with aiohttp when available, otherwise requests in a thread."""
+    if session is not None:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                print(f"Failed to download {url}: Status code {response.status}")
+                return None
+            return await response.read()
+
+    response = await asyncio.to_thread(requests.get, url, timeout=timeout)
+    if response.status_code != 200:
+        print(f"Failed to download {url}: Status code {response.status_code}")
+        return None
+    return response.content
+
+async def run_async_pipeline(sitemap_index, output_dir, blacklist_patterns, whitelist_patterns=None,
+                             concurrency=8, parse_workers=None, fast_scan=False, resolver=None,
+                             queue_size=16, timeout=10, cache_dir=DEFAULT_CACHE_DIR, backend='re',
+                             deduplicator=None):
+    """Fetch, parse, classify and write all sitemaps of an index concurrently.
+
+    Writes all_urls.txt, filtered_urls.txt and blacklisted_urls.txt to
+    output_dir and returns a dict of counts. backend is the matching backend
+    (see regex_backends.py); with a deduplicator (see
+    sitemap_ingest.make_deduplicator) URLs already written are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+
+    sitemap_urls = await loop.run_in_executor(None, parse_sitemap_index, str(sitemap_index))
+    if resolver:
+        sitemap_urls = resolver.children(sitemap_urls)
+    print(f"Found {len(sitemap_urls)} sitemaps in the index")
+
+    parse_func = partial(parse_urls_from_sitemap, fast_scan=fast_scan)
+    parse_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    parser_count = parse_workers or 4
+    stats = {"sitemaps": len(sitemap_urls), "failed": 0, "total": 0, "filtered": 0, "blacklisted": 0,
+             "duplicates": 0}
+    # Sitemaps before next_index are written; only queue_size sitemaps past
+    # it may be in flight, which bounds the writer's reorder buffer
+    next_index = 0
+    window = asyncio.Condition()
+
+    async def fetch(session, index, url, limit):
+        async with window:
+            await window.wait_for(lambda: index < next_index + queue_size)
+        async with limit:
+            if resolver:
+                sitemap_file = resolver.resolve(url)
+                if sitemap_file is None:
+                    print(f"  No local file found for {url}")
+            else:
+                try:
+                    body = await _fetch_bytes(session, url, timeout)
+                except Exception as e:
+                    print(f"Error downloading {url}: {e}")
+                    body = None
+                sitemap_file = None
+                if body is not None:
+                    sitemap_file = output_dir / child_sitemap_filename(url)
+                    await asyncio.to_thread(sitemap_file.write_bytes, body)
+        # Blocks while the parsers are behind
+        await parse_queue.put((index, url, sitemap_file))
+
+    async def download_all():
+        limit = asyncio.Semaphore(concurrency)
+        if aiohttp is not None and not resolver:
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(*(fetch(session, i, url, limit) for i, url in enumerate(sitemap_urls)))
+        else:
+            await asyncio.gather(*(fetch(None, i, url, limit) for i, url in enumerate(sitemap_urls)))
+        for _ in range(parser_count):
+            await parse_queue.put(None)
+
+    async def parse_and_classify(pool):
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                await write_queue.put(None)
+                return
+            index, url, sitemap_file = item
+            batches = None
+            if sitemap_file is not None:
+                batches = await loop.run_in_executor(
+                    pool, _parse_and_classify, parse_func, sitemap_file,
+                    blacklist_patterns, whitelist_patterns, cache_dir, backend)
+            await write_queue.put((index, url, batches))
+
+    async def write_all():
+        nonlocal next_index
+        files = [open(output_dir / name, 'w', encoding='utf-8')
+                 for name in ("all_urls.txt", "filtered_urls.txt", "blacklisted_urls.txt")]
+        try:
+            pending = {}
+            finished = 0
+            while finished < parser_count:
+                item = await write_queue.get()
+                if item is None:
+                    finished += 1
+                    continue
+                pending[item[0]] = item
+                # Write in sitemap order as soon as the next batch is available
+                while next_index in pending:
+                    _, url, batches = pending.pop(next_index)
+                    next_index += 1
+                    if batches is None:
+                        stats["failed"] += 1
+                        continue
+                    urls, keep_flags = batches
+                    decisions = list(zip(decode_url_batch(urls), keep_flags))
+                    if deduplicator is not None:
+                        # Sitemaps arrive here in order, so the first occurrence is kept
+                        count = len(decisions)
+                        decisions = [decision for decision in decisions if deduplicator.add(decision[0])]
+                        stats["duplicates"] += count - len(decisions)
+                    lists = [[page for page, _ in decisions],
+                             [page for page, keep in decisions if keep],
+                             [page for page, keep in decisions if not keep]]
+                    print(f"  {url}: {len(lists[0])} URLs, {len(lists[1])} kept, {len(lists[2])} blacklisted")
+                    for f, urls in zip(files, lists):
+                        if urls:
+                            await asyncio.to_thread(f.write, '\n'.join(urls) + '\n')
+                    stats["total"] += len(lists[0])
+                    stats["filtered"] += len(lists[1])
+                    stats["blacklisted"] += len(lists[2])
+                async with window:
+                    window.notify_all()
+        finally:
+            for f in files:
+                f.close()
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        await asyncio.gather(
+            download_all(),
+            *(parse_and_classify(pool) for _ in range(parser_count)),
+            write_all(),
+        )
+
+    return stats
@@ -0,0 +1,112 @@
+"""Case-sensitive equivalents of re.IGNORECASE patterns for pre-folded ASCII text.
+
+An ASCII URL lowered once with str.lower() contains no A-Z. On that
+alphabet a pattern compiled with re.IGNORECASE matches exactly where its
+folded form, compiled without IGNORECASE, does:
+
+- every character node (literal, negated literal, character class) is
+  replaced by the explicit set of folded characters it accepts, found by
+  running the original node under IGNORECASE against each of them;
+- anchors, ".", repeats, groups and alternations do not depend on case
+  and are folded recursively;
+- backreferences compare captured text, which is already folded.
+
+Patterns that change flags inline, e.g. (?-i:...), or use LOCALE are not
+folded and keep matching case-insensitively on the original URL.
+"""
+import re
+import sys
+
+import _sre
+
+try:
+    from re import _compiler as sre_compiler, _constants as sre_constants, _parser as sre_parser
+except ImportError:
+    import sre_compile as sre_compiler
+    import sre_constants
+    import sre_parse as sre_parser
+
+FOLDED_ALPHABET = [chr(c) for c in range(128) if not 'A' <= chr(c) <= 'Z']
+
+_CHAR_NODES = (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN)
+_REPEATS = tuple(getattr(sre_constants, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                 if hasattr(sre_constants, name))
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+_CASELESS_LEAVES = (sre_constants.ANY, sre_constants.AT, sre_constants.GROUPREF)
+
+class NotFoldable(Exception):
+    pass
+
+def _accepted(op, av, flags):
+    """The characters of FOLDED_ALPHABET a single character node accepts under flags."""
+    node = sre_parser.SubPattern(sre_parser.State(), [(op, av)])
+    code = [int(c) for c in sre_compiler._code(node, flags)]
+    program = _sre.compile('', flags, code, 0, {}, (None,))
+    return [c for c in FOLDED_ALPHABET if program.match(c)]
+
+def _char_node(chars):
+    if len(chars) == 1:
+        return sre_constants.LITERAL, ord(chars[0])
+    if not chars:
+        # Matches nothing
+        return sre_constants.IN, [(sre_constants.NEGATE, None), (sre_constants.RANGE, (0, sys.maxunicode))]
+    items = []
+    codes = [ord(c) for c in chars]
+    start = previous = codes[0]
+    for code in codes[1:] + [None]:
+        if code is not None and code == previous + 1:
+            previous = code
+            continue
+        if start == previous:
+            items.append((sre_constants.LITERAL, start))
+        else:
+            items.append((sre_constants.RANGE, (start, previous)))
+        if code is not None:
+            start = previous = code
+    return sre_constants.IN, items
+
+def _fold(subpattern, flags):
+    folded = []
+    for op, av in subpattern.data:
+        if op in _CHAR_NODES:
+            op, av = _char_node(_accepted(op, av, flags))
+        elif op is sre_constants.SUBPATTERN:
+            group, add_flags, del_flags, p = av
+            if add_flags or del_flags:
+                raise NotFoldable(f"inline flags in group {group}")
+            av = (group, add_flags, del_flags, _fold(p, flags))
+        elif op in _REPEATS:
+            av = (av[0], av[1], _fold(av[2], flags))
+        elif op is sre_constants.BRANCH:
+            av = (av[0], [_fold(branch, flags) for branch in av[1]])
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            av = (av[0], _fold(av[1], flags))
+        elif op is sre_constants.GROUPREF_EXISTS:
+            group, yes, no = av
+            av = (group, _fold(yes, flags), _fold(no, flags) if no is not None else None)
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            av = _fold(av, flags)
+        elif op not in _CASELESS_LEAVES:
+            raise NotFoldable(f"unsupported node {op}")
+        folded.append((op, av))
+    subpattern.data = folded
+    return subpattern
+
+def fold_parsed(parsed):
+    """Fold a pattern parsed with re.IGNORECASE in place; return its new flags or None."""
+    flags = parsed.state.flags
+    if not flags & re.IGNORECASE or flags & re.LOCALE:
+        return None
+    try:
+        _fold(parsed, flags)
+    except (NotFoldable, TypeError, AttributeError, ValueError, RuntimeError):
+        # The other errors come from the private sre APIs _accepted relies
+        # on changing shape; the caller keeps the IGNORECASE pattern
+        return None
+    flags &= ~re.IGNORECASE
+    parsed.state.flags = flags
+    return flags
+
+def fold_url(url):
+    """Return the folded form of an ASCII URL, or None when folded patterns do not apply."""
+    return url.lower() if url.isascii() else None
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Compare the outputs of two filtering runs URL by URL.
+
+Each run directory is turned into (url, field, value) records for the
+kept/blacklisted status, the URL category and, when the run used
+--explain, the deciding rule. Both sides are sorted externally (sorted
+chunks on disk, merged with heapq.merge) and joined with a streaming
+merge, so memory use does not grow with the corpus size.
+"""
+from collections import Counter
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import argparse
+import heapq
+import json
+
+from output_writer import COMPRESSION_SUFFIXES, open_input, open_output, output_path
+from url_classifier import NO_RULE, iter_rule_ids
+
+CHUNK_SIZE = 1_000_000
+STATUS_FILES = {'filtered_urls.txt': 'kept', 'blacklisted_urls.txt': 'blacklisted'}
+NON_CATEGORY_FILES = {'all_urls.txt', 'filtered_urls.txt', 'blacklisted_urls.txt'}
+
+def find_output(run_dir, name):
+    """Return the path of a run output, compressed or not, or None if it is missing."""
+    for suffix in [''] + list(COMPRESSION_SUFFIXES.values()):
+        path = Path(run_dir) / (name + suffix)
+        if path.exists():
+            return path
+    return None
+
+def _iter_lines(path):
+    with open_input(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def _category_files(run_dir):
+    categories = {}
+    for path in sorted(Path(run_dir).iterdir()):
+        name = path.name
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        if name.endswith('_urls.txt') and name not in NON_CATEGORY_FILES:
+            categories[name[:-len('_urls.txt')]] = path
+    return categories
+
+def _load_rules(path):
+    rules = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            rule_id, list_name, pattern = line.rstrip('\n').split('\t', 2)
+            rules[int(rule_id)] = f"{list_name}:{pattern}"
+    return rules
+
+def has_rules(run_dir):
+    """Whether a run was made with --explain and has a rule ID sidecar."""
+    return (Path(run_dir) / 'rule_ids.i32').exists() and (Path(run_dir) / 'rules.tsv').exists()
+
+def iter_run_records(run_dir):
+    """Yield (url, field, value) records for the status, category and rule of each URL in a run."""
+    for name, status in STATUS_FILES.items():
+        path = find_output(run_dir, name)
+        if path:
+            for url in _iter_lines(path):
+                yield url, 'status', status
+
+    for category, path in _category_files(run_dir).items():
+        for url in _iter_lines(path):
+            yield url, 'category', category
+
+    # Rule IDs are only comparable through their patterns, since the tables may differ
+    all_urls_file = find_output(run_dir, 'all_urls.txt')
+    if has_rules(run_dir) and all_urls_file:
+        rules = _load_rules(Path(run_dir) / 'rules.tsv')
+        rule_ids = iter_rule_ids(Path(run_dir) / 'rule_ids.i32')
+        for url, rule_id in zip(_iter_lines(all_urls_file), rule_ids):
+            yield url, 'rule', rules.get(rule_id, 'none') if rule_id != NO_RULE else 'none'
+
+def external_sort(records, tmp_dir, chunk_size=CHUNK_SIZE):
+    """Sort (url, field, value) records as tab-separated lines using sorted runs on disk.
+
+    Tabs sort before any URL character, so lines group by URL.
+    """
+    run_files = []
+    chunk = []
+
+    def flush():
+        chunk.sort()
+        run_file = Path(tmp_dir) / f"run-{len(run_files)}.txt"
+        with open(run_file, 'w', encoding='utf-8') as f:
+            f.writelines(chunk)
+        run_files.append(run_file)
+        chunk.clear()
+
+    for url, field, value in records:
+        chunk.append(f"{url}\t{field}\t{value}\n")
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    files = [open(run_file, 'r', encoding='utf-8') for run_file in run_files]
+    try:
+        yield from heapq.merge(*files)
+    finally:
+        for f in files:
+            f.close()
+
+def group_by_url(lines):
+    """Collapse sorted record lines into (url, {field: value}) pairs."""
+    current = None
+    fields = {}
+    for line in lines:
+        url, field, value = line.rstrip('\n').split('\t', 2)
+        if url != current:
+            if current is not None:
+                yield current, fields
+            current, fields = url, {}
+        fields[field] = value
+    if current is not None:
+        yield current, fields
+
+def merge_join(old, new):
+    """Join two sorted (url, fields) streams, yielding (url, old_fields, new_fields).
+
+    A side that lacks the URL contributes None.
+    """
+    old_item = next(old, None)
+    new_item = next(new, None)
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            yield old_item[0], old_item[1], None
+            old_item = next(old, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            yield new_item[0], None, new_item[1]
+            new_item = next(new, None)
+        else:
+            yield old_item[0], old_item[1], new_item[1]
+            old_item = next(old, None)
+            new_item = next(new, None)
+
+def diff_runs(old_dir, new_dir, output_dir, chunk_size=CHUNK_SIZE, compression=None):
+    """Diff two run directories, writing detail files to output_dir and returning a summary dict."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    compare_rules = has_rules(old_dir) and has_rules(new_dir)
+
+    summary = Counter()
+    category_changes = Counter()
+    rule_changes = Counter()
+
+    def output(name):
+        return open_output(output_path(output_dir / name, compression), compression)
+
+    outputs = {
+        'added': output('added_urls.txt'),
+        'removed': output('removed_urls.txt'),
+        'to_blacklisted': output('moved_to_blacklisted.txt'),
+        'to_kept': output('moved_to_kept.txt'),
+        'category': output('category_changes.tsv'),
+        'rule': output('rule_changes.tsv'),
+    }
+    try:
+        with TemporaryDirectory(dir=output_dir) as tmp_dir:
+            old_tmp = Path(tmp_dir) / 'old'
+            new_tmp = Path(tmp_dir) / 'new'
+            old_tmp.mkdir()
+            new_tmp.mkdir()
+            old = group_by_url(external_sort(iter_run_records(old_dir), old_tmp, chunk_size))
+            new = group_by_url(external_sort(iter_run_records(new_dir), new_tmp, chunk_size))
+
+            for url, old_fields, new_fields in merge_join(old, new):
+                if old_fields is None:
+                    summary['added'] += 1
+                    outputs['added'].write(url + '\n')
+                    continue
+                if new_fields is None:
+                    summary['removed'] += 1
+                    outputs['removed'].write(url + '\n')
+                    continue
+                summary['common'] += 1
+
+                old_status = old_fields.get('status')
+                new_status = new_fields.get('status')
+                if old_status != new_status:
+                    if new_status == 'blacklisted':
+                        summary['moved_to_blacklisted'] += 1
+                        outputs['to_blacklisted'].write(url + '\n')
+                    elif new_status == 'kept':
+                        summary['moved_to_kept'] += 1
+                        outputs['to_kept'].write(url + '\n')
+
+                old_category = old_fields.get('category', '-')
+                new_category = new_fields.get('category', '-')
+                if old_category != new_category:
+                    category_changes[(old_category, new_category)] += 1
+                    outputs['category'].write(f"{url}\t{old_category}\t{new_category}\n")
+
+                if compare_rules:
+                    old_rule = old_fields.get('rule', 'none')
+                    new_rule = new_fields.get('rule', 'none')
+                    if old_rule != new_rule:
+                        rule_changes[(old_rule, new_rule)] += 1
+                        outputs['rule'].write(f"{url}\t{old_rule}\t{new_rule}\n")
+    finally:
+        for f in outputs.values():
+            f.close()
+
+    result = {
+        'added': summary['added'],
+        'removed': summary['removed'],
+        'common': summary['common'],
+        'moved_to_blacklisted': summary['moved_to_blacklisted'],
+        'moved_to_kept': summary['moved_to_kept'],
+        'category_changes': [{'from': old, 'to': new, 'count': count}
+                             for (old, new), count in category_changes.most_common()],
+        'rules_compared': compare_rules,
+        'rule_changes': [{'from': old, 'to': new, 'count': count}
+                         for (old, new), count in rule_changes.most_common()],
+    }
+    with open(output_dir / 'diff_summary.json', 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the URL outputs of two filtering runs.')
+    parser.add_argument('old_dir', help='Output directory of the earlier run')
+    parser.add_argument('new_dir', help='Output directory of the later run')
+    parser.add_argument('--output-dir', '-o', default='run_diff',
+                        help='Directory to save the diff reports')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='Records held in memory per sorted run during the external sort')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None,
+                        help='Compress the URL list reports')
+    parser.add_argument('--top-n', type=int, default=10,
+                        help='Number of category and rule changes to print')
+    args = parser.parse_args()
+
+    print(f"Comparing {args.old_dir} -> {args.new_dir}")
+    result = diff_runs(args.old_dir, args.new_dir, args.output_dir, args.chunk_size, args.compress)
+
+    print(f"\nDiff Results:")
+    print(f"  URLs in both runs: {result['common']}")
+    print(f"  Added URLs: {result['added']}")
+    print(f"  Removed URLs: {result['removed']}")
+    print(f"  Moved kept -> blacklisted: {result['moved_to_blacklisted']}")
+    print(f"  Moved blacklisted -> kept: {result['moved_to_kept']}")
+
+    if result['category_changes']:
+        print("\nTop category changes:")
+        for change in result['category_changes'][:args.top_n]:
+            print(f"  {change['from']} -> {change['to']}: {change['count']} URLs")
+
+    if result['rules_compared']:
+        print("\nTop rule attribution changes:")
+        for change in result['rule_changes'][:args.top_n]:
+            print(f"  {change['from']} -> {change['to']}: {change['count']} URLs")
+    else:
+        print("\nRule attribution not compared (run both with --explain to include it)")
+
+    print(f"\nSaved diff reports to: {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Sorted, memory-mappable index of corpus page names for range queries.
+
+The case-folded page (everything after /wiki/) of every URL is stored in
+sorted order, so a literal /wiki/ prefix rule covers one contiguous range
+of the index and an exact-page rule (/wiki/X$) an equal range. Counting
+the URLs either kind of rule matches is two binary searches instead of a
+regex scan of the corpus. URLs whose fields cannot be looked up exactly
+(see url_fields.parse_url_fields) are kept verbatim and checked with the
+regex, so counts always equal those of re.search(pattern, url, re.IGNORECASE).
+
+File layout (little-endian): magic, total URL count, indexed key count,
+key blob size, fallback blob size, key offsets (uint64, count + 1),
+sorted key blob, NUL-separated fallback URLs.
+"""
+from array import array
+from contextlib import contextmanager
+import mmap
+import re
+import struct
+import sys
+
+from case_fold import fold_url
+from pattern_cache import DEFAULT_CACHE_DIR, load_compiled_patterns
+from url_fields import WIKI_PREFIX, parse_literal, parse_url_fields
+
+MAGIC = b'LOLIDX1\0'
+_HEADER = struct.Struct('<8sQQQQ')
+
+def _offsets_view(buffer, start, count):
+    view = memoryview(buffer)[start:start + 8 * count]
+    if sys.byteorder == 'little':
+        return view.cast('Q')
+    offsets = array('Q', view.tobytes())
+    offsets.byteswap()
+    return offsets
+
+class CorpusIndex:
+    """Range queries over the sorted page names of a URL corpus."""
+
+    def __init__(self, buffer):
+        magic, self.total, self.count, key_size, fallback_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a corpus index file")
+        self.buffer = buffer
+        self.offsets = _offsets_view(buffer, _HEADER.size, self.count + 1)
+        self.keys_start = _HEADER.size + 8 * (self.count + 1)
+        fallback_start = self.keys_start + key_size
+        fallback = bytes(buffer[fallback_start:fallback_start + fallback_size])
+        self.fallback = fallback.decode('utf-8').split('\0') if fallback else []
+
+    @staticmethod
+    def encode(urls):
+        """Build the serialized index for a list of URLs."""
+        keys = []
+        fallback = []
+        total = 0
+        for url in urls:
+            total += 1
+            fields = parse_url_fields(url)
+            if fields is None:
+                fallback.append(url)
+            elif fields.page is not None:
+                keys.append(fields.page.encode('ascii'))
+        keys.sort()
+
+        offsets = array('Q', [0])
+        position = 0
+        for key in keys:
+            position += len(key)
+            offsets.append(position)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        key_blob = b''.join(keys)
+        fallback_blob = '\0'.join(fallback).encode('utf-8')
+        header = _HEADER.pack(MAGIC, total, len(keys), len(key_blob), len(fallback_blob))
+        return b''.join([header, offsets.tobytes(), key_blob, fallback_blob])
+
+    @classmethod
+    def build(cls, urls):
+        """Build an in-memory index."""
+        return cls(cls.encode(urls))
+
+    @staticmethod
+    def write(urls, file_path):
+        """Build an index and write it to file_path."""
+        with open(file_path, 'wb') as f:
+            f.write(CorpusIndex.encode(urls))
+        return file_path
+
+    def key(self, i):
+        start = self.keys_start
+        return self.buffer[start + self.offsets[i]:start + self.offsets[i + 1]]
+
+    def _bisect(self, target, inclusive, length=None):
+        # First position whose key (cut to length) is > target, or >= it unless inclusive
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = self.key(mid)
+            if length is not None:
+                key = key[:length]
+            if key < target or (inclusive and key == target):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefix_range(self, prefix):
+        """Return the (start, end) key positions of pages starting with prefix (case-folded)."""
+        prefix = prefix.lower().encode('ascii')
+        return self._bisect(prefix, False), self._bisect(prefix, True, len(prefix))
+
+    def exact_range(self, page):
+        """Return the (start, end) key positions of pages equal to page (case-folded)."""
+        page = page.lower().encode('ascii')
+        return self._bisect(page, False), self._bisect(page, True)
+
+    def coverage(self, pattern, compiled=None):
+        """Count the corpus URLs a pattern matches, or return None if it is not a range query.
+
+        Prefix rules (a literal starting with /wiki/) and exact-page rules
+        (/wiki/X$) are answered from the index.
+        """
+        literal = parse_literal(pattern)
+        exact = parse_literal(pattern[:-1]) if pattern.endswith('$') else None
+        if literal is not None and literal.lower().startswith(WIKI_PREFIX):
+            start, end = self.prefix_range(literal[len(WIKI_PREFIX):])
+        elif exact is not None and exact.lower().startswith(WIKI_PREFIX):
+            start, end = self.exact_range(exact[len(WIKI_PREFIX):])
+        else:
+            return None
+        if compiled is None:
+            compiled = re.compile(pattern, re.IGNORECASE)
+        return end - start + sum(1 for url in self.fallback if compiled.search(url))
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+@contextmanager
+def open_corpus_index(file_path):
+    """Memory-map an index file written by CorpusIndex.write."""
+    with open(file_path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    index = CorpusIndex(buffer)
+    try:
+        yield index
+    finally:
+        index.close()
+
+def coverage_counts(patterns, urls, index=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Count the URLs each pattern matches, as {pattern: count}.
+
+    Range-query patterns are answered from index (built from urls when not
+    given); the rest are counted with a regex scan of urls, using the
+case-folded patterns on URLs lowered once.
+    """
+    if index is None:
+        index = CorpusIndex.build(urls)
+    compiled = load_compiled_patterns({'patterns': patterns}, cache_dir=cache_dir)['patterns']
+    folded = load_compiled_patterns({'patterns': patterns}, cache_dir=cache_dir, fold=True)['patterns']
+    counts = {}
+    scan = []
+    for pattern, regex, folded_regex in zip(patterns, compiled, folded):
+        if pattern in counts:
+            continue
+        count = index.coverage(pattern, regex)
+        if count is None:
+            scan.append((pattern, regex, folded_regex))
+        counts[pattern] = count
+    if scan:
+        # Lower the corpus once; folded patterns then match it case-sensitively
+        folded_urls = [(url, fold_url(url)) for url in urls]
+    for pattern, regex, folded_regex in scan:
+        if folded_regex is None:
+            search = regex.search
+            counts[pattern] = sum(1 for url, _ in folded_urls if search(url))
+            continue
+        search, folded_search = regex.search, folded_regex.search
+        counts[pattern] = sum(1 for url, lower in folded_urls
+                              if (folded_search(lower) if lower is not None else search(url)))
+    return counts
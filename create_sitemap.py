@@ -5,10 +5,12 @@ import xml.etree.ElementTree as ET
 from datetime import datetime
 import os
 
+from output_writer import open_input
+
 def create_sitemap(input_file, output_file):
     """Create a sitemap XML file from a list of URLs."""
     # Read URLs from input file
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with open_input(input_file) as f:
         urls = [line.strip() for line in f if line.strip()]
     
     print(f"Creating sitemap with {len(urls)} URLs...")
@@ -74,7 +76,7 @@ def create_sitemap_index(sitemap_files, output_file):
 def split_sitemap(input_file, output_dir, url_per_file=5000):
     """Split a large list of URLs into multiple sitemap files."""
     # Read URLs from input file
-    with open(input_file, 'r', encoding='utf-8') as f:
+    with open_input(input_file) as f:
         urls = [line.strip() for line in f if line.strip()]
     
     # Create output directory if it doesn't exist
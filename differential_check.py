@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Differential check of the optimized matchers against the naive reference loops.
+
+The reference is the original filtering code: every pattern compiled with
+re.IGNORECASE and tried in order, whitelist before blacklist. Each
+optimized engine (URLClassifier with every installed matching backend,
+with and without rule reordering, on bytes URLs, and analyze_whitelist.analyze_patterns)
+runs over the same URLs: the corpus plus generated adversarial variants
+(case changes, percent-encodings, parentheses, non-ASCII titles, odd URL
+structure, and URLs built from the patterns themselves). Any difference
+is reported with the rules involved, and the exit status is 1.
+
+Example:
+  python differential_check.py lol_narrative_sitemaps/sitemap-*.xml \\
+      --blacklist-file massive_blacklist.txt --whitelist-file enhanced_whitelist.txt
+"""
+from urllib.parse import quote, unquote
+import argparse
+import random
+import re
+import sys
+
+from regex_backends import available_backends, read_benchmark_urls
+from url_classifier import NO_RULE, URLClassifier, read_patterns
+
+BASE_URL = 'https://leagueoflegends.fandom.com'
+QUALIFIERS = ['(TFT)', '(tft)', '(Teamfight_Tactics)', '(Legends_of_Runeterra)', '(Universe)',
+              '(disambiguation)', '((TFT))', '()', '(', ')']
+UNICODE_CHARS = ['é', 'ß', 'K', 'ſ', 'İ', 'ı', 'Ω', 'Ｗ', ' ', 'ﬁ']
+SUFFIXES = ['/', '/LoL', '/lol', '/TFT', '/Trivia', '/Skins', '/Cosmetics', '/Gallery', '/Audio',
+            '/wiki/Ahri', '?action=history', '#Lore', '\n', '$']
+DEFAULT_VARIANTS = 4
+
+def reference_decisions(urls, whitelist_patterns, blacklist_patterns):
+    """(keep, rule_id) per URL, the way the original filter_urls loop decides it."""
+    whitelist = [re.compile(pattern, re.IGNORECASE) for pattern in whitelist_patterns]
+    blacklist = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist_patterns]
+    decisions = []
+    for url in urls:
+        decision = True, NO_RULE
+        for rule_id, regex in enumerate(whitelist):
+            if regex.search(url):
+                decision = True, rule_id
+                break
+        else:
+            for rule_id, regex in enumerate(blacklist):
+                if regex.search(url):
+                    decision = False, len(whitelist) + rule_id
+                    break
+        decisions.append(decision)
+    return decisions
+
+def reference_analysis(urls, whitelist_patterns, blacklist_patterns=None):
+    """The original analyze_patterns: per-pattern match counts and URL groups, by brute force."""
+    whitelist = [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in whitelist_patterns]
+    blacklist = [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in blacklist_patterns or []]
+    whitelist_matches = {pattern: 0 for pattern in whitelist_patterns}
+    blacklist_matches = {pattern: 0 for pattern in blacklist_patterns or []}
+    groups = {'whitelist_only': [], 'blacklist_only': [], 'both_match': [], 'neither_match': []}
+    for url in urls:
+        w_match = b_match = False
+        for pattern, regex in whitelist:
+            if regex.search(url):
+                whitelist_matches[pattern] += 1
+                w_match = True
+        for pattern, regex in blacklist:
+            if regex.search(url):
+                blacklist_matches[pattern] += 1
+                b_match = True
+        if w_match and not b_match:
+            groups['whitelist_only'].append(url)
+        elif b_match and not w_match:
+            groups['blacklist_only'].append(url)
+        elif w_match and b_match:
+            groups['both_match'].append(url)
+        else:
+            groups['neither_match'].append(url)
+    return dict(groups, whitelist_matches=whitelist_matches, blacklist_matches=blacklist_matches)
+
+def _pattern_text(pattern):
+    # Rough text a pattern could match: drop regex syntax, fill classes and wildcards
+    text = re.sub(r"\[[^\]]*\][+*]?|\.\*|\.\+", 'Foo', pattern)
+    text = re.sub(r"\\(.)", r'\1', text)
+    return re.sub(r"[\^$|()?*+{}]", '', text)
+
+def _insert(rng, text, piece):
+    i = rng.randint(0, len(text))
+    return text[:i] + piece + text[i:]
+
+def adversarial_urls(urls, patterns, variants=DEFAULT_VARIANTS, seed=0):
+    """Generate URLs that probe case folding, encoding and structure edge cases."""
+    rng = random.Random(seed)
+    generated = []
+    for url in urls:
+        prefix, wiki, page = url.partition('/wiki/')
+        if not wiki:
+            prefix, page = url, ''
+        for _ in range(variants):
+            kind = rng.randrange(7)
+            if kind == 0:
+                variant = rng.choice([url.upper(), url.swapcase(), prefix + wiki + page.title()])
+            elif kind == 1:
+                encoded = quote(unquote(page), safe='/')
+                variant = prefix + wiki + rng.choice([encoded, encoded.lower(), unquote(page),
+                                                      page.replace('(', '%28').replace(')', '%29')])
+            elif kind == 2:
+                variant = url + '_' + rng.choice(QUALIFIERS)
+                if rng.random() < 0.5:
+                    variant = _insert(rng, url, rng.choice(QUALIFIERS))
+            elif kind == 3:
+                variant = _insert(rng, url, rng.choice(UNICODE_CHARS))
+            elif kind == 4:
+                variant = url + rng.choice(SUFFIXES)
+            elif kind == 5:
+                variant = rng.choice([prefix + wiki + wiki + page, prefix + wiki, prefix + page,
+                                      url.replace('/wiki/', '/WIKI/'), _insert(rng, url, '\n')])
+            else:
+                variant = _insert(rng, url, _pattern_text(rng.choice(patterns)) if patterns else '')
+            generated.append(variant)
+
+    for pattern in patterns:
+        text = _pattern_text(pattern)
+        url = BASE_URL + (text if text.startswith('/') else '/wiki/' + text)
+        generated += [url, url.upper(), url + '/sub', _insert(rng, url, rng.choice(UNICODE_CHARS)),
+                      BASE_URL + '/wiki/Ahri' + text]
+    return list(dict.fromkeys(generated))
+
+def check_classifier(name, classifier, urls, expected, report, as_bytes=False):
+    """Compare a classifier's decisions with the reference; return the number of differences.
+
+    With as_bytes the URLs are passed UTF-8 encoded to classify_bytes.
+    """
+    differences = 0
+    if as_bytes:
+        decisions = [classifier.classify_bytes(url.encode('utf-8')) for url in urls]
+    else:
+        decisions = classifier.classify_batch(urls)
+    for url, decision, reference in zip(urls, decisions, expected):
+        if decision != reference:
+            differences += 1
+            report(f"{name}: {url!r}\n    reference {_describe(classifier, reference)}\n"
+                   f"    engine    {_describe(classifier, decision)}")
+    return differences
+
+def _describe(classifier, decision):
+    keep, rule_id = decision
+    rule = classifier.rule(rule_id)
+    return f"{'keep' if keep else 'drop'} by " + (f"[{rule_id}] {rule[0]} {rule[1]}" if rule else 'no rule')
+
+def check_analysis(urls, whitelist, blacklist, report):
+    """Compare analyze_whitelist.analyze_patterns with the reference; return the number of differences."""
+    from analyze_whitelist import analyze_patterns
+    reference = reference_analysis(urls, whitelist, blacklist)
+    result = analyze_patterns(urls, whitelist, blacklist)
+    differences = 0
+    groups = ('whitelist_only', 'blacklist_only', 'both_match', 'neither_match')
+    expected_group = {url: group for group in groups for url in reference[group]}
+    for group in groups:
+        for url in result[group]:
+            if expected_group.get(url) != group:
+                differences += 1
+                report(f"analyze_patterns: {url!r} grouped as {group}, reference {expected_group.get(url)}")
+    for counts in ('whitelist_matches', 'blacklist_matches'):
+        for pattern, count in reference[counts].items():
+            if result[counts].get(pattern) != count:
+                differences += 1
+                report(f"analyze_patterns: {counts} for {pattern!r} is {result[counts].get(pattern)}, "
+                       f"reference {count}")
+    return differences
+
+def check_all(urls, whitelist, blacklist, report):
+    """Check every installed engine against the reference; return the total number of differences."""
+    expected = reference_decisions(urls, whitelist, blacklist)
+    total = 0
+    for backend in available_backends():
+        classifier = URLClassifier(blacklist, whitelist, backend=backend)
+        differences = check_classifier(f"classifier[{backend}]", classifier, urls, expected, report)
+        if backend == 're':
+            differences += check_classifier("classifier[re, bytes]", classifier, urls, expected, report, True)
+            classifier.warm_up(urls)
+            differences += check_classifier("classifier[re, reordered]", classifier, urls, expected, report)
+        print(f"  classifier[{backend}]: {differences} differences")
+        total += differences
+
+    differences = check_analysis(urls, whitelist, blacklist, report)
+    print(f"  analyze_patterns: {differences} differences")
+    return total + differences
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the optimized matchers against the naive reference loops.')
+    parser.add_argument('corpus', nargs='+',
+                        help='Sitemap XML files or URL list files to check')
+    parser.add_argument('--blacklist-file', action='append', default=[],
+                        help='Additional blacklist pattern file (can be repeated)')
+    parser.add_argument('--whitelist-file', action='append', default=[],
+                        help='Additional whitelist pattern file (can be repeated)')
+    parser.add_argument('--no-default-blacklist', action='store_true',
+                        help='Do not use the default blacklist patterns')
+    parser.add_argument('--variants', type=int, default=DEFAULT_VARIANTS,
+                        help='Adversarial variants generated per corpus URL')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for the adversarial URLs')
+    parser.add_argument('--max-report', type=int, default=20,
+                        help='Maximum number of differences to print')
+    args = parser.parse_args()
+
+    from final_filter import DEFAULT_BLACKLIST, WHITELIST
+    blacklist = [] if args.no_default_blacklist else list(DEFAULT_BLACKLIST)
+    for file_path in args.blacklist_file:
+        blacklist.extend(read_patterns(file_path))
+    whitelist = list(WHITELIST)
+    for file_path in args.whitelist_file:
+        whitelist.extend(read_patterns(file_path))
+
+    corpus = read_benchmark_urls(args.corpus)
+    generated = adversarial_urls(corpus, whitelist + blacklist, args.variants, args.seed)
+    urls = list(dict.fromkeys(corpus + generated))
+    print(f"Checking {len(urls)} URLs ({len(corpus)} from the corpus) against "
+          f"{len(whitelist)} whitelist and {len(blacklist)} blacklist patterns")
+
+    reported = []
+
+    def report(message):
+        if len(reported) < args.max_report:
+            print(message)
+        reported.append(message)
+
+    total = check_all(urls, whitelist, blacklist, report)
+    if total:
+        print(f"\nFAILED: {total} differences from the reference")
+        sys.exit(1)
+    print("\nAll engines agree with the reference")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Long-running filter service that keeps a URL corpus and compiled patterns in memory.
+
+Pattern files are polled for changes and only added patterns are matched
+against the corpus, so edits to large pattern files reclassify it in a
+fraction of a full run. Queries are answered over local HTTP as JSON:
+
+  /classify?url=...   keep/drop decision and the rule that decided it
+  /explain?url=...    every whitelist and blacklist pattern that hits the URL
+  /counts             classification counts for the resident corpus
+  /reload             re-read the pattern files now
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from case_fold import fold_url
+from final_filter import DEFAULT_BLACKLIST, WHITELIST
+from pattern_cache import DEFAULT_CACHE_DIR, load_compiled_patterns
+from sitemap_ingest import read_corpus
+from url_classifier import read_patterns
+
+def _count_bits(bits):
+    return bin(bits).count('1')
+
+class FilterState:
+    """A URL corpus classified against the current pattern sets.
+
+    Each pattern's hits on the corpus are kept as an integer bitset, so a
+    pattern change only matches the added patterns against the corpus and
+    rebuilds the decisions with bitwise unions. Readers see a snapshot that
+    is swapped in atomically.
+    """
+
+    def __init__(self, urls, cache_dir=DEFAULT_CACHE_DIR):
+        self.urls = urls
+        # Lowered once, for the case-folded patterns
+        self.folded_urls = [fold_url(url) for url in urls]
+        self.cache_dir = cache_dir
+        self.snapshot = {
+            'patterns': {'whitelist': {}, 'blacklist': {}},
+            'hits': {'whitelist': {}, 'blacklist': {}},
+            'counts': {'total': len(urls), 'kept': len(urls), 'blacklisted': 0, 'rescued': 0},
+        }
+        self._update_lock = threading.Lock()
+
+    def _match_corpus(self, regex, folded=None):
+        bits = bytearray((len(self.urls) + 7) // 8)
+        search = regex.search
+        folded_search = folded.search if folded is not None else None
+        for i, (url, lower) in enumerate(zip(self.urls, self.folded_urls)):
+            if folded_search is not None and lower is not None:
+                hit = folded_search(lower)
+            else:
+                hit = search(url)
+            if hit:
+                bits[i >> 3] |= 1 << (i & 7)
+        return int.from_bytes(bits, 'little')
+
+    def update(self, pattern_sets):
+        """Install new whitelist/blacklist pattern lists; return (added, removed) pattern counts."""
+        compiled = load_compiled_patterns(pattern_sets, cache_dir=self.cache_dir)
+        folded = load_compiled_patterns(pattern_sets, cache_dir=self.cache_dir, fold=True)
+        with self._update_lock:
+            old_hits = self.snapshot['hits']
+            patterns = {}
+            hits = {}
+            added = removed = 0
+            for name in ('whitelist', 'blacklist'):
+                patterns[name] = dict(zip(pattern_sets[name], compiled[name]))
+                folded_by_pattern = dict(zip(pattern_sets[name], folded[name]))
+                hits[name] = {}
+                for pattern, regex in patterns[name].items():
+                    if pattern in old_hits[name]:
+                        hits[name][pattern] = old_hits[name][pattern]
+                    else:
+                        hits[name][pattern] = self._match_corpus(regex, folded_by_pattern[pattern])
+                        added += 1
+                removed += len(old_hits[name].keys() - hits[name].keys())
+
+            whitelisted = 0
+            for bits in hits['whitelist'].values():
+                whitelisted |= bits
+            blacklisted = 0
+            for bits in hits['blacklist'].values():
+                blacklisted |= bits
+            total = len(self.urls)
+            dropped = _count_bits(blacklisted & ~whitelisted)
+            counts = {
+                'total': total,
+                'kept': total - dropped,
+                'blacklisted': dropped,
+                'rescued': _count_bits(blacklisted & whitelisted),
+            }
+            self.snapshot = {'patterns': patterns, 'hits': hits, 'counts': counts}
+        return added, removed
+
+    def classify(self, url):
+        """Return the keep/drop decision for a URL and the first rule that decided it."""
+        patterns = self.snapshot['patterns']
+        for name, decision in (('whitelist', 'keep'), ('blacklist', 'drop')):
+            for pattern, regex in patterns[name].items():
+                if regex.search(url):
+                    return {'url': url, 'decision': decision, 'list': name, 'pattern': pattern}
+        return {'url': url, 'decision': 'keep', 'list': None, 'pattern': None}
+
+    def explain(self, url):
+        """Return the decision for a URL along with every pattern that hits it."""
+        result = self.classify(url)
+        patterns = self.snapshot['patterns']
+        for name in ('whitelist', 'blacklist'):
+            result[name] = [pattern for pattern, regex in patterns[name].items() if regex.search(url)]
+        return result
+
+    def counts(self):
+        return dict(self.snapshot['counts'], patterns={
+            name: len(patterns) for name, patterns in self.snapshot['patterns'].items()})
+
+class PatternWatcher:
+    """Polls the pattern files and applies them to a FilterState when they change."""
+
+    def __init__(self, state, blacklist_files, whitelist_files, use_default_blacklist=True):
+        self.state = state
+        self.blacklist_files = [Path(p) for p in blacklist_files]
+        self.whitelist_files = [Path(p) for p in whitelist_files]
+        self.use_default_blacklist = use_default_blacklist
+        self.signature = None
+
+    def _signature(self):
+        signature = []
+        for path in self.blacklist_files + self.whitelist_files:
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    def load(self):
+        """Read all pattern files and update the state, keeping the old patterns on errors."""
+        signature = self._signature()
+        try:
+            blacklist = list(DEFAULT_BLACKLIST) if self.use_default_blacklist else []
+            for path in self.blacklist_files:
+                blacklist.extend(read_patterns(path))
+            whitelist = list(WHITELIST)
+            for path in self.whitelist_files:
+                whitelist.extend(read_patterns(path))
+            start = time.perf_counter()
+            added, removed = self.state.update({'whitelist': whitelist, 'blacklist': blacklist})
+        except (OSError, ValueError, re.error) as e:
+            # ValueError covers pattern files that are not valid UTF-8
+            print(f"Keeping previous patterns, could not load pattern files: {e}")
+            return False
+        finally:
+            self.signature = signature
+        counts = self.state.counts()
+        print(f"Loaded {len(blacklist)} blacklist and {len(whitelist)} whitelist patterns "
+              f"(+{added}/-{removed}) in {time.perf_counter() - start:.3f}s: "
+              f"{counts['kept']} kept, {counts['blacklisted']} blacklisted")
+        return True
+
+    def poll(self):
+        """Reload if any pattern file changed since the last load."""
+        if self._signature() != self.signature:
+            return self.load()
+        return False
+
+    def watch(self, interval=1.0):
+        """Start a daemon thread that polls the pattern files every interval seconds."""
+        def run():
+            while True:
+                time.sleep(interval)
+                # Keep polling (and serving the last good patterns) whatever a reload raises
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Keeping previous patterns, reloading failed: {e!r}")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+def make_handler(state, watcher):
+    """Build a request handler class bound to a FilterState and its PatternWatcher."""
+
+    class FilterRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            request = urlparse(self.path)
+            query = parse_qs(request.query)
+            if request.path in ('/classify', '/explain'):
+                urls = query.get('url')
+                if not urls:
+                    self._send_json({'error': 'missing url parameter'}, 400)
+                    return
+                lookup = state.classify if request.path == '/classify' else state.explain
+                results = [lookup(url) for url in urls]
+                self._send_json(results[0] if len(results) == 1 else results)
+            elif request.path == '/counts':
+                self._send_json(state.counts())
+            elif request.path == '/reload':
+                self._send_json({'reloaded': watcher.load(), 'counts': state.counts()})
+            else:
+                self._send_json({'error': f'unknown endpoint {request.path}'}, 404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FilterRequestHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve URL classification for a resident corpus, '
+                                                 'reloading pattern files when they change.')
+    parser.add_argument('corpus', nargs='+',
+                        help='URL list files to keep in memory (e.g. filtered_lol/all_urls.txt)')
+    parser.add_argument('--blacklist-file', action='append', default=[],
+                        help='Blacklist pattern file to watch (can be repeated)')
+    parser.add_argument('--whitelist-file', action='append', default=[],
+                        help='Whitelist pattern file to watch (can be repeated)')
+    parser.add_argument('--no-default-blacklist', action='store_true',
+                        help='Do not use the default blacklist patterns')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Port to listen on')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between pattern file change checks')
+    parser.add_argument('--pattern-cache-dir', default=None,
+                        help=f'Directory for cached compiled patterns (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-pattern-cache', action='store_true',
+                        help='Always recompile patterns instead of using the on-disk cache')
+    args = parser.parse_args()
+
+    print(f"Loading corpus from {len(args.corpus)} file(s)")
+    urls = read_corpus(args.corpus)
+    print(f"Loaded {len(urls)} URLs")
+
+    cache_dir = None if args.no_pattern_cache else (args.pattern_cache_dir or DEFAULT_CACHE_DIR)
+    state = FilterState(urls, cache_dir)
+    watcher = PatternWatcher(state, args.blacklist_file, args.whitelist_file,
+                             use_default_blacklist=not args.no_default_blacklist)
+    watcher.load()
+    watcher.watch(args.poll_interval)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state, watcher))
+    print(f"Serving on http://{args.host}:{args.port} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
 import xml.etree.ElementTree as ET
 from lxml import etree
-from bs4 import BeautifulSoup
 import requests
 import argparse
 from urllib.parse import urlparse
-import re
 import sys
 from pathlib import Path
 import json
 from collections import Counter
 import os
+import asyncio
+from functools import partial
+
+from sitemap_ingest import (
+    add_local_source_arguments, child_sitemap_filename, dedup_urls, fetch_child_sitemap,
+    make_deduplicator, parse_sitemaps, resolver_from_args, traverse_sitemap_tree
+)
+from case_fold import fold_url
+from literal_prefilter import PrefilteredPattern
+from output_writer import write_lines, write_outputs
+from parse_cache import DEFAULT_PARSE_CACHE_DIR, cached_parse
+from pattern_cache import DEFAULT_CACHE_DIR, load_compiled_patterns
+from regex_backends import AUTO_SAMPLE, BACKENDS
+from run_checkpoint import RunCheckpoint, checkpoint_key, classify_with_checkpoint, parse_with_checkpoint
+from sitemap_scanner import recover_sitemap_locs, scan_sitemap_locs
+from url_classifier import URLClassifier, read_rule_stats, write_rule_ids, write_rule_stats
 
 # Patterns to blacklist
 DEFAULT_BLACKLIST = [
@@ -61,24 +75,17 @@ def parse_sitemap_index(file_path):
             sitemap_urls.append(sitemap.text)
             
         if not sitemap_urls:
-            return parse_sitemap_index_bs4(file_path)
+            return parse_sitemap_index_recover(file_path)
             
         return sitemap_urls
     except Exception as e:
         print(f"Error parsing with lxml: {e}")
-        return parse_sitemap_index_bs4(file_path)
-        
-def parse_sitemap_index_bs4(file_path):
-    """Parse sitemap index using BeautifulSoup as fallback."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'xml')
-    sitemap_urls = []
-    
-    for loc in soup.find_all('loc'):
-        sitemap_urls.append(loc.text)
+        return parse_sitemap_index_recover(file_path)
         
+def parse_sitemap_index_recover(file_path):
+    """Parse a malformed sitemap index with the streaming recovery parser."""
+    sitemap_urls, skipped = recover_sitemap_locs(file_path)
+    print(f"Recovered {len(sitemap_urls)} sitemaps from {file_path} (skipped {skipped} bytes)")
     return sitemap_urls
 
 def download_sitemap(url, output_dir):
@@ -89,23 +96,27 @@ def download_sitemap(url, output_dir):
             print(f"Failed to download {url}: Status code {response.status_code}")
             return None
         
-        # Create a filename based on the URL
-        parsed_url = urlparse(url)
-        filename = Path(parsed_url.path).name
-        if not filename:
-            filename = f"sitemap-{hash(url)}.xml"
-        
-        output_path = Path(output_dir) / filename
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
+        output_path = Path(output_dir) / child_sitemap_filename(url)
+        # Keep the raw bytes: the XML declaration, not the HTTP headers, gives the encoding
+        with open(output_path, 'wb') as f:
+            f.write(response.content)
         
         return output_path
     except Exception as e:
         print(f"Error downloading {url}: {e}")
         return None
 
-def parse_urls_from_sitemap(file_path):
-    """Parse URLs from a sitemap XML file."""
+def parse_urls_from_sitemap(file_path, fast_scan=False):
+    """Parse URLs from a sitemap XML file.
+
+    With fast_scan, well-formed sitemaps are read by scanning their raw bytes
+    and only irregular ones go through lxml and the recovery parser.
+    """
+    if fast_scan:
+        urls = scan_sitemap_locs(file_path)
+        if urls is not None:
+            return urls
+    
     try:
         parser = etree.XMLParser(recover=True)
         tree = etree.parse(file_path, parser)
@@ -128,61 +139,52 @@ def parse_urls_from_sitemap(file_path):
         for url_element in loc_elements:
             urls.append(url_element.text)
         
-        # If still no URLs found, try with BeautifulSoup
+        # If still no URLs found, try the recovery parser
         if not urls:
-            return parse_urls_from_sitemap_bs4(file_path)
+            return parse_urls_from_sitemap_recover(file_path)
         
         return urls
     except Exception as e:
         print(f"Error parsing {file_path} with lxml: {e}")
-        return parse_urls_from_sitemap_bs4(file_path)
+        return parse_urls_from_sitemap_recover(file_path)
+
+def parse_url_bytes_from_sitemap(file_path):
+    """Parse URLs from a sitemap XML file as UTF-8 bytes.
+
+    Well-formed sitemaps are scanned without decoding; irregular ones are
+    parsed like parse_urls_from_sitemap and their URLs encoded.
+    """
+    urls = scan_sitemap_locs(file_path, as_bytes=True)
+    if urls is not None:
+        return urls
+    return [url.encode('utf-8') for url in parse_urls_from_sitemap(file_path) if url is not None]
 
-def parse_urls_from_sitemap_bs4(file_path):
-    """Parse URLs from sitemap using BeautifulSoup as fallback."""
+def parse_urls_from_sitemap_recover(file_path):
+    """Parse URLs from a malformed sitemap with the streaming recovery parser."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'xml')
-        urls = []
-        
-        # Try to find all loc elements (could be under url or directly)
-        for loc in soup.find_all('loc'):
-            # Check if this is part of a sitemap index
-            if loc.parent.name != 'sitemap':
-                urls.append(loc.text)
-        
+        urls, skipped = recover_sitemap_locs(file_path, include_sitemap_locs=False)
+        print(f"  Recovered {len(urls)} URLs from {file_path} (skipped {skipped} bytes)")
         return urls
     except Exception as e:
-        print(f"Error parsing {file_path} with BeautifulSoup: {e}")
+        print(f"Error recovering URLs from {file_path}: {e}")
         return []
 
-def filter_urls(urls, blacklist_patterns, whitelist_patterns=None):
+def filter_urls(urls, blacklist_patterns, whitelist_patterns=None, cache_dir=DEFAULT_CACHE_DIR, backend='re',
+                as_bytes=False):
     """Filter URLs based on blacklist patterns with whitelist override."""
-    filtered_urls = []
-    blacklisted_urls = []
-    
-    # Compile patterns
-    compiled_blacklist = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist_patterns]
-    compiled_whitelist = [re.compile(pattern, re.IGNORECASE) for pattern in whitelist_patterns] if whitelist_patterns else []
-    
-    for url in urls:
-        # Check if URL matches any whitelist pattern
-        is_whitelisted = any(pattern.search(url) for pattern in compiled_whitelist) if compiled_whitelist else False
-        
-        # If whitelisted, include regardless of blacklist
-        if is_whitelisted:
-            filtered_urls.append(url)
-            continue
-            
-        # Otherwise, check blacklist
-        is_blacklisted = any(pattern.search(url) for pattern in compiled_blacklist)
-        if is_blacklisted:
-            blacklisted_urls.append(url)
-        else:
-            filtered_urls.append(url)
-    
-    return filtered_urls, blacklisted_urls
+    classifier = URLClassifier(blacklist_patterns, whitelist_patterns, cache_dir, backend,
+                               backend_sample(urls, as_bytes))
+    return classifier.split(urls, as_bytes)
+
+def backend_sample(urls, as_bytes=False):
+    """URLs to time the matching backends on; backends are timed on text, so bytes URLs are decoded."""
+    if not as_bytes:
+        return urls
+    return [url.decode('utf-8') for url in urls[::max(1, len(urls) // AUTO_SAMPLE)]]
+
+def display_url(url):
+    """The text of a URL, decoding UTF-8 bytes URLs."""
+    return url.decode('utf-8') if isinstance(url, bytes) else url
 
 def analyze_urls_by_path(urls):
     """Analyze URL structure by path components to identify patterns."""
@@ -190,7 +192,7 @@ def analyze_urls_by_path(urls):
     path_patterns = Counter()
     
     for url in urls:
-        parsed = urlparse(url)
+        parsed = urlparse(display_url(url))
         path_parts = [p for p in parsed.path.split('/') if p]
         
         # Create a generalized pattern
@@ -221,7 +223,74 @@ def main():
                         help='Group URLs by categories and save to separate files')
     parser.add_argument('--no-default-blacklist', action='store_true',
                         help='Do not use the default blacklist patterns')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse child sitemaps in this many worker processes')
+    parser.add_argument('--fast-scan', action='store_true',
+                        help='Extract URLs from well-formed sitemaps with a raw byte scanner instead of lxml')
+    parser.add_argument('--recursive', action='store_true',
+                        help='Follow nested sitemap indexes to any depth, fetching each level concurrently')
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help='Maximum sitemap index nesting depth to follow with --recursive')
+    parser.add_argument('--fetch-workers', type=int, default=8,
+                        help='Concurrent downloads per level with --recursive, or in total with --async')
+    parser.add_argument('--per-host', type=int, default=2,
+                        help='Maximum concurrent downloads per host with --recursive')
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help='Run the asyncio pipeline: concurrent downloads, parsing and classification '
+                             'in worker processes and streaming output (writes only the URL lists; '
+                             'not with the options that need the whole corpus or other outputs)')
+    parser.add_argument('--bytes', dest='bytes_mode', action='store_true',
+                        help='Keep URLs as UTF-8 bytes from the sitemap scanner to the output files '
+                             '(implies --fast-scan; not with --async)')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None,
+                        help='Compress the URL list outputs')
+    parser.add_argument('--output-workers', type=int, default=1,
+                        help='Write URL list outputs concurrently with this many threads')
+    parser.add_argument('--parse-cache', nargs='?', const='', default=None, metavar='DIR',
+                        help='Reuse the parsed URLs of child sitemaps whose content is unchanged, cached '
+                             f'by content hash in DIR (no value: {DEFAULT_PARSE_CACHE_DIR})')
+    parser.add_argument('--pattern-cache-dir', default=None,
+                        help=f'Directory for cached compiled patterns (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-pattern-cache', action='store_true',
+                        help='Always recompile patterns instead of using the on-disk cache')
+    parser.add_argument('--backend', choices=BACKENDS + ('auto',), default='re',
+                        help="Matching backend for the pattern lists (see regex_backends.py); "
+                             "'auto' picks the fastest installed one on a sample of the URLs")
+    parser.add_argument('--explain', action='store_true',
+                        help='Write rule_ids.i32 (the rule that decided each URL in all_urls.txt, '
+                             'as int32, -1 for none) and rules.tsv (the rule ID table)')
+    parser.add_argument('--rule-stats', default=None,
+                        help='JSON file of rule hit counts: rules are evaluated most-hit first using '
+                             'the counts saved by the previous run (or a warm-up sample), and the '
+                             'counts from this run are saved back')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='Record each downloaded, parsed and classified child sitemap in '
+                             'OUTPUT_DIR/checkpoint so an interrupted run can be resumed')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted --checkpoint run, skipping the work it recorded '
+                             '(implies --checkpoint)')
+    parser.add_argument('--dedup', choices=['off', 'exact', 'bloom'], default='off',
+                        help='Drop duplicate URLs (after normalization) across all sitemaps')
+    parser.add_argument('--bloom-capacity', type=int, default=10_000_000,
+                        help='Expected number of URLs for --dedup bloom')
+    parser.add_argument('--bloom-error', type=float, default=0.001,
+                        help='False positive rate for --dedup bloom (false positives drop unique URLs)')
+    add_local_source_arguments(parser)
     args = parser.parse_args()
+    if args.bytes_mode and args.async_mode:
+        parser.error('--bytes is not supported with --async')
+    if args.resume:
+        args.checkpoint = True
+    if args.checkpoint and args.async_mode:
+        parser.error('--checkpoint and --resume are not supported with --async')
+    if args.async_mode:
+        unsupported = {'--recursive': args.recursive, '--url-categories': args.url_categories,
+                       '--explain': args.explain, '--rule-stats': args.rule_stats,
+                       '--compress': args.compress, '--output-workers': args.output_workers > 1,
+                       '--parse-cache': args.parse_cache is not None}
+        for option, used in unsupported.items():
+            if used:
+                parser.error(f'{option} is not supported with --async')
 
     # Set up blacklist patterns
     blacklist_patterns = []
@@ -255,44 +324,161 @@ def main():
         except Exception as e:
             print(f"Error loading whitelist file: {e}")
 
+    pattern_cache_dir = None if args.no_pattern_cache else (args.pattern_cache_dir or DEFAULT_CACHE_DIR)
+
     # Create output directory
     output_dir = Path(args.output_dir)
     output_dir.mkdir(exist_ok=True)
     
+    if args.async_mode:
+        from async_pipeline import run_async_pipeline
+        print(f"Running async pipeline for: {args.sitemap_index}")
+        stats = asyncio.run(run_async_pipeline(
+            args.sitemap_index, output_dir, blacklist_patterns, whitelist_patterns,
+            concurrency=args.fetch_workers, parse_workers=args.workers if args.workers > 1 else None,
+            fast_scan=args.fast_scan, resolver=resolver_from_args(args), cache_dir=pattern_cache_dir,
+            backend=args.backend, deduplicator=make_deduplicator(args.dedup, args.bloom_capacity, args.bloom_error)))
+        print(f"\nFiltering Results:")
+        print(f"  Sitemaps: {stats['sitemaps']} ({stats['failed']} failed)")
+        print(f"  Total URLs: {stats['total']}")
+        if args.dedup != 'off':
+            print(f"  Duplicate URLs dropped: {stats['duplicates']}")
+        print(f"  Filtered URLs (kept): {stats['filtered']}")
+        print(f"  Blacklisted URLs: {stats['blacklisted']}")
+        print(f"\nSaved URL lists to: {output_dir}")
+        return
+    
     # Parse sitemap index
     print(f"Parsing sitemap index: {args.sitemap_index}")
     sitemap_urls = parse_sitemap_index(args.sitemap_index)
     print(f"Found {len(sitemap_urls)} sitemaps in the index")
     
+    resolver = resolver_from_args(args)
+    if resolver:
+        sitemap_urls = resolver.children(sitemap_urls)
+        print(f"Reading {len(sitemap_urls)} child sitemaps from local files")
+    
     # Download and parse all sitemaps
+    if args.bytes_mode:
+        parse_func = parse_url_bytes_from_sitemap
+    else:
+        parse_func = partial(parse_urls_from_sitemap, fast_scan=args.fast_scan)
+    parser_name = 'scan' if args.bytes_mode or args.fast_scan else 'lxml'
+    if args.parse_cache is not None:
+        parse_cache_dir = Path(args.parse_cache) if args.parse_cache else DEFAULT_PARSE_CACHE_DIR
+        parse_func = partial(cached_parse, parse_func=parse_func, parser=parser_name,
+                             cache_dir=parse_cache_dir, as_bytes=args.bytes_mode)
+    
+    def fetch(sitemap_url):
+        return fetch_child_sitemap(sitemap_url, output_dir, download_sitemap, resolver)
+    
+    # With checkpoints, every completed download, parse and classification is recorded as it happens
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = RunCheckpoint(
+            output_dir, args.sitemap_index, checkpoint_key(parser_name),
+            checkpoint_key(blacklist_patterns, whitelist_patterns, args.dedup, args.bloom_capacity, args.bloom_error),
+            resume=args.resume)
+        fetch = partial(checkpoint.fetch, fetch_func=fetch)
+    
     all_urls = []
-    for i, sitemap_url in enumerate(sitemap_urls):
-        print(f"Processing sitemap [{i+1}/{len(sitemap_urls)}]: {sitemap_url}")
-        sitemap_file = download_sitemap(sitemap_url, output_dir)
-        if sitemap_file:
-            urls = parse_urls_from_sitemap(sitemap_file)
-            print(f"  Found {len(urls)} URLs in sitemap")
+    # (sitemap_file, start, end) range of all_urls per child sitemap
+    sitemap_slices = []
+    deduplicator = make_deduplicator(args.dedup, args.bloom_capacity, args.bloom_error)
+    total_duplicates = 0
+    if args.workers > 1 or args.recursive:
+        # Fetch all children first, then parse them (in a process pool with --workers)
+        if args.recursive:
+            sitemap_files = traverse_sitemap_tree(
+                sitemap_urls,
+                fetch,
+                parse_sitemap_index,
+                workers=args.fetch_workers, per_host=args.per_host, max_depth=args.max_depth)
+        else:
+            sitemap_files = []
+            for i, sitemap_url in enumerate(sitemap_urls):
+                print(f"Downloading sitemap [{i+1}/{len(sitemap_urls)}]: {sitemap_url}")
+                sitemap_file = fetch(sitemap_url)
+                if sitemap_file:
+                    sitemap_files.append(sitemap_file)
+        
+        if args.workers > 1:
+            print(f"Parsing {len(sitemap_files)} sitemaps with {args.workers} worker processes")
+        if checkpoint is not None:
+            parsed = parse_with_checkpoint(checkpoint, parse_func, sitemap_files, args.workers, args.bytes_mode)
+        else:
+            parsed = parse_sitemaps(parse_func, sitemap_files, args.workers, args.bytes_mode)
+        for sitemap_file, urls in parsed:
+            print(f"  Found {len(urls)} URLs in {Path(sitemap_file).name}")
+            urls, duplicates = dedup_urls(urls, deduplicator)
+            if duplicates:
+                print(f"  Dropped {duplicates} duplicate URLs")
+            total_duplicates += duplicates
+            sitemap_slices.append((sitemap_file, len(all_urls), len(all_urls) + len(urls)))
             all_urls.extend(urls)
+    else:
+        for i, sitemap_url in enumerate(sitemap_urls):
+            print(f"Processing sitemap [{i+1}/{len(sitemap_urls)}]: {sitemap_url}")
+            sitemap_file = fetch(sitemap_url)
+            if sitemap_file:
+                if checkpoint is not None:
+                    urls = checkpoint.parse(sitemap_file, parse_func, args.bytes_mode)
+                else:
+                    urls = parse_func(sitemap_file)
+                print(f"  Found {len(urls)} URLs in sitemap")
+                urls, duplicates = dedup_urls(urls, deduplicator)
+                if duplicates:
+                    print(f"  Dropped {duplicates} duplicate URLs")
+                total_duplicates += duplicates
+                sitemap_slices.append((sitemap_file, len(all_urls), len(all_urls) + len(urls)))
+                all_urls.extend(urls)
     
     print(f"\nTotal URLs found: {len(all_urls)}")
+    if deduplicator is not None:
+        print(f"Duplicate URLs dropped: {total_duplicates}")
     
-    # Write out all URLs for reference
-    all_urls_file = output_dir / "all_urls.txt"
-    with open(all_urls_file, 'w', encoding='utf-8') as f:
-        for url in all_urls:
-            f.write(f"{url}\n")
+    # Write out all URLs for reference right away, so an interrupted run keeps them
+    write_lines(output_dir / "all_urls.txt", all_urls, args.compress)
+    
+    # The other URL list outputs are collected here and written together at the end
+    url_outputs = {}
     
     # Filter URLs
-    filtered_urls, blacklisted_urls = filter_urls(all_urls, blacklist_patterns, whitelist_patterns)
+    if args.explain or args.rule_stats or checkpoint is not None:
+        classifier = URLClassifier(blacklist_patterns, whitelist_patterns, pattern_cache_dir,
+                                   args.backend, backend_sample(all_urls, args.bytes_mode))
+        if args.rule_stats:
+            rule_stats = read_rule_stats(args.rule_stats)
+            if rule_stats is None:
+                print("No saved rule statistics, ordering rules by a warm-up sample")
+                classifier.warm_up(all_urls, as_bytes=args.bytes_mode)
+            else:
+                classifier.reorder(rule_stats)
+        if checkpoint is not None:
+            filtered_urls, blacklisted_urls, rule_ids = classify_with_checkpoint(
+                checkpoint, classifier, all_urls, sitemap_slices, args.bytes_mode)
+        else:
+            filtered_urls, blacklisted_urls, rule_ids = classifier.split_explained(all_urls, args.bytes_mode)
+        if args.rule_stats:
+            write_rule_stats(args.rule_stats, classifier.rule_stats(rule_ids))
+            print(f"Saved rule hit statistics to: {args.rule_stats}")
+        
+        if args.explain:
+            write_rule_ids(output_dir / "rule_ids.i32", rule_ids)
+            classifier.write_rules(output_dir / "rules.tsv")
+            
+            print("\nTop deciding rules:")
+            for rule_id, count in Counter(rule_ids).most_common(11):
+                if rule_id >= 0:
+                    list_name, pattern = classifier.rule(rule_id)
+                    print(f"  [{rule_id}] {list_name} {pattern}: {count} URLs")
+    else:
+        filtered_urls, blacklisted_urls = filter_urls(all_urls, blacklist_patterns, whitelist_patterns,
+                                                      pattern_cache_dir, args.backend, args.bytes_mode)
     
     # Save blacklist and whitelist patterns
-    with open(output_dir / "blacklist_patterns.txt", 'w', encoding='utf-8') as f:
-        for pattern in blacklist_patterns:
-            f.write(f"{pattern}\n")
-    
-    with open(output_dir / "whitelist_patterns.txt", 'w', encoding='utf-8') as f:
-        for pattern in whitelist_patterns:
-            f.write(f"{pattern}\n")
+    write_lines(output_dir / "blacklist_patterns.txt", blacklist_patterns)
+    write_lines(output_dir / "whitelist_patterns.txt", whitelist_patterns)
     
     # Analyze URL patterns by path
     print("\nAnalyzing URL patterns by path structure...")
@@ -321,14 +507,22 @@ def main():
             "game_modes": r"/wiki/Game_modes|/wiki/Clash|/wiki/ARAM|/wiki/URF",
         }
         
-        # Group URLs
+        # Group URLs (the regexes only run on URLs containing their required literals,
+        # case-sensitively on the lowered URL)
+        category_sets = {category: [pattern] for category, pattern in categories.items()}
+        compiled = load_compiled_patterns(category_sets, cache_dir=pattern_cache_dir)
+        folded = load_compiled_patterns(category_sets, cache_dir=pattern_cache_dir, fold=True)
+        compiled_categories = {category: PrefilteredPattern(compiled[category][0], pattern, folded[category][0])
+                               for category, pattern in categories.items()}
         categorized_urls = {category: [] for category in categories}
         uncategorized = []
         
         for url in filtered_urls:
             categorized = False
-            for category, pattern in categories.items():
-                if re.search(pattern, url, re.IGNORECASE):
+            text = display_url(url)
+            lower = fold_url(text)
+            for category, pattern in compiled_categories.items():
+                if pattern.search(text, lower):
                     categorized_urls[category].append(url)
                     categorized = True
                     break
@@ -338,27 +532,20 @@ def main():
         
         # Save categorized URLs
         for category, urls in categorized_urls.items():
-            with open(output_dir / f"{category}_urls.txt", 'w', encoding='utf-8') as f:
-                for url in urls:
-                    f.write(f"{url}\n")
+            url_outputs[output_dir / f"{category}_urls.txt"] = urls
             print(f"  {category}: {len(urls)} URLs")
         
         # Save uncategorized URLs
-        with open(output_dir / "uncategorized_urls.txt", 'w', encoding='utf-8') as f:
-            for url in uncategorized:
-                f.write(f"{url}\n")
+        url_outputs[output_dir / "uncategorized_urls.txt"] = uncategorized
         print(f"  uncategorized: {len(uncategorized)} URLs")
     
     # Save filtered and blacklisted URLs
-    output_file = output_dir / "filtered_urls.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for url in filtered_urls:
-            f.write(f"{url}\n")
-    
-    blacklist_output = output_dir / "blacklisted_urls.txt"
-    with open(blacklist_output, 'w', encoding='utf-8') as f:
-        for url in blacklisted_urls:
-            f.write(f"{url}\n")
+    url_outputs[output_dir / "filtered_urls.txt"] = filtered_urls
+    url_outputs[output_dir / "blacklisted_urls.txt"] = blacklisted_urls
+    written = write_outputs(url_outputs, args.compress, args.output_workers)
+    output_file, blacklist_output = written[-2:]
+    if checkpoint is not None:
+        checkpoint.finish()
     
     print(f"\nFiltering Results:")
     print(f"  Total URLs: {len(all_urls)}")
@@ -371,13 +558,13 @@ def main():
     print("\nSample of filtered (kept) URLs:")
     sample_size = min(5, len(filtered_urls))
     for i, url in enumerate(filtered_urls[:sample_size]):
-        print(f"  {i+1}. {url}")
+        print(f"  {i+1}. {display_url(url)}")
     
     # Sample of blacklisted URLs
     print("\nSample of blacklisted URLs:")
     sample_size = min(5, len(blacklisted_urls))
     for i, url in enumerate(blacklisted_urls[:sample_size]):
-        print(f"  {i+1}. {url}")
+        print(f"  {i+1}. {display_url(url)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,83 +1,136 @@
 #!/usr/bin/env python3
 import re
+import json
 import argparse
 import urllib.parse
 from collections import Counter
 from pathlib import Path
 
-def analyze_urls(urls_file, output_dir=None):
+from output_writer import open_input, write_lines
+
+# Organizational page categories. Each category maps rule kinds to keyword
+# lists; "i"-prefixed kinds match case-insensitively, "path_" kinds look at the
+# whole URL path instead of just the page name.
+DEFAULT_CATEGORIES = {
+    'disambiguation': {'contains': ['(disambiguation)', '_disambiguation']},
+    'list_pages': {'prefix': ['List_of_'], 'icontains': ['_list'], 'path_contains': ['/List_']},
+    'index_pages': {'suffix': ['_index'], 'prefix': ['Index_of_'], 'contains': ['_index_']},
+    'category_pages': {'prefix': ['Category:'], 'icontains': ['_category', '_categories']},
+    'collection_pages': {'icontains': ['collection', 'group', 'series', 'set', 'related', 'overview']},
+    'admin_pages': {'icontains': ['admin', 'policy', 'guideline', 'rules', 'help', 'sandbox']},
+    'stub_pages': {'icontains': ['_stub', 'stub_']},
+    'template_pages': {'prefix': ['Template:'], 'icontains': ['_template']},
+    'portal_pages': {'prefix': ['Portal:'], 'icontains': ['portal_', '_portal']},
+    'organizational': {'icontains': [
+        'navigation', 'redirect', 'table_of_contents', 'toc', 'sitemap', 'contents',
+        'directory', 'glossary', 'terminology', 'classifications', 'catalog'
+    ]},
+}
+
+# Rule kind -> (anchor, scope, case_sensitive)
+RULE_KINDS = {
+    'prefix': ('prefix', 'page', True),
+    'iprefix': ('prefix', 'page', False),
+    'suffix': ('suffix', 'page', True),
+    'isuffix': ('suffix', 'page', False),
+    'contains': ('contains', 'page', True),
+    'icontains': ('contains', 'page', False),
+    'path_contains': ('contains', 'path', True),
+    'ipath_contains': ('contains', 'path', False),
+}
+
+class OrganizationalPageMatcher:
+    """Match a URL path against every organizational category in a single scan."""
+
+    def __init__(self, categories=None):
+        if categories is None:
+            categories = DEFAULT_CATEGORIES
+        self.categories = list(categories)
+
+        rules_by_keyword = {}
+        for category, spec in categories.items():
+            for kind, terms in spec.items():
+                if kind not in RULE_KINDS:
+                    raise ValueError(f"Unknown rule kind '{kind}' in category '{category}'")
+                anchor, scope, case_sensitive = RULE_KINDS[kind]
+                for term in terms:
+                    keyword = term.lower()
+                    rule = (category, anchor, scope, case_sensitive, term, len(keyword))
+                    rules_by_keyword.setdefault(keyword, []).append(rule)
+
+        # The lookahead scanner only reports the longest keyword starting at each
+        # position, so every keyword also carries the rules of the shorter
+        # keywords that are prefixes of it.
+        keywords = sorted(rules_by_keyword, key=len, reverse=True)
+        self._rules = {
+            keyword: [rule for other in keywords if keyword.startswith(other)
+                      for rule in rules_by_keyword[other]]
+            for keyword in keywords
+        }
+        self._scanner = None
+        if keywords:
+            alternation = '|'.join(re.escape(keyword) for keyword in keywords)
+            self._scanner = re.compile(f"(?=({alternation}))")
+
+    def match(self, path):
+        """Return the categories whose rules match the given URL path."""
+        if self._scanner is None:
+            return []
+
+        lowered = path.lower()
+        name_start = lowered.rfind('/') + 1
+        page_name = path.split('/')[-1]
+
+        matched = set()
+        for m in self._scanner.finditer(lowered):
+            start = m.start()
+            for category, anchor, scope, case_sensitive, term, length in self._rules[m.group(1)]:
+                if category in matched:
+                    continue
+                if scope == 'page' and start < name_start:
+                    continue
+                if anchor == 'prefix' and start != name_start:
+                    continue
+                if anchor == 'suffix' and start + length != len(lowered):
+                    continue
+                if case_sensitive:
+                    # Re-check against the original casing
+                    text = page_name if scope == 'page' else path
+                    if anchor == 'prefix':
+                        if not text.startswith(term):
+                            continue
+                    elif anchor == 'suffix':
+                        if not text.endswith(term):
+                            continue
+                    elif term not in text:
+                        continue
+                matched.add(category)
+
+        return [category for category in self.categories if category in matched]
+
+def load_categories(categories_file):
+    """Load organizational category definitions from a JSON file."""
+    with open(categories_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def analyze_urls(urls_file, output_dir=None, categories=None):
     """Analyze URLs to identify patterns of organizational pages."""
-    with open(urls_file, 'r', encoding='utf-8') as f:
+    with open_input(urls_file) as f:
         urls = [line.strip() for line in f if line.strip()]
     
     print(f"Analyzing {len(urls)} URLs...")
     
-    # Extract patterns
-    patterns = {
-        'disambiguation': [],
-        'list_pages': [],
-        'index_pages': [],
-        'category_pages': [],
-        'collection_pages': [],
-        'admin_pages': [],
-        'stub_pages': [],
-        'template_pages': [],
-        'portal_pages': [],
-        'organizational': [],
-    }
+    matcher = OrganizationalPageMatcher(categories)
+    patterns = {category: [] for category in matcher.categories}
     
-    # General patterns
+    # Classify each URL and collect URL structure in one pass
+    path_components = Counter()
     for url in urls:
         path = urllib.parse.urlparse(url).path
-        page_name = path.split('/')[-1]
-        
-        # Disambiguation pages
-        if '(disambiguation)' in page_name or '_disambiguation' in page_name:
-            patterns['disambiguation'].append(url)
-        
-        # List pages
-        if page_name.startswith('List_of_') or '_list' in page_name.lower() or '/List_' in path:
-            patterns['list_pages'].append(url)
-        
-        # Index pages
-        if page_name.endswith('_index') or page_name.startswith('Index_of_') or '_index_' in page_name:
-            patterns['index_pages'].append(url)
-        
-        # Category pages (beyond /wiki/Category: which should already be filtered)
-        if page_name.startswith('Category:') or '_category' in page_name.lower() or '_categories' in page_name.lower():
-            patterns['category_pages'].append(url)
-        
-        # Collection/grouping pages
-        if any(term in page_name.lower() for term in ['collection', 'group', 'series', 'set', 'related', 'overview']):
-            patterns['collection_pages'].append(url)
-        
-        # Administrative/meta pages
-        if any(term in page_name.lower() for term in ['admin', 'policy', 'guideline', 'rules', 'help', 'sandbox']):
-            patterns['admin_pages'].append(url)
         
-        # Stub pages
-        if '_stub' in page_name.lower() or 'stub_' in page_name.lower():
-            patterns['stub_pages'].append(url)
+        for category in matcher.match(path):
+            patterns[category].append(url)
         
-        # Template pages
-        if page_name.startswith('Template:') or '_template' in page_name.lower():
-            patterns['template_pages'].append(url)
-        
-        # Portal pages
-        if page_name.startswith('Portal:') or 'portal_' in page_name.lower() or '_portal' in page_name.lower():
-            patterns['portal_pages'].append(url)
-        
-        # General organizational indicators
-        if any(term in page_name.lower() for term in [
-            'navigation', 'redirect', 'table_of_contents', 'toc', 'sitemap', 'contents',
-            'directory', 'glossary', 'terminology', 'classifications', 'catalog'
-        ]):
-            patterns['organizational'].append(url)
-    
-    # URL structure analysis
-    path_components = Counter()
-    for url in urls:
-        path = urllib.parse.urlparse(url).path
         parts = path.strip('/').split('/')
         if len(parts) > 2:  # more than /wiki/PageName
             for i in range(2, len(parts)):
@@ -126,19 +179,13 @@ def analyze_urls(urls_file, output_dir=None):
         
         for pattern_type, urls_list in patterns.items():
             if urls_list:
-                with open(output_path / f"{pattern_type}_urls.txt", 'w', encoding='utf-8') as f:
-                    for url in urls_list:
-                        f.write(f"{url}\n")
+                write_lines(output_path / f"{pattern_type}_urls.txt", urls_list)
         
         # Save all organizational URLs in one file
-        with open(output_path / "all_organizational_urls.txt", 'w', encoding='utf-8') as f:
-            for url in sorted(all_organizational):
-                f.write(f"{url}\n")
+        write_lines(output_path / "all_organizational_urls.txt", sorted(all_organizational))
         
         # Save suggested blacklist patterns
-        with open(output_path / "suggested_blacklist_patterns.txt", 'w', encoding='utf-8') as f:
-            for pattern in blacklist_suggestions:
-                f.write(f"{pattern}\n")
+        write_lines(output_path / "suggested_blacklist_patterns.txt", blacklist_suggestions)
         
         print(f"\nResults saved to {output_dir}/")
     
@@ -148,9 +195,12 @@ def main():
     parser = argparse.ArgumentParser(description='Find organizational pages in a URL list')
     parser.add_argument('urls_file', help='Path to file containing URLs to analyze')
     parser.add_argument('--output-dir', '-o', default=None, help='Directory to save categorized URLs')
+    parser.add_argument('--categories-file', default=None,
+                        help='JSON file with organizational category definitions (replaces the defaults)')
     
     args = parser.parse_args()
-    analyze_urls(args.urls_file, args.output_dir)
+    categories = load_categories(args.categories_file) if args.categories_file else None
+    analyze_urls(args.urls_file, args.output_dir, categories)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""Required-literal prefilters for regex rules.
+
+A pattern's parse tree gives the literal substrings any match must
+contain, e.g. "/wiki/legendary_" and "_item" for /wiki/Legendary_.*_Item,
+or one of "/wiki/runeterra", "/wiki/universe" for an alternation. Checking
+those with substring tests on the case-folded URL rejects almost every
+non-matching URL before the regex engine runs.
+
+The literals are a necessary condition only, so results are unchanged.
+Checks are skipped for non-ASCII URLs, where case folding for `in` and
+for re.IGNORECASE can differ. Given the case-folded form of the pattern
+(see case_fold), the regex also runs case-sensitively on the folded URL.
+"""
+import re
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parser
+except ImportError:
+    import sre_constants
+    import sre_parse as sre_parser
+
+# Cap on the number of literal alternatives tracked per pattern
+MAX_ALTERNATIVES = 16
+
+def _product(alternatives, other):
+    combined = [a + b for a in alternatives for b in other]
+    return combined if len(combined) <= MAX_ALTERNATIVES else alternatives
+
+def _requirements(items, prefix=''):
+    # Alternatives (lists of literals) of which a match must satisfy at least one;
+    # prefix is literal text that directly precedes items
+    alternatives = [[]]
+    run = list(prefix)
+
+    def flush():
+        if run:
+            for alternative in alternatives:
+                alternative.append(''.join(run).lower())
+            run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        if op is sre_constants.AT:
+            # Anchors are zero-width, so the literals around them stay adjacent
+            continue
+        if op is sre_constants.BRANCH:
+            # Common prefixes are factored out of alternations; glue them back on
+            branches = []
+            for branch in av[1]:
+                branches.extend(_requirements(branch, ''.join(run)))
+            if all(branches):
+                run.clear()
+                alternatives = _product(alternatives, branches)
+            else:
+                flush()
+            continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            alternatives = _product(alternatives, _requirements(av[-1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            alternatives = _product(alternatives, _requirements(av[2]))
+    flush()
+    return alternatives
+
+def required_literals(pattern, flags=re.IGNORECASE):
+    """Return the alternatives of case-folded literals a match must contain, or None.
+
+    The result is a list of tuples: any string the pattern matches
+    contains every literal of at least one tuple. None means the pattern
+    has no usable literals.
+    """
+    alternatives = []
+    for alternative in _requirements(sre_parser.parse(pattern, flags)):
+        literals = tuple(dict.fromkeys(literal for literal in alternative if literal))
+        if not literals:
+            return None
+        alternatives.append(literals)
+    return alternatives or None
+
+class PrefilteredPattern:
+    """A compiled pattern whose search first checks the pattern's required literals."""
+
+    def __init__(self, regex, pattern=None, folded=None):
+        self.regex = regex
+        self.folded = folded
+        self.pattern = regex.pattern if pattern is None else pattern
+        self.alternatives = required_literals(self.pattern, regex.flags)
+
+    def might_match(self, lower):
+        """Whether the case-folded ASCII text contains the literals of some alternative."""
+        if self.alternatives is None:
+            return True
+        for literals in self.alternatives:
+            for literal in literals:
+                if literal not in lower:
+                    break
+            else:
+                return True
+        return False
+
+    def search(self, url, lower=None):
+        """re.Pattern.search, skipped when the URL lacks the required literals.
+
+        lower may pass in url.lower() for an ASCII url to avoid recomputing it.
+        """
+        if lower is None:
+            if not url.isascii():
+                return self.regex.search(url)
+            lower = url.lower()
+        if not self.might_match(lower):
+            return None
+        if self.folded is not None:
+            return self.folded.search(lower)
+        return self.regex.search(url)
+
+class PrefilterIndex:
+    """Finds the patterns, out of many, that could match a URL with one scan of key literals.
+
+    Each pattern is filed under the longest literal of each of its
+    alternatives; patterns without literals are always candidates.
+    Candidates come back in rank order, which is rule order unless ranks
+    (rule_id -> position) say otherwise.
+    """
+
+    def __init__(self, entries, ranks=None):
+        # entries: (rule_id, PrefilteredPattern) pairs
+        self.always = []
+        by_literal = {}
+        for rule_id, pattern in entries:
+            rank = ranks[rule_id] if ranks is not None else rule_id
+            if pattern.alternatives is None:
+                self.always.append((rank, (rule_id, pattern)))
+                continue
+            for literals in pattern.alternatives:
+                # Later literals tend to be more specific than a shared /wiki/ prefix
+                key = max(reversed(literals), key=len)
+                by_literal.setdefault(key, {})[rank] = (rule_id, pattern)
+        self.by_literal = [(key, list(patterns.items())) for key, patterns in by_literal.items()]
+
+    def candidates(self, lower):
+        """Return the (rule_id, pattern) pairs that could match, in rank order."""
+        found = list(self.always)
+        for key, patterns in self.by_literal:
+            if key in lower:
+                found.extend(patterns)
+        if len(found) > 1:
+            found = sorted(dict(found).items())
+        return [entry for _, entry in found]
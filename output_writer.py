@@ -0,0 +1,76 @@
+"""Buffered, optionally compressed and concurrent writers for URL list outputs."""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+import gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+BUFFER_SIZE = 1 << 20
+BATCH_SIZE = 10000
+
+def output_path(path, compression=None):
+    """Return the file name an output is written to, including any compression suffix."""
+    path = Path(path)
+    if compression:
+        return path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+    return path
+
+def open_output(path, compression=None, binary=False):
+    """Open a text file (or a binary one) for writing with a large buffer, compressed if requested."""
+    if compression is None:
+        if binary:
+            return open(path, 'wb', buffering=BUFFER_SIZE)
+        return open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+    if compression == 'gzip':
+        if binary:
+            return gzip.open(path, 'wb', compresslevel=6)
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        return zstandard.open(path, 'wb' if binary else 'wt', encoding=None if binary else 'utf-8')
+    raise ValueError(f"Unknown compression '{compression}'")
+
+def open_input(path):
+    """Open a text file written by open_output, decompressing by file suffix."""
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("reading .zst files requires the 'zstandard' package")
+        return zstandard.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+def write_lines(path, lines, compression=None):
+    """Write lines to a file in large joined batches; return the path written.
+
+    Lines may be str or UTF-8 bytes; bytes are written without decoding.
+    """
+    path = output_path(path, compression)
+    lines = iter(lines)
+    batch = list(islice(lines, BATCH_SIZE))
+    binary = bool(batch) and isinstance(batch[0], bytes)
+    newline = b'\n' if binary else '\n'
+    with open_output(path, compression, binary) as f:
+        while batch:
+            f.write(newline.join(batch))
+            f.write(newline)
+            batch = list(islice(lines, BATCH_SIZE))
+    return path
+
+def write_outputs(outputs, compression=None, workers=1):
+    """Write several {path: lines} outputs, concurrently when workers > 1.
+
+    Returns the written paths in the same order as outputs.
+    """
+    if workers <= 1 or len(outputs) <= 1:
+        return [write_lines(path, lines, compression) for path, lines in outputs.items()]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(write_lines, path, lines, compression) for path, lines in outputs.items()]
+        return [future.result() for future in futures]
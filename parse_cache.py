@@ -0,0 +1,112 @@
+"""On-disk cache of parsed sitemaps, keyed by file content.
+
+A child sitemap whose bytes were parsed before (in any run, under any file
+name, downloaded or local) is not parsed again: its <loc> and <lastmod>
+columns are loaded from a compact binary file instead. The key is a hash
+of the file content plus the name of the parser, so a changed sitemap or a
+different parser simply misses.
+
+File layout: a fixed header (magic, version, flags, entry count and the
+size of each column) followed by the loc column and the lastmod column,
+each the UTF-8 values joined with NUL, which cannot occur in XML text.
+The lastmod column is absent when lastmods could not be paired with the
+locs (irregular documents go through the full parser, which only returns
+locs).
+"""
+from pathlib import Path
+import hashlib
+import os
+import struct
+
+from pattern_cache import DEFAULT_CACHE_DIR
+from sitemap_scanner import map_sitemap_file, scan_sitemap_lastmods
+
+PARSE_CACHE_VERSION = 1
+DEFAULT_PARSE_CACHE_DIR = DEFAULT_CACHE_DIR / 'parsed'
+
+_MAGIC = b'LSPC'
+_HEADER = struct.Struct('<4sHHIQQ')
+_HAS_LASTMODS = 1
+_SEPARATOR = b'\0'
+
+def sitemap_digest(file_path):
+    """Hex digest of a sitemap file's content."""
+    with map_sitemap_file(file_path) as buffer:
+        return hashlib.blake2b(buffer, digest_size=20).hexdigest()
+
+def _join(values):
+    return _SEPARATOR.join(value if isinstance(value, bytes) else value.encode('utf-8') for value in values)
+
+def _split(blob, count, as_bytes):
+    if count == 0:
+        return []
+    values = blob.split(_SEPARATOR) if as_bytes else blob.decode('utf-8').split('\0')
+    return values if len(values) == count else None
+
+def write_parse_cache(cache_file, locs, lastmods=None):
+    """Write loc (and optionally lastmod) columns to a parse cache file, atomically."""
+    locs_blob = _join(locs)
+    lastmods_blob = _join(lastmods) if lastmods is not None else b''
+    flags = _HAS_LASTMODS if lastmods is not None else 0
+    cache_file = Path(cache_file)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, PARSE_CACHE_VERSION, flags, len(locs), len(locs_blob), len(lastmods_blob)))
+        f.write(locs_blob)
+        f.write(lastmods_blob)
+    os.replace(tmp_file, cache_file)
+
+def read_parse_cache(cache_file, as_bytes=False):
+    """Return (locs, lastmods) from a parse cache file, or None if it is missing or invalid.
+
+    lastmods is None when the file has no lastmod column. With as_bytes the
+    values are UTF-8 bytes instead of str.
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, flags, count, locs_size, lastmods_size = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != PARSE_CACHE_VERSION or len(data) != _HEADER.size + locs_size + lastmods_size:
+        return None
+    start = _HEADER.size
+    try:
+        locs = _split(data[start:start + locs_size], count, as_bytes)
+        lastmods = _split(data[start + locs_size:], count, as_bytes) if flags & _HAS_LASTMODS else None
+    except UnicodeDecodeError:
+        return None
+    if locs is None or (flags & _HAS_LASTMODS and lastmods is None):
+        return None
+    return locs, lastmods
+
+def load_sitemap_columns(file_path, parse_func, parser, cache_dir=DEFAULT_PARSE_CACHE_DIR, as_bytes=False):
+    """Return (locs, lastmods) for a sitemap, parsing it only if its content is not cached.
+
+    parse_func(file_path) returns the locs; parser names what it does (e.g.
+    'scan' or 'lxml') and is part of the key. lastmods is None when they
+    cannot be paired with the locs.
+    """
+    cache_file = Path(cache_dir) / f"{sitemap_digest(file_path)}-{parser}.bin"
+    cached = read_parse_cache(cache_file, as_bytes)
+    if cached is not None:
+        return cached
+
+    locs = [loc for loc in parse_func(file_path) if loc is not None]
+    lastmods = scan_sitemap_lastmods(file_path)
+    if lastmods is not None and len(lastmods) != len(locs):
+        lastmods = None
+    try:
+        write_parse_cache(cache_file, locs, lastmods)
+    except OSError as e:
+        print(f"Could not write parse cache {cache_file}: {e}")
+    if lastmods is not None and not as_bytes:
+        lastmods = [lastmod.decode('ascii') for lastmod in lastmods]
+    return locs, lastmods
+
+def cached_parse(file_path, parse_func, parser, cache_dir=DEFAULT_PARSE_CACHE_DIR, as_bytes=False):
+    """parse_func(file_path) through the parse cache: the locs of load_sitemap_columns."""
+    return load_sitemap_columns(file_path, parse_func, parser, cache_dir, as_bytes)[0]
@@ -0,0 +1,141 @@
+"""On-disk cache of compiled pattern sets, keyed by pattern content and flags.
+
+re.Pattern objects pickle as their source and are recompiled on load, so the
+cache stores the compiled SRE program instead and rebuilds patterns with
+_sre.compile, skipping the (pure Python) parse and compile steps. The key
+includes the interpreter version and SRE magic number, and anything
+unexpected falls back to a normal re.compile.
+
+Patterns can also be stored case-folded (see case_fold): compiled without
+IGNORECASE for matching against URLs that were lowered once up front.
+"""
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import re
+import sys
+
+import _sre
+
+from case_fold import fold_parsed
+
+try:
+    from re import _compiler as sre_compiler, _parser as sre_parser
+except ImportError:
+    import sre_compile as sre_compiler
+    import sre_parse as sre_parser
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = Path(os.environ.get('LOL_PATTERN_CACHE_DIR',
+                                        Path.home() / '.cache' / 'lol_sitemap_parser'))
+
+# Artifacts already loaded in this process, by cache key, least recently
+# used first; long-running processes (filter_server.py reloading edited
+# pattern files) keep only the most recent ones
+MEMORY_CACHE_SIZE = 32
+_memory_cache = OrderedDict()
+
+def clear_memory_cache():
+    """Forget the artifacts loaded in this process, so the next loads build or read them again."""
+    _memory_cache.clear()
+
+def freeze_pattern(pattern, flags=0, fold=False):
+    """Compile a pattern to a picklable tuple that thaw_pattern turns back into a re.Pattern.
+
+    With fold, the case-folded form is compiled instead, or None is
+    returned if the pattern cannot be folded. If the private sre APIs do
+    not behave as expected, only (pattern, flags) is kept and thaw_pattern
+    recompiles it.
+    """
+    parsed = sre_parser.parse(pattern, flags)
+    if fold:
+        flags = fold_parsed(parsed)
+        if flags is None:
+            return None
+    try:
+        code = [int(op) for op in sre_compiler._code(parsed, flags)]
+    except (TypeError, AttributeError, ValueError):
+        return None if fold else (pattern, flags)
+    groupindex = dict(parsed.state.groupdict)
+    indexgroup = [None] * parsed.state.groups
+    for name, index in groupindex.items():
+        indexgroup[index] = name
+    return (pattern, flags | parsed.state.flags, code, parsed.state.groups - 1,
+            groupindex, tuple(indexgroup))
+
+def thaw_pattern(frozen, fold=False):
+    """Rebuild a re.Pattern from freeze_pattern output without re-parsing it.
+
+    Folded patterns that cannot be rebuilt come back as None, so callers
+    fall back to the case-insensitive original.
+    """
+    if frozen is None:
+        return None
+    try:
+        return _sre.compile(*frozen)
+    except Exception:
+        return None if fold else re.compile(frozen[0], frozen[1])
+
+def cache_key(*parts):
+    """Hash the given parts together with the interpreter and SRE versions."""
+    digest = hashlib.sha256()
+    for part in (CACHE_VERSION, sys.version, _sre.MAGIC) + parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def cached_artifact(key, build, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the artifact cached under key, building and storing it on a miss.
+
+    build() must return a picklable object. With cache_dir set to None only
+    the in-process cache is used.
+    """
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    artifact = None
+    cache_file = Path(cache_dir) / f"{key}.pickle" if cache_dir is not None else None
+    if cache_file is not None and cache_file.exists():
+        try:
+            with open(cache_file, 'rb') as f:
+                artifact = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable pattern cache {cache_file}: {e}")
+
+    if artifact is None:
+        artifact = build()
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_file, cache_file)
+            except OSError as e:
+                print(f"Could not write pattern cache {cache_file}: {e}")
+
+    _memory_cache[key] = artifact
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return artifact
+
+def load_compiled_patterns(pattern_sets, flags=re.IGNORECASE, cache_dir=DEFAULT_CACHE_DIR, fold=False):
+    """Compile named pattern lists, loading them from the cache when unchanged.
+
+    pattern_sets maps a name (e.g. 'blacklist') to a list of pattern strings;
+    the result maps the same names to lists of compiled patterns. With fold,
+    the lists hold case-folded patterns, or None where folding is not possible.
+    """
+    pattern_sets = {name: list(patterns or []) for name, patterns in pattern_sets.items()}
+    key = cache_key('patterns', flags, fold, sorted(pattern_sets.items()))
+
+    def build():
+        return {name: [freeze_pattern(pattern, flags, fold) for pattern in patterns]
+                for name, patterns in pattern_sets.items()}
+
+    frozen_sets = cached_artifact(key, build, cache_dir)
+    return {name: [thaw_pattern(frozen, fold) for frozen in frozen_list]
+            for name, frozen_list in frozen_sets.items()}
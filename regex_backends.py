@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""Interchangeable matching backends for ordered pattern lists.
+
+Every backend builds a matcher for a list of patterns whose
+first_match(url) returns the index of the first pattern that matches
+(as re.search(pattern, url, re.IGNORECASE) would), or -1:
+
+  re       stdlib re behind url_fields.FieldRuleSet's tables and prefilters
+  regex    the third-party regex module, one pattern at a time
+  re2      google-re2, every pattern in one RE2 set
+  literal  one scan of the case-folded URL, for lists of plain literals
+
+Patterns a backend cannot compile run with stdlib re instead. URLs outside
+a backend's exact domain also go to stdlib re: non-ASCII or multi-line
+URLs for regex and re2, whose Unicode classes, case folding and $ differ
+from re, and non-ASCII URLs for literal.
+
+Example (compare the backends on the local sitemaps):
+  python regex_backends.py lol_narrative_sitemaps/sitemap-*.xml \\
+      --blacklist-file massive_blacklist.txt --whitelist-file enhanced_whitelist.txt
+"""
+from pathlib import Path
+import argparse
+import re
+import time
+
+from case_fold import fold_url
+from pattern_cache import DEFAULT_CACHE_DIR, clear_memory_cache, load_compiled_patterns
+from sitemap_ingest import read_corpus
+from url_fields import FieldRuleSet, parse_literal
+
+try:
+    import regex as regex_module
+except ImportError:
+    regex_module = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+BACKENDS = ('re', 'regex', 're2', 'literal')
+AUTO_SAMPLE = 2000
+
+def _in_exact_domain(url):
+    return url.isascii() and '\n' not in url
+
+def build_re(patterns, cache_dir=DEFAULT_CACHE_DIR):
+    """Matcher running stdlib re through field tables (the default engine)."""
+    pattern_sets = {'patterns': patterns}
+    compiled = load_compiled_patterns(pattern_sets, cache_dir=cache_dir)['patterns']
+    folded = load_compiled_patterns(pattern_sets, cache_dir=cache_dir, fold=True)['patterns']
+    return FieldRuleSet(patterns, compiled, folded)
+
+class _BackendMatcher:
+    """Shared parts of the non-default matchers: stdlib re for the URLs they cannot decide."""
+
+    def __init__(self, patterns, cache_dir):
+        self.patterns = list(patterns)
+        self.fallback = build_re(self.patterns, cache_dir)
+        self.unsupported = []
+
+    def regex_first_match(self, url):
+        return self.first_match(url)
+
+    def reorder(self, hits):
+        # The backend decides its own evaluation order
+        pass
+
+class RegexModuleMatcher(_BackendMatcher):
+    """Patterns compiled with the regex module (V0, re-compatible syntax), tried in order."""
+
+    def __init__(self, patterns, cache_dir=DEFAULT_CACHE_DIR):
+        super().__init__(patterns, cache_dir)
+        self.searches = []
+        for rule_id, (pattern, compiled) in enumerate(zip(self.patterns, self.fallback.compiled)):
+            try:
+                search = regex_module.compile(pattern, regex_module.IGNORECASE | regex_module.V0).search
+            except regex_module.error:
+                search = compiled.search
+                self.unsupported.append(pattern)
+            self.searches.append((rule_id, search))
+
+    def first_match(self, url, fields=None):
+        if not _in_exact_domain(url):
+            return self.fallback.regex_first_match(url)
+        for rule_id, search in self.searches:
+            if search(url):
+                return rule_id
+        return -1
+
+class RE2SetMatcher(_BackendMatcher):
+    """One RE2 set holding every pattern RE2 accepts; the rest run with stdlib re."""
+
+    def __init__(self, patterns, cache_dir=DEFAULT_CACHE_DIR):
+        super().__init__(patterns, cache_dir)
+        options = re2.Options()
+        options.case_sensitive = False
+        self.set = re2.Set.SearchSet(options)
+        self.set_rule_ids = []
+        self.stdlib = []
+        for rule_id, (pattern, compiled) in enumerate(zip(self.patterns, self.fallback.compiled)):
+            try:
+                self.set.Add(pattern)
+            except re2.error:
+                self.stdlib.append((rule_id, compiled.search))
+                self.unsupported.append(pattern)
+                continue
+            self.set_rule_ids.append(rule_id)
+        self.set.Compile()
+
+    def first_match(self, url, fields=None):
+        if not _in_exact_domain(url):
+            return self.fallback.regex_first_match(url)
+        best = len(self.patterns)
+        for index in self.set.Match(url) or ():
+            best = min(best, self.set_rule_ids[index])
+        for rule_id, search in self.stdlib:
+            if rule_id >= best:
+                break
+            if search(url):
+                best = rule_id
+                break
+        return best if best < len(self.patterns) else -1
+
+class LiteralMatcher(_BackendMatcher):
+    """Plain literal patterns found with a single lookahead scan of the lowered URL.
+
+    The scanner reports the longest literal starting at each position, so
+    each literal also carries the lowest rule ID of the literals that are
+    prefixes of it.
+    """
+
+    def __init__(self, patterns, cache_dir=DEFAULT_CACHE_DIR):
+        super().__init__(patterns, cache_dir)
+        rule_ids = {}
+        self.stdlib = []
+        for rule_id, (pattern, compiled) in enumerate(zip(self.patterns, self.fallback.compiled)):
+            literal = parse_literal(pattern)
+            if literal is None:
+                self.stdlib.append((rule_id, compiled.search))
+                self.unsupported.append(pattern)
+            else:
+                rule_ids.setdefault(literal.lower(), rule_id)
+
+        literals = sorted(rule_ids, key=len, reverse=True)
+        self.rule_ids = {literal: min(rule_ids[other] for other in literals if literal.startswith(other))
+                         for literal in literals}
+        # The empty pattern matches everywhere; the scanner cannot report it
+        self.empty_rule_id = self.rule_ids.pop('', None)
+        self._scanner = None
+        if self.rule_ids:
+            alternation = '|'.join(re.escape(literal) for literal in literals if literal)
+            self._scanner = re.compile(f"(?=({alternation}))")
+
+    def first_match(self, url, fields=None):
+        lower = fields.lower if fields is not None else fold_url(url)
+        if lower is None:
+            return self.fallback.regex_first_match(url)
+        best = len(self.patterns)
+        if self.empty_rule_id is not None:
+            best = self.empty_rule_id
+        if self._scanner is not None:
+            rule_ids = self.rule_ids
+            for m in self._scanner.finditer(lower):
+                rule_id = rule_ids[m.group(1)]
+                if rule_id < best:
+                    best = rule_id
+        for rule_id, search in self.stdlib:
+            if rule_id >= best:
+                break
+            if search(url):
+                best = rule_id
+                break
+        return best if best < len(self.patterns) else -1
+
+_MATCHERS = {'regex': RegexModuleMatcher, 're2': RE2SetMatcher, 'literal': LiteralMatcher}
+
+def available_backends():
+    """Return the backend names whose modules are installed."""
+    return [name for name in BACKENDS
+            if (name != 'regex' or regex_module is not None) and (name != 're2' or re2 is not None)]
+
+def supports(backend, patterns):
+    """Whether a backend can run every pattern natively (no per-pattern fallback)."""
+    if backend == 're':
+        return True
+    if backend == 'literal':
+        return all(parse_literal(pattern) is not None for pattern in patterns)
+    if backend == 'regex':
+        if regex_module is None:
+            return False
+        try:
+            for pattern in patterns:
+                regex_module.compile(pattern, regex_module.IGNORECASE | regex_module.V0)
+        except regex_module.error:
+            return False
+        return True
+    if backend == 're2':
+        if re2 is None:
+            return False
+        options = re2.Options()
+        options.case_sensitive = False
+        try:
+            for pattern in patterns:
+                re2.compile(pattern, options)
+        except re2.error:
+            return False
+        return True
+    raise ValueError(f"Unknown matching backend '{backend}'")
+
+def build_matcher(patterns, backend='re', cache_dir=DEFAULT_CACHE_DIR, sample_urls=None):
+    """Build a first_match matcher for patterns with the named backend.
+
+    'auto' picks the fastest available backend that supports every pattern,
+    timed on sample_urls (or the re matcher without a sample). A backend
+    whose module is missing falls back to re.
+    """
+    patterns = list(patterns)
+    if backend == 'auto':
+        return choose_matcher(patterns, sample_urls, cache_dir)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown matching backend '{backend}'")
+    if backend not in available_backends():
+        print(f"Matching backend '{backend}' is not installed, using 're'")
+        backend = 're'
+    if backend == 're':
+        return build_re(patterns, cache_dir)
+    matcher = _MATCHERS[backend](patterns, cache_dir)
+    if matcher.unsupported:
+        print(f"Matching backend '{backend}': {len(matcher.unsupported)} of {len(patterns)} "
+              f"patterns run with 're' instead")
+    return matcher
+
+def time_matcher(matcher, urls):
+    """Return the seconds matcher takes to find the first match of every URL."""
+    first_match = matcher.first_match
+    start = time.perf_counter()
+    for url in urls:
+        first_match(url)
+    return time.perf_counter() - start
+
+def choose_matcher(patterns, sample_urls=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the matcher of the fastest fully supporting backend on sample_urls."""
+    candidates = [name for name in available_backends() if supports(name, patterns)]
+    if not sample_urls or len(candidates) == 1:
+        return build_re(patterns, cache_dir)
+    step = max(1, len(sample_urls) // AUTO_SAMPLE)
+    sample = sample_urls[::step][:AUTO_SAMPLE]
+    best = None
+    for name in candidates:
+        matcher = build_re(patterns, cache_dir) if name == 're' else _MATCHERS[name](patterns, cache_dir)
+        elapsed = time_matcher(matcher, sample)
+        if best is None or elapsed < best[0]:
+            best = (elapsed, matcher)
+    return best[1]
+
+def read_benchmark_urls(files):
+    """Read URLs from sitemap XML files (<url> locs only) or URL list files."""
+    from sitemap_scanner import recover_sitemap_locs, scan_sitemap_locs
+    urls = []
+    for file_path in files:
+        if Path(file_path).suffix == '.xml':
+            locs = scan_sitemap_locs(file_path)
+            if locs is None:
+                locs, _ = recover_sitemap_locs(file_path, include_sitemap_locs=False)
+            urls.extend(locs)
+        else:
+            urls.extend(read_corpus([file_path]))
+    return urls
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the matching backends on pattern files and a URL corpus.')
+    parser.add_argument('corpus', nargs='+',
+                        help='Sitemap XML files or URL list files to match against')
+    parser.add_argument('--blacklist-file', action='append', default=[],
+                        help='Blacklist pattern file to benchmark (can be repeated)')
+    parser.add_argument('--whitelist-file', action='append', default=[],
+                        help='Whitelist pattern file to benchmark (can be repeated)')
+    parser.add_argument('--backend', action='append', choices=BACKENDS, default=None,
+                        help='Backend to include (default: every installed backend)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed passes per backend; the fastest is reported')
+    args = parser.parse_args()
+
+    from url_classifier import read_patterns
+    urls = read_benchmark_urls(args.corpus)
+    print(f"Loaded {len(urls)} URLs")
+    backends = args.backend or available_backends()
+    missing = [name for name in backends if name not in available_backends()]
+    if missing:
+        print(f"Not installed: {', '.join(missing)}")
+
+    pattern_files = args.whitelist_file + args.blacklist_file
+    if not pattern_files:
+        parser.error('give at least one --blacklist-file or --whitelist-file')
+    for file_path in pattern_files:
+        patterns = read_patterns(file_path)
+        print(f"\n{file_path}: {len(patterns)} patterns")
+        reference = None
+        reference_name = None
+        results = []
+        for name in backends:
+            if name in missing:
+                continue
+            # Build from scratch: no on-disk cache, and nothing left over from the previous backend
+            clear_memory_cache()
+            start = time.perf_counter()
+            matcher = _MATCHERS[name](patterns, None) if name != 're' else build_re(patterns, None)
+            build_time = time.perf_counter() - start
+            elapsed = min(time_matcher(matcher, urls) for _ in range(args.repeat))
+            decisions = [matcher.first_match(url) for url in urls]
+            if reference is None:
+                reference, reference_name = decisions, name
+            agrees = decisions == reference
+            results.append((elapsed, name))
+            native = len(patterns) - len(getattr(matcher, 'unsupported', []))
+            print(f"  {name:8} build {build_time * 1000:8.1f} ms  match {elapsed * 1000:8.1f} ms  "
+                  f"({len(urls) / elapsed:,.0f} URLs/s, {native}/{len(patterns)} native"
+                  f"{'' if agrees else ', DISAGREES with ' + reference_name})")
+        if results:
+            print(f"  fastest: {min(results)[1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Durable per-child checkpoints so an interrupted final_filter run can resume.
+
+A run with checkpoints keeps, in <output_dir>/checkpoint:
+
+  manifest.json    what the run is (sitemap index, parse and classify keys)
+  progress.jsonl   one line per completed stage of a child sitemap:
+                   downloaded (the local file), parsed (its URLs) or
+                   classified (the deciding rule of each URL)
+  *.urls, *.rules  the parsed URLs (parse_cache format) and rule IDs
+                   (url_classifier.write_rule_ids format) of each child
+
+Downloads are keyed by child URL, parsed URLs by a digest of the sitemap
+file's content and rule IDs by a digest of the URLs classified, so an
+entry only ever applies to the exact input it was computed from.
+
+Data files are written under a temporary name and renamed into place
+before their progress line is appended, so a run killed at any point
+leaves only complete entries behind (a torn last line is ignored).
+Resuming skips every stage already recorded. Parsed URLs are stored
+before deduplication, so the deduplicator is rebuilt exactly by replaying
+them in order. A different parse key (index or parser) discards the
+checkpoint; a different classify key (patterns or dedup settings) only
+discards the classified stages.
+"""
+from array import array
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from parse_cache import read_parse_cache, sitemap_digest, write_parse_cache
+from sitemap_ingest import parse_sitemaps
+from url_classifier import read_rule_ids, write_rule_ids
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_DIR = 'checkpoint'
+
+def checkpoint_key(*parts):
+    """Hash the parts of a run configuration into a short key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+def urls_digest(urls):
+    """Hex digest of a list of URLs (str or UTF-8 bytes)."""
+    digest = hashlib.blake2b(digest_size=20)
+    for url in urls:
+        digest.update(url if isinstance(url, bytes) else url.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class RunCheckpoint:
+    """The recorded progress of one run, appended to as children complete."""
+
+    def __init__(self, output_dir, sitemap_index, parse_key, classify_key, resume=False):
+        self.directory = Path(output_dir) / CHECKPOINT_DIR
+        self.downloads = {}
+        self.parsed = {}
+        self.classified = {}
+        manifest = {'version': CHECKPOINT_VERSION, 'sitemap_index': str(sitemap_index),
+                    'parse_key': parse_key, 'classify_key': classify_key}
+        self.resumed = resume and self._load(manifest)
+        if not self.resumed:
+            if self.directory.exists():
+                shutil.rmtree(self.directory)
+            self.directory.mkdir(parents=True)
+            self._write_manifest(dict(manifest, started=time.strftime('%Y-%m-%dT%H:%M:%S'), complete=False))
+        self._progress = open(self.directory / 'progress.jsonl', 'a', encoding='utf-8')
+        if self.resumed and self._torn:
+            # End the torn line so the next entry starts on its own
+            self._progress.write('\n')
+        # Recursive traversal fetches children from several threads
+        self._lock = threading.Lock()
+
+    def _load(self, manifest):
+        try:
+            with open(self.directory / 'manifest.json', 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            print("No checkpoint to resume from, starting a new run")
+            return False
+        if any(saved.get(key) != manifest[key] for key in ('version', 'sitemap_index', 'parse_key')):
+            print("Checkpoint is from a different sitemap index or parser, starting a new run")
+            return False
+        keep_classified = saved.get('classify_key') == manifest['classify_key']
+        if not keep_classified:
+            print("Patterns or dedup settings changed since the checkpoint, classifying again")
+        try:
+            with open(self.directory / 'progress.jsonl', 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+        self._torn = bool(lines) and not lines[-1].endswith('\n')
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by the interruption
+                continue
+            if entry['stage'] == 'downloaded':
+                self.downloads[entry['child']] = entry['file']
+            elif entry['stage'] == 'parsed':
+                self.parsed[entry['digest']] = entry
+            elif entry['stage'] == 'classified' and keep_classified:
+                self.classified[entry['digest']] = entry
+        self._write_manifest(dict(saved, classify_key=manifest['classify_key'], complete=False))
+        print(f"Resuming from checkpoint: {len(self.downloads)} downloaded, {len(self.parsed)} parsed, "
+              f"{len(self.classified)} classified sitemaps")
+        return True
+
+    def _write_manifest(self, manifest):
+        tmp_file = self.directory / 'manifest.json.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, self.directory / 'manifest.json')
+        self.manifest = manifest
+
+    def _record(self, entry):
+        with self._lock:
+            self._progress.write(json.dumps(entry) + '\n')
+            self._progress.flush()
+
+    def fetch(self, sitemap_url, fetch_func):
+        """Return the local file of a child sitemap, calling fetch_func only if it was not fetched before."""
+        file_path = self.downloads.get(sitemap_url)
+        if file_path is not None and Path(file_path).is_file():
+            return Path(file_path)
+        file_path = fetch_func(sitemap_url)
+        if file_path:
+            self.downloads[sitemap_url] = str(file_path)
+            self._record({'stage': 'downloaded', 'child': sitemap_url, 'file': str(file_path)})
+        return file_path
+
+    def load_parsed(self, digest, as_bytes=False):
+        """The URLs recorded for the sitemap content with this digest (see sitemap_digest), or None."""
+        entry = self.parsed.get(digest)
+        if entry is None:
+            return None
+        cached = read_parse_cache(self.directory / entry['data'], as_bytes)
+        return cached[0] if cached is not None else None
+
+    def save_parsed(self, digest, urls):
+        """Record the parsed URLs of the sitemap content with this digest; return them without missing entries."""
+        urls = [url for url in urls if url is not None]
+        entry = {'stage': 'parsed', 'digest': digest, 'data': digest + '.urls', 'urls': len(urls)}
+        write_parse_cache(self.directory / entry['data'], urls)
+        self.parsed[digest] = entry
+        self._record(entry)
+        return urls
+
+    def parse(self, sitemap_file, parse_func, as_bytes=False):
+        """parse_func(sitemap_file), unless URLs were already recorded for the file's content."""
+        digest = sitemap_digest(sitemap_file)
+        urls = self.load_parsed(digest, as_bytes)
+        if urls is None:
+            urls = self.save_parsed(digest, parse_func(sitemap_file))
+        return urls
+
+    def load_classified(self, urls):
+        """The rule IDs recorded for exactly these URLs, or None."""
+        entry = self.classified.get(urls_digest(urls))
+        if entry is None or entry['urls'] != len(urls):
+            return None
+        try:
+            rule_ids = read_rule_ids(self.directory / entry['data'])
+        except OSError:
+            return None
+        return rule_ids if len(rule_ids) == len(urls) else None
+
+    def save_classified(self, urls, rule_ids):
+        """Record the deciding rule IDs of these URLs."""
+        digest = urls_digest(urls)
+        entry = {'stage': 'classified', 'digest': digest, 'data': digest + '.rules', 'urls': len(rule_ids)}
+        tmp_file = self.directory / (entry['data'] + '.tmp')
+        write_rule_ids(tmp_file, rule_ids)
+        os.replace(tmp_file, self.directory / entry['data'])
+        self.classified[digest] = entry
+        self._record(entry)
+
+    def finish(self):
+        """Mark the run complete (its outputs are written)."""
+        self._progress.close()
+        self._write_manifest(dict(self.manifest, complete=True))
+
+def parse_with_checkpoint(checkpoint, parse_func, sitemap_files, workers=1, as_bytes=False):
+    """Like sitemap_ingest.parse_sitemaps, but only parse the files without a parsed checkpoint.
+
+    Yields (sitemap_file, urls) pairs in the order of sitemap_files; newly
+    parsed files are checkpointed as they come in.
+    """
+    digests = [sitemap_digest(sitemap_file) for sitemap_file in sitemap_files]
+    loaded = [checkpoint.load_parsed(digest, as_bytes) for digest in digests]
+    pending = [sitemap_file for sitemap_file, urls in zip(sitemap_files, loaded) if urls is None]
+    if len(pending) < len(sitemap_files):
+        print(f"Loaded {len(sitemap_files) - len(pending)} parsed sitemaps from the checkpoint")
+    parsed = parse_sitemaps(parse_func, pending, workers, as_bytes)
+    for sitemap_file, digest, urls in zip(sitemap_files, digests, loaded):
+        if urls is None:
+            sitemap_file, urls = next(parsed)
+            urls = checkpoint.save_parsed(digest, urls)
+        yield sitemap_file, urls
+
+def classify_with_checkpoint(checkpoint, classifier, urls, sitemap_slices, as_bytes=False):
+    """Like URLClassifier.split_explained, classifying one sitemap at a time and checkpointing each.
+
+    sitemap_slices lists (sitemap_file, start, end) ranges of urls; ranges
+    with a classified checkpoint are not classified again.
+    """
+    rule_ids = array('i')
+    for _, start, end in sitemap_slices:
+        child_urls = urls[start:end]
+        child_rule_ids = checkpoint.load_classified(child_urls)
+        if child_rule_ids is None:
+            _, _, child_rule_ids = classifier.split_explained(child_urls, as_bytes)
+            checkpoint.save_classified(child_urls, child_rule_ids)
+        rule_ids.extend(child_rule_ids)
+    kept = []
+    dropped = []
+    blacklist_offset = classifier.blacklist_offset
+    for url, rule_id in zip(urls, rule_ids):
+        if rule_id < blacklist_offset:
+            kept.append(url)
+        else:
+            dropped.append(url)
+    return kept, dropped, rule_ids
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import xml.etree.ElementTree as ET
 from lxml import etree
-from bs4 import BeautifulSoup
 import requests
 import argparse
 from urllib.parse import urlparse
@@ -9,6 +8,14 @@ import re
 import sys
 from pathlib import Path
 
+from sitemap_ingest import (
+    add_local_source_arguments, child_sitemap_filename, fetch_child_sitemap, resolver_from_args
+)
+from output_writer import write_lines
+from corpus_index import CorpusIndex, coverage_counts
+from url_classifier import URLClassifier
+from sitemap_scanner import recover_sitemap_locs
+
 # Predefined blacklist patterns - be careful with shared lore terms
 DEFAULT_BLACKLIST = [
     # Game-specific markers in titles
@@ -41,27 +48,20 @@ def parse_sitemap_index(file_path):
         for sitemap in root.xpath('.//sm:sitemap/sm:loc', namespaces=ns):
             sitemap_urls.append(sitemap.text)
             
-        # If no URLs found, try alternative approach with BeautifulSoup
+        # If no URLs found, try the recovery parser
         if not sitemap_urls:
-            return parse_sitemap_index_bs4(file_path)
+            return parse_sitemap_index_recover(file_path)
             
         return sitemap_urls
     except Exception as e:
         print(f"Error parsing with lxml: {e}")
-        # Fallback to BeautifulSoup
-        return parse_sitemap_index_bs4(file_path)
-        
-def parse_sitemap_index_bs4(file_path):
-    """Parse sitemap index using BeautifulSoup as fallback."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    soup = BeautifulSoup(content, 'xml')
-    sitemap_urls = []
-    
-    for loc in soup.find_all('loc'):
-        sitemap_urls.append(loc.text)
+        # Fall back to the recovery parser
+        return parse_sitemap_index_recover(file_path)
         
+def parse_sitemap_index_recover(file_path):
+    """Parse a malformed sitemap index with the streaming recovery parser."""
+    sitemap_urls, skipped = recover_sitemap_locs(file_path)
+    print(f"Recovered {len(sitemap_urls)} sitemaps from {file_path} (skipped {skipped} bytes)")
     return sitemap_urls
 
 def download_sitemap(url, output_dir):
@@ -71,13 +71,7 @@ def download_sitemap(url, output_dir):
         print(f"Failed to download {url}")
         return None
     
-    # Create a filename based on the URL
-    parsed_url = urlparse(url)
-    filename = Path(parsed_url.path).name
-    if not filename:
-        filename = f"sitemap-{hash(url)}.xml"
-    
-    output_path = Path(output_dir) / filename
+    output_path = Path(output_dir) / child_sitemap_filename(url)
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(response.text)
     
@@ -108,50 +102,28 @@ def parse_urls_from_sitemap(file_path):
         for url_element in loc_elements:
             urls.append(url_element.text)
         
-        # If still no URLs found, try with BeautifulSoup
+        # If still no URLs found, try the recovery parser
         if not urls:
-            return parse_urls_from_sitemap_bs4(file_path)
+            return parse_urls_from_sitemap_recover(file_path)
         
         return urls
     except Exception as e:
         print(f"Error parsing {file_path} with lxml: {e}")
-        return parse_urls_from_sitemap_bs4(file_path)
+        return parse_urls_from_sitemap_recover(file_path)
 
-def parse_urls_from_sitemap_bs4(file_path):
-    """Parse URLs from sitemap using BeautifulSoup as fallback."""
+def parse_urls_from_sitemap_recover(file_path):
+    """Parse URLs from a malformed sitemap with the streaming recovery parser."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'xml')
-        urls = []
-        
-        # Try to find all loc elements (could be under url or directly)
-        for loc in soup.find_all('loc'):
-            # Check if this is part of a sitemap index
-            if loc.parent.name != 'sitemap':
-                urls.append(loc.text)
-        
+        urls, skipped = recover_sitemap_locs(file_path, include_sitemap_locs=False)
+        print(f"  Recovered {len(urls)} URLs from {file_path} (skipped {skipped} bytes)")
         return urls
     except Exception as e:
-        print(f"Error parsing {file_path} with BeautifulSoup: {e}")
+        print(f"Error recovering URLs from {file_path}: {e}")
         return []
 
 def filter_urls(urls, blacklist_patterns):
     """Filter URLs based on blacklist patterns."""
-    filtered_urls = []
-    blacklisted_urls = []
-    
-    compiled_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist_patterns]
-    
-    for url in urls:
-        is_blacklisted = any(pattern.search(url) for pattern in compiled_patterns)
-        if is_blacklisted:
-            blacklisted_urls.append(url)
-        else:
-            filtered_urls.append(url)
-    
-    return filtered_urls, blacklisted_urls
+    return URLClassifier(blacklist_patterns).split(urls)
 
 def interactive_blacklist_builder(urls, initial_blacklist=None):
     """Interactively build a blacklist by examining sample URLs."""
@@ -162,6 +134,9 @@ def interactive_blacklist_builder(urls, initial_blacklist=None):
     
     compiled_blacklist = [re.compile(pattern, re.IGNORECASE) for pattern in blacklist]
     
+    # Sorted page index, so prefix patterns are counted by binary search
+    index = CorpusIndex.build(urls)
+    
     # Show existing patterns first
     if blacklist:
         print("\nExisting blacklist patterns:")
@@ -249,7 +224,7 @@ def interactive_blacklist_builder(urls, initial_blacklist=None):
                     print(f"Added pattern: {pattern}")
                     
                     # Show how many URLs this would match
-                    matches = sum(1 for url in urls if re.search(pattern, url, re.IGNORECASE))
+                    matches = coverage_counts([pattern], urls, index, cache_dir=None)[pattern]
                     print(f"This pattern would match {matches} URLs ({matches/len(urls)*100:.2f}% of total)")
                 except re.error:
                     print("Invalid regex pattern.")
@@ -263,7 +238,7 @@ def interactive_blacklist_builder(urls, initial_blacklist=None):
                     print(f"Added pattern: {pattern}")
                     
                     # Show how many URLs this would match
-                    matches = sum(1 for url in urls if re.search(pattern, url, re.IGNORECASE))
+                    matches = coverage_counts([pattern], urls, index, cache_dir=None)[pattern]
                     print(f"This pattern would match {matches} URLs ({matches/len(urls)*100:.2f}% of total)")
                 except re.error:
                     print("Invalid regex pattern.")
@@ -288,6 +263,7 @@ def main():
                         help='Enter interactive mode to build blacklist patterns')
     parser.add_argument('--no-default-blacklist', action='store_true',
                         help='Do not use the default blacklist patterns')
+    add_local_source_arguments(parser)
     args = parser.parse_args()
 
     # Set up blacklist patterns
@@ -316,11 +292,16 @@ def main():
     sitemap_urls = parse_sitemap_index(args.sitemap_index)
     print(f"Found {len(sitemap_urls)} sitemaps in the index")
     
+    resolver = resolver_from_args(args)
+    if resolver:
+        sitemap_urls = resolver.children(sitemap_urls)
+        print(f"Reading {len(sitemap_urls)} child sitemaps from local files")
+    
     # Download and parse all sitemaps
     all_urls = []
     for sitemap_url in sitemap_urls:
         print(f"Downloading sitemap: {sitemap_url}")
-        sitemap_file = download_sitemap(sitemap_url, output_dir)
+        sitemap_file = fetch_child_sitemap(sitemap_url, output_dir, download_sitemap, resolver)
         if sitemap_file:
             urls = parse_urls_from_sitemap(sitemap_file)
             print(f"  Found {len(urls)} URLs in sitemap")
@@ -340,19 +321,13 @@ def main():
     
     # Save results
     output_file = output_dir / "filtered_urls.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for url in filtered_urls:
-            f.write(f"{url}\n")
+    write_lines(output_file, filtered_urls)
     
     blacklist_output = output_dir / "blacklisted_urls.txt"
-    with open(blacklist_output, 'w', encoding='utf-8') as f:
-        for url in blacklisted_urls:
-            f.write(f"{url}\n")
+    write_lines(blacklist_output, blacklisted_urls)
     
     patterns_output = output_dir / "blacklist_patterns.txt"
-    with open(patterns_output, 'w', encoding='utf-8') as f:
-        for pattern in blacklist_patterns:
-            f.write(f"{pattern}\n")
+    write_lines(patterns_output, blacklist_patterns)
     
     print(f"\nResults:")
     print(f"  Total URLs: {len(all_urls)}")
@@ -0,0 +1,341 @@
+"""Shared sitemap ingestion helpers for the filter and analysis scripts."""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from urllib.parse import urlparse, urlunparse, quote, unquote
+import argparse
+import glob
+import hashlib
+import math
+import re
+import threading
+
+from output_writer import open_input
+
+# NUL cannot appear in XML 1.0 text, so it is a safe separator for URL batches
+BATCH_SEPARATOR = '\0'
+
+def encode_url_batch(urls):
+    """Pack a list of URLs (str, or UTF-8 bytes joined as is) into a single bytes blob."""
+    urls = [url for url in urls if url is not None]
+    if urls and isinstance(urls[0], bytes):
+        return BATCH_SEPARATOR.encode('ascii').join(urls)
+    return BATCH_SEPARATOR.join(urls).encode('utf-8')
+
+def decode_url_batch(batch, as_bytes=False):
+    """Unpack a bytes blob produced by encode_url_batch into a list of URLs (bytes with as_bytes)."""
+    if not batch:
+        return []
+    if as_bytes:
+        return batch.split(BATCH_SEPARATOR.encode('ascii'))
+    return batch.decode('utf-8').split(BATCH_SEPARATOR)
+
+def read_corpus(files):
+    """Read URL list files (one URL per line, optionally compressed) into a list."""
+    urls = []
+    for file_path in files:
+        with open_input(file_path) as f:
+            urls.extend(line.strip() for line in f if line.strip())
+    return urls
+
+def _parse_to_batch(parse_func, file_path):
+    """Worker: parse one sitemap and return its URLs as one compact batch."""
+    return encode_url_batch(parse_func(file_path))
+
+def parse_sitemaps_parallel(parse_func, sitemap_files, workers=None, as_bytes=False):
+    """Parse sitemap files in a process pool.
+
+    Yields (sitemap_file, urls) pairs in the same order as sitemap_files.
+    Each worker sends back a single bytes batch instead of pickling every
+    URL string separately.
+    """
+    sitemap_files = list(sitemap_files)
+    if not sitemap_files:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        batches = executor.map(_parse_to_batch, repeat(parse_func), sitemap_files)
+        for sitemap_file, batch in zip(sitemap_files, batches):
+            yield sitemap_file, decode_url_batch(batch, as_bytes)
+
+def parse_sitemaps(parse_func, sitemap_files, workers=1, as_bytes=False):
+    """Parse sitemap files serially, or in a process pool when workers > 1.
+
+    Yields (sitemap_file, urls) pairs in the same order as sitemap_files.
+    as_bytes says parse_func returns UTF-8 bytes URLs, which are passed
+    back from the workers without decoding.
+    """
+    if workers > 1:
+        yield from parse_sitemaps_parallel(parse_func, sitemap_files, workers, as_bytes)
+        return
+    for sitemap_file in sitemap_files:
+        yield sitemap_file, parse_func(sitemap_file)
+
+def _natural_key(path):
+    """Sort key that orders sitemap-2.xml before sitemap-10.xml."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', str(path))]
+
+class LocalSitemapResolver:
+    """Map sitemap index entries to files on disk instead of downloading them.
+
+    Entries are resolved in order by: an existing local path or file:// URL,
+    the first matching (prefix, replacement) rewrite rule, and finally the
+    entry's download name (see child_sitemap_filename) or file name inside
+    local_dir. With child_glob set, the index
+    entries are ignored and the matching files are used instead.
+    """
+
+    def __init__(self, local_dir=None, rewrites=None, child_glob=None):
+        self.local_dir = Path(local_dir) if local_dir is not None else None
+        self.rewrites = list(rewrites or [])
+        self.child_glob = child_glob
+
+    def children(self, sitemap_urls):
+        """Return the child sitemap entries to process."""
+        if self.child_glob:
+            return sorted(glob.glob(self.child_glob), key=_natural_key)
+        return list(sitemap_urls)
+
+    def resolve(self, sitemap_url):
+        """Return the local file for a child sitemap entry, or None if there is none."""
+        parsed = urlparse(sitemap_url)
+        if parsed.scheme == 'file':
+            candidates = [Path(unquote(parsed.path))]
+        elif not parsed.scheme:
+            candidates = [Path(sitemap_url)]
+        else:
+            candidates = []
+        
+        for prefix, replacement in self.rewrites:
+            if sitemap_url.startswith(prefix):
+                candidates.append(Path(replacement + sitemap_url[len(prefix):]))
+                break
+        
+        if self.local_dir is not None:
+            # A directory of earlier downloads, then one of plain file names
+            candidates.append(self.local_dir / child_sitemap_filename(sitemap_url))
+            filename = Path(parsed.path).name
+            if filename:
+                candidates.append(self.local_dir / filename)
+        
+        for candidate in candidates:
+            if candidate.is_file():
+                return candidate
+        return None
+
+def rewrite_rule(rule):
+    """argparse type for --rewrite: split PREFIX=PATH into a (prefix, path) pair."""
+    prefix, sep, replacement = rule.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"invalid rewrite rule '{rule}', expected PREFIX=PATH")
+    return prefix, replacement
+
+def add_local_source_arguments(parser):
+    """Add the local-ingestion command line options to an argparse parser."""
+    parser.add_argument('--local-dir', nargs='?', const='', default=None,
+                        help='Read child sitemaps from this directory by file name instead of '
+                             'downloading them (no value: the sitemap index directory)')
+    parser.add_argument('--rewrite', action='append', type=rewrite_rule, default=None, metavar='PREFIX=PATH',
+                        help='Map child sitemap URLs starting with PREFIX to local PATH (can be used multiple times)')
+    parser.add_argument('--child-glob', default=None,
+                        help='Ignore the index entries and read child sitemaps matching this glob')
+
+def resolver_from_args(args):
+    """Build a LocalSitemapResolver from parsed arguments, or None for network mode."""
+    if args.local_dir is None and not args.rewrite and not args.child_glob:
+        return None
+    
+    local_dir = args.local_dir
+    if local_dir == '':
+        local_dir = Path(args.sitemap_index).parent
+    
+    return LocalSitemapResolver(local_dir, args.rewrite, args.child_glob)
+
+def child_sitemap_filename(sitemap_url):
+    """Local file name for a downloaded child sitemap.
+
+    A short hash of the full URL precedes the URL's file name, so children
+    that share a file name (/a/sitemap.xml and /b/sitemap.xml) do not
+    overwrite each other.
+    """
+    filename = Path(urlparse(sitemap_url).path).name or 'sitemap.xml'
+    digest = hashlib.blake2b(sitemap_url.encode('utf-8'), digest_size=5).hexdigest()
+    return f"{digest}-{filename}"
+
+def fetch_child_sitemap(sitemap_url, output_dir, download_func, resolver=None):
+    """Return a local file for a child sitemap, downloading it only without a resolver."""
+    if resolver is None:
+        return download_func(sitemap_url, output_dir)
+    
+    sitemap_file = resolver.resolve(sitemap_url)
+    if sitemap_file is None:
+        print(f"  No local file found for {sitemap_url}")
+    return sitemap_file
+
+# Characters left unescaped in canonical paths (besides letters, digits and _.-~)
+_PATH_SAFE = "/:@!$&'()*+,;="
+_ENCODED_SLASH = re.compile('%2f', re.IGNORECASE)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """Return the canonical form of a URL used for duplicate detection.
+
+    Lowercases the scheme and host, drops default ports and fragments,
+    makes percent-encoding consistent (so %27 and ' compare equal) and
+    removes trailing slashes from the path. Escapes that are not valid
+    UTF-8 are kept as they are, and a URL that cannot be parsed (a bad port
+    or IPv6 host) is its own canonical form.
+    """
+    url = url.strip()
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        return url
+    scheme = parsed.scheme.lower()
+    
+    netloc = (parsed.hostname or '').lower()
+    if ':' in netloc:
+        netloc = f"[{netloc}]"
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    userinfo, at, _ = parsed.netloc.rpartition('@')
+    netloc = userinfo + at + netloc
+    
+    # Decode and re-encode each segment, keeping encoded slashes distinct;
+    # surrogateescape carries undecodable escapes through unchanged
+    path = '%2F'.join(quote(unquote(segment, errors='surrogateescape'), safe=_PATH_SAFE, errors='surrogateescape')
+                      for segment in _ENCODED_SLASH.split(parsed.path))
+    path = path.rstrip('/') or '/'
+    
+    return urlunparse((scheme, netloc, path, parsed.params, parsed.query, ''))
+
+def _url_digest(url):
+    if isinstance(url, bytes):
+        # Normalization needs the text
+        url = url.decode('utf-8')
+    return hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=16).digest()
+
+class HashSetDeduplicator:
+    """Exact duplicate detection using a set of 64-bit hashes of canonical URLs."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def add(self, url):
+        """Record a URL; return False if an equivalent URL was already seen."""
+        key = int.from_bytes(_url_digest(url)[:8], 'little')
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+class BloomDeduplicator:
+    """Memory-bounded duplicate detection with a Bloom filter.
+
+    Uses a fixed bit array sized for `capacity` URLs at the given false
+    positive rate; a false positive drops a URL that was not a duplicate.
+    """
+
+    def __init__(self, capacity=10_000_000, error=0.001):
+        self.size = max(8, math.ceil(-capacity * math.log(error) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, url):
+        """Record a URL; return False if an equivalent URL was (probably) already seen."""
+        digest = _url_digest(url)
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        
+        new = False
+        for i in range(self.hashes):
+            bit = (h1 + i * h2) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                new = True
+        return new
+
+def make_deduplicator(mode, bloom_capacity=10_000_000, bloom_error=0.001):
+    """Create a deduplicator for the given mode ('exact', 'bloom' or 'off')."""
+    if mode == 'exact':
+        return HashSetDeduplicator()
+    if mode == 'bloom':
+        return BloomDeduplicator(bloom_capacity, bloom_error)
+    return None
+
+def dedup_urls(urls, deduplicator):
+    """Drop URLs already seen by the deduplicator; return (kept_urls, duplicate_count)."""
+    if deduplicator is None:
+        return urls, 0
+    kept = [url for url in urls if deduplicator.add(url)]
+    return kept, len(urls) - len(kept)
+
+_SITEMAP_INDEX_TAG = re.compile(rb'<(?:[\w.-]+:)?sitemapindex\b')
+
+def is_sitemap_index(file_path, head_size=4096):
+    """Check whether a sitemap file is a sitemap index by looking at its root element."""
+    with open(file_path, 'rb') as f:
+        head = f.read(head_size)
+    return bool(_SITEMAP_INDEX_TAG.search(head))
+
+def traverse_sitemap_tree(root_urls, fetch_func, parse_index_func, workers=8, per_host=2, max_depth=None):
+    """Breadth-first walk of a nested sitemap index tree.
+
+    Each level of the tree is fetched concurrently with fetch_func (at most
+    per_host requests in flight per host). Nested indexes are expanded with
+    parse_index_func, and sitemaps already visited (compared by normalized
+    URL) are skipped, so cyclic index trees terminate. Returns the local
+    files of all leaf sitemaps in breadth-first order.
+
+    Fetches of one level run at the same time, so fetch_func must give
+    every URL its own local file (see child_sitemap_filename).
+    """
+    host_limits = {}
+    lock = threading.Lock()
+    
+    def fetch(url):
+        host = urlparse(url).netloc
+        with lock:
+            limit = host_limits.setdefault(host, threading.Semaphore(per_host))
+        with limit:
+            return fetch_func(url)
+    
+    seen = set()
+    
+    def unvisited(urls):
+        fresh = []
+        for url in urls:
+            if not url:
+                continue
+            key = normalize_url(url)
+            if key in seen:
+                print(f"  Skipping already visited sitemap: {url}")
+                continue
+            seen.add(key)
+            fresh.append(url)
+        return fresh
+    
+    leaves = []
+    frontier = unvisited(root_urls)
+    depth = 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while frontier:
+            print(f"Fetching {len(frontier)} sitemaps at depth {depth}")
+            next_frontier = []
+            for url, sitemap_file in zip(frontier, executor.map(fetch, frontier)):
+                if not sitemap_file:
+                    continue
+                if not is_sitemap_index(sitemap_file):
+                    leaves.append(sitemap_file)
+                    continue
+                if max_depth is not None and depth >= max_depth:
+                    print(f"  Not expanding nested index beyond depth {max_depth}: {url}")
+                    continue
+                children = unvisited(parse_index_func(sitemap_file))
+                print(f"  Nested index {url}: {len(children)} new sitemaps")
+                next_frontier.extend(children)
+            frontier = next_frontier
+            depth += 1
+    
+    return leaves
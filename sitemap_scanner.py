@@ -0,0 +1,226 @@
+"""Fast byte-level extraction of <loc> entries from machine-generated sitemaps."""
+from contextlib import contextmanager
+import mmap
+import re
+
+_LOC = re.compile(rb'<loc>([^<]*)</loc>')
+_LOC_CLOSE = re.compile(rb'</loc>')
+_URL_OPEN = re.compile(rb'<url>')
+_URL_ENTRY = re.compile(rb'<url>(.*?)</url>', re.DOTALL)
+_LASTMOD = re.compile(rb'<lastmod>([^<]*)</lastmod>')
+_ENTITY = re.compile(r'&(?:(amp|lt|gt|quot|apos)|#([0-9]+)|#x([0-9a-fA-F]+));')
+_ENTITY_BYTES = re.compile(_ENTITY.pattern.encode('ascii'))
+_XML_ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', 'apos': "'"}
+_ENCODING_DECL = re.compile(rb'<\?xml[^>]*encoding=["\']([\w.-]+)["\']')
+_UTF8_NAMES = {b'utf-8', b'utf8'}
+
+# Comments, CDATA sections and DOCTYPE/ENTITY declarations all start with
+# "<!"; documents containing them go through the full XML parser instead
+_IRREGULAR_MARKER = b'<!'
+
+@contextmanager
+def map_sitemap_file(file_path):
+    """Memory-map a sitemap file read-only, falling back to reading it for empty files."""
+    with open(file_path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            yield f.read()
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+def _unescape(text):
+    def replace(m):
+        name, decimal, hexadecimal = m.groups()
+        if name:
+            return _XML_ENTITIES[name]
+        return chr(int(decimal) if decimal else int(hexadecimal, 16))
+    return _ENTITY.sub(replace, text)
+
+def _is_regular(buffer):
+    """Cheap structural check for a plain, UTF-8 <urlset> document."""
+    head = buffer[:1024]
+    declared = _ENCODING_DECL.search(head)
+    if declared and declared.group(1).lower() not in _UTF8_NAMES:
+        return False
+    if buffer.find(b'<urlset') < 0 or buffer.rfind(b'</urlset>') < 0:
+        return False
+    if buffer[buffer.rfind(b'</urlset>') + len(b'</urlset>'):].strip():
+        return False
+    return buffer.find(_IRREGULAR_MARKER) < 0
+
+def _unescape_bytes(data):
+    def replace(m):
+        return _unescape(m.group(0).decode('ascii')).encode('utf-8')
+    return _ENTITY_BYTES.sub(replace, data)
+
+def scan_sitemap_locs(file_path, as_bytes=False):
+    """Extract <url><loc> values by scanning the raw bytes of a sitemap.
+
+    Returns the list of URLs, or None when the document looks irregular
+    (non-UTF-8 encoding, comments, CDATA, declarations, <loc>/<url> tags
+    that do not pair up one to one, unknown entities, raw carriage returns
+    in a <loc>, which XML parsers normalize to newlines), in which case the
+    caller should use the full XML parser. With as_bytes the URLs are
+    UTF-8 bytes sliced from the document and are not decoded.
+    """
+    with map_sitemap_file(file_path) as buffer:
+        if not _is_regular(buffer):
+            return None
+
+        spans = _LOC.findall(buffer)
+        if not spans:
+            return None
+        if len(spans) != len(_LOC_CLOSE.findall(buffer)) or len(spans) != len(_URL_OPEN.findall(buffer)):
+            return None
+        # NUL cannot occur in XML text, so all spans are checked and decoded at once
+        data = b'\0'.join(spans)
+        if b'\r' in data:
+            return None
+
+        if as_bytes:
+            return _unescape_locs_bytes(data)
+
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+    if '&' in text:
+        # Every '&' must start one of the predefined or numeric entities
+        if text.count('&') != len(_ENTITY.findall(text)):
+            return None
+        separators = text.count('\0')
+        try:
+            text = _unescape(text)
+        except (ValueError, OverflowError):
+            return None
+        if text.count('\0') != separators:
+            return None
+    return text.split('\0')
+
+def _unescape_locs_bytes(data):
+    # Same checks as the text path, without decoding ASCII documents
+    if not data.isascii():
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    if b'&' in data:
+        if data.count(b'&') != len(_ENTITY_BYTES.findall(data)):
+            return None
+        separators = data.count(b'\0')
+        try:
+            data = _unescape_bytes(data)
+        except (ValueError, OverflowError, UnicodeEncodeError):
+            return None
+        if data.count(b'\0') != separators:
+            return None
+    return data.split(b'\0')
+
+def scan_sitemap_lastmods(file_path):
+    """Extract the <lastmod> of every <url> entry, in document order, by scanning raw bytes.
+
+    Entries without one get b''. Returns None for the documents
+    scan_sitemap_locs rejects, and when an entry has several lastmods or
+    one that is not plain ASCII text.
+    """
+    with map_sitemap_file(file_path) as buffer:
+        if not _is_regular(buffer):
+            return None
+        lastmods = []
+        for entry in _URL_ENTRY.finditer(buffer):
+            found = _LASTMOD.findall(entry.group(1))
+            if len(found) > 1:
+                return None
+            lastmod = found[0].strip() if found else b''
+            if not lastmod.isascii() or b'&' in lastmod or b'\r' in lastmod:
+                return None
+            lastmods.append(lastmod)
+        if len(lastmods) != len(_URL_OPEN.findall(buffer)):
+            return None
+    return lastmods
+
+_RECOVERY_TAG = re.compile(rb'<(/?)(?:[\w.-]+:)?(url|sitemap|loc)(?=[\s>/])[^<>]*>')
+_CDATA = re.compile(rb'^\s*<!\[CDATA\[(.*)\]\]>\s*$', re.DOTALL)
+
+def recover_sitemap_locs(file_path, include_sitemap_locs=True, chunk_size=1 << 20, max_loc_size=1 << 16):
+    """Salvage <loc> entries from a possibly malformed sitemap, one chunk at a time.
+
+    Memory use is bounded by chunk_size + max_loc_size regardless of file
+    size. Locs under a <sitemap> element are dropped unless
+    include_sitemap_locs is set. Returns (urls, skipped_bytes), where
+    skipped_bytes counts the bytes of <loc> regions that could not be
+    recovered (unterminated, oversized, nested markup or invalid UTF-8).
+    """
+    urls = []
+    skipped = 0
+    parent = None
+    carry = b''
+    
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer = carry + chunk
+            carry = b''
+            if not buffer:
+                break
+            
+            loc_tag = None   # (tag_start, text_start) of an unclosed <loc>
+            last_end = 0
+            for m in _RECOVERY_TAG.finditer(buffer):
+                closing, name = m.group(1), m.group(2)
+                last_end = m.end()
+                if name == b'loc':
+                    if not closing:
+                        if loc_tag is not None:
+                            # <loc> without </loc>: drop the broken region
+                            skipped += m.start() - loc_tag[0]
+                        loc_tag = (m.start(), m.end())
+                        continue
+                    if loc_tag is None:
+                        continue
+                    text = buffer[loc_tag[1]:m.start()]
+                    region = m.end() - loc_tag[0]
+                    loc_tag = None
+                    if parent == b'sitemap' and not include_sitemap_locs:
+                        continue
+                    cdata = _CDATA.match(text)
+                    if cdata:
+                        text = cdata.group(1)
+                    elif b'<' in text:
+                        skipped += region
+                        continue
+                    try:
+                        urls.append(_unescape(text.decode('utf-8')))
+                    except (UnicodeDecodeError, ValueError, OverflowError):
+                        skipped += region
+                elif closing:
+                    if parent == name:
+                        parent = None
+                else:
+                    parent = name
+            
+            if not chunk:
+                # End of file: an open <loc> can no longer be closed
+                if loc_tag is not None:
+                    skipped += len(buffer) - loc_tag[0]
+                break
+            
+            if loc_tag is not None:
+                # Carry the open <loc> into the next chunk, within bounds
+                if len(buffer) - loc_tag[0] <= max_loc_size:
+                    carry = buffer[loc_tag[0]:]
+                else:
+                    skipped += len(buffer) - loc_tag[0]
+            else:
+                # Carry a tag that may be split across the chunk boundary
+                tail = buffer.rfind(b'<', last_end)
+                if tail >= 0 and len(buffer) - tail <= max_loc_size:
+                    carry = buffer[tail:]
+    
+    return urls, skipped
@@ -0,0 +1,64 @@
+"""Shared test setup: the modules under test are scripts in the repository root."""
+from pathlib import Path
+import os
+import sys
+import tempfile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# Keep compiled-pattern and parse caches out of the user's ~/.cache
+os.environ.setdefault('LOL_PATTERN_CACHE_DIR', tempfile.mkdtemp(prefix='lol-sitemap-tests-'))
+
+import pytest
+
+@pytest.fixture
+def sitemap_dir():
+    """The bundled sample sitemaps."""
+    return REPO_ROOT / 'lol_narrative_sitemaps'
+
+class _PageServer:
+    """A local HTTP server that serves the bytes in `pages` by request path."""
+
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        pages = self.pages = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = pages.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Type', 'application/xml')
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def url(self, path):
+        return self.base_url + path
+
+@pytest.fixture
+def page_server():
+    import threading
+    server = _PageServer()
+    thread = threading.Thread(target=server.server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+def urlset(*urls):
+    """A sitemap document listing urls."""
+    entries = ''.join(f"<url><loc>{url}</loc></url>" for url in urls)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'.encode()
+
+def sitemapindex(*urls):
+    """A sitemap index document listing child sitemap urls."""
+    entries = ''.join(f"<sitemap><loc>{url}</loc></sitemap>" for url in urls)
+    return (f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'{entries}</sitemapindex>').encode()
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from analyze_sitemap import CountMinSketch, HeavyHitters, SpaceSavingCounter, analyze_urls
+from conftest import REPO_ROOT
+
+def test_space_saving_is_exact_within_capacity():
+    counter = SpaceSavingCounter(10)
+    for key in 'aabbbcdddd':
+        counter.add(key)
+    assert counter.most_common(2) == [('d', 4), ('b', 3)]
+
+def test_space_saving_overestimates_within_bound():
+    stream = ['hot'] * 50 + [f'cold-{i}' for i in range(200)]
+    counter = SpaceSavingCounter(8)
+    for key in stream:
+        counter.add(key)
+    key, count = counter.most_common(1)[0]
+    assert key == 'hot'
+    assert 50 <= count <= 50 + counter.error_bound
+
+def test_count_min_never_underestimates():
+    stream = [f'/en-us/story/{i % 37}' for i in range(2000)]
+    sketch = CountMinSketch(error=0.05, delta=0.01)
+    for key in stream:
+        sketch.add(key)
+    for key, count in Counter(stream).items():
+        assert count <= sketch.estimate(key) <= count + sketch.error * sketch.total
+
+def test_count_min_is_stable_across_processes():
+    # hash() is salted per process; the sketch must not depend on it
+    code = 'from analyze_sitemap import CountMinSketch; print(CountMinSketch(0.01)._indexes("/en-us/champion/ahri"))'
+    outputs = set()
+    for seed in ('1', '2'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+        outputs.add(result.stdout)
+    assert len(outputs) == 1
+
+def test_count_min_rows_are_independent():
+    sketch = CountMinSketch(error=0.1, delta=0.01)
+    indexes = [sketch._indexes(f'/en-us/story/{i}') for i in range(200)]
+    first_row = sum(1 for a, b in combinations(indexes, 2) if a[0] == b[0])
+    both_rows = sum(1 for a, b in combinations(indexes, 2) if a[0] == b[0] and a[1] == b[1])
+    # Independent rows collide together about first_row / width times
+    assert both_rows <= 3 * first_row / sketch.width + 3
+
+@pytest.mark.parametrize('args', [(0, 0.01), (1.0, 0.01), (0.01, 0)])
+def test_count_min_rejects_invalid_parameters(args):
+    with pytest.raises(ValueError):
+        CountMinSketch(*args)
+
+def test_space_saving_rejects_zero_capacity():
+    with pytest.raises(ValueError):
+        SpaceSavingCounter(0)
+
+def test_heavy_hitters_reports_top_keys():
+    hitters = HeavyHitters(capacity=4, error=0.01)
+    for key in ['a'] * 30 + ['b'] * 20 + [f'x{i}' for i in range(40)]:
+        hitters.add(key)
+    assert [key for key, _ in hitters.most_common(2)] == ['a', 'b']
+
+def test_streaming_analysis_bounds_every_statistic():
+    urls = [f'https://h{i % 50}.example/wiki/Page_{i}.Title_{i}' for i in range(500)]
+    urls += ['https://wiki.example/wiki/Image.png'] * 100
+    analysis = analyze_urls(urls, top_n=5, streaming=True, sketch_capacity=20, sketch_error=0.01)
+    for name in ('domains', 'path_components', 'file_extensions', 'common_path_prefixes'):
+        assert len(analysis[name]) <= 5
+        assert analysis['sketch'][name]['tracked_keys'] <= 20
+    assert next(iter(analysis['file_extensions'])) == 'png'
+    assert next(iter(analysis['domains'])) == 'wiki.example'
+
+@pytest.mark.parametrize('option', [['--sketch-counters', '0'], ['--sketch-error', '0'], ['--sketch-error', '1']])
+def test_cli_rejects_degenerate_sketch_sizes(option):
+    result = subprocess.run([sys.executable, 'analyze_sitemap.py', 'missing.xml', '--streaming-stats', *option],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 2
+    assert option[0] in result.stderr
@@ -0,0 +1,74 @@
+import asyncio
+
+from async_pipeline import run_async_pipeline
+from conftest import sitemapindex, urlset
+from sitemap_ingest import make_deduplicator
+
+async def serve_pages(pages, events, delays):
+    """A minimal asyncio HTTP server for pages, recording ('start'|'done', path) events."""
+    async def handle(reader, writer):
+        request = await reader.readline()
+        while (await reader.readline()).strip():
+            pass
+        path = request.split()[1].decode()
+        events.append(('start', path))
+        await asyncio.sleep(delays.get(path, 0))
+        body = pages.get(path, b'')
+        status = b'200 OK' if path in pages else b'404 Not Found'
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Length: ' + str(len(body)).encode() +
+                     b'\r\nConnection: close\r\n\r\n' + body)
+        await writer.drain()
+        writer.close()
+        events.append(('done', path))
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+def run_pipeline(tmp_path, children, delays=None, queue_size=16, **options):
+    events = []
+
+    async def main():
+        server = await serve_pages(pages, events, delays or {})
+        base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        index = tmp_path / 'index.xml'
+        index.write_bytes(sitemapindex(*(base_url + path for path in children)))
+        async with server:
+            return await run_async_pipeline(index, tmp_path / 'out', [r'/blocked/'], [],
+                                            concurrency=8, parse_workers=2, queue_size=queue_size,
+                                            cache_dir=None, **options)
+
+    # Child i lists one kept and one blacklisted URL
+    pages = {path: urlset(f'https://example.com/{i}', f'https://example.com/blocked/{i}')
+             for i, path in enumerate(children) if 'missing' not in path and 'copy' not in path}
+    # A copy of child 0 lists the same URLs again
+    pages.update({path: pages[children[0]] for path in children if 'copy' in path})
+    stats = asyncio.run(main())
+    return stats, events
+
+def read_lines(path):
+    return path.read_text(encoding='utf-8').split()
+
+def test_pipeline_writes_all_children_in_sitemap_order(tmp_path):
+    children = [f'/{i}/sitemap.xml' for i in range(6)]
+    stats, _ = run_pipeline(tmp_path, children + ['/missing.xml'])
+    assert stats == {"sitemaps": 7, "failed": 1, "total": 12, "filtered": 6, "blacklisted": 6, "duplicates": 0}
+    output_dir = tmp_path / 'out'
+    assert read_lines(output_dir / 'filtered_urls.txt') == [f'https://example.com/{i}' for i in range(6)]
+    assert read_lines(output_dir / 'blacklisted_urls.txt') == [f'https://example.com/blocked/{i}' for i in range(6)]
+    assert len(read_lines(output_dir / 'all_urls.txt')) == 12
+
+def test_downloads_stay_within_queue_size_of_the_writer(tmp_path):
+    children = [f'/{i}/sitemap.xml' for i in range(8)]
+    # The first child is slow: later ones must wait for it instead of piling up
+    stats, events = run_pipeline(tmp_path, children, delays={children[0]: 0.5}, queue_size=2)
+    assert stats["total"] == 16
+    first_done = events.index(('done', children[0]))
+    started_early = {path for kind, path in events[:first_done] if kind == 'start'}
+    assert started_early <= set(children[:2])
+
+def test_duplicates_across_sitemaps_are_dropped_in_order(tmp_path):
+    children = [f'/{i}/sitemap.xml' for i in range(3)] + ['/copy/sitemap.xml']
+    stats, _ = run_pipeline(tmp_path, children, deduplicator=make_deduplicator('exact'), backend='auto')
+    assert stats["duplicates"] == 2
+    output_dir = tmp_path / 'out'
+    assert read_lines(output_dir / 'filtered_urls.txt') == [f'https://example.com/{i}' for i in range(3)]
+    assert read_lines(output_dir / 'blacklisted_urls.txt') == [f'https://example.com/blocked/{i}' for i in range(3)]
+    assert len(read_lines(output_dir / 'all_urls.txt')) == 6
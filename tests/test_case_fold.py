@@ -0,0 +1,50 @@
+import re
+import types
+
+import pytest
+
+import case_fold
+import pattern_cache
+from case_fold import fold_parsed, fold_url
+from pattern_cache import freeze_pattern, load_compiled_patterns, thaw_pattern
+
+PATTERNS = [
+    r'/wiki/User:', r'/wiki/[A-Z]\w+/LoL$', r'[^a-z]Talk:', r'_\(Season_\d+\)$', r'(?P<p>ab)\b.*(?P=p)',
+    r'/WIKI/(?:File|Image):', r'k[ai]+\'?sa', r'\Bq{2,}', r'(?=.*ahri)lol',
+]
+URLS = [
+    '/wiki/User:Foo', '/wiki/user:foo', '/wiki/Ahri/LoL', '/wiki/ahri/lol', '/wiki/Talk:Ahri', '/xTalk:',
+    '/wiki/Ahri_(Season_3)', 'ab x AB', '/wiki/File:Kai\'Sa.png', '/wiki/KAISA', 'aQQQ', 'AHRI LOL',
+]
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_folded_pattern_matches_like_ignorecase(pattern):
+    folded = thaw_pattern(freeze_pattern(pattern, re.IGNORECASE, fold=True), fold=True)
+    assert folded is not None and not folded.flags & re.IGNORECASE
+    original = re.compile(pattern, re.IGNORECASE)
+    for url in URLS:
+        assert bool(folded.search(fold_url(url))) == bool(original.search(url)), url
+
+@pytest.mark.parametrize('pattern', [r'(?-i:User):', r'User:'])
+def test_inline_flags_and_missing_ignorecase_are_not_folded(pattern):
+    flags = re.IGNORECASE if pattern.startswith('(?-i') else 0
+    assert fold_parsed(pattern_cache.sre_parser.parse(pattern, flags)) is None
+
+def test_fold_url_only_applies_to_ascii():
+    assert fold_url('/wiki/Ahri') == '/wiki/ahri'
+    assert fold_url('/wiki/Ahrí') is None
+
+def test_private_sre_changes_fall_back_to_ignorecase(monkeypatch):
+    # _sre.compile taking different arguments must not break folding callers
+    monkeypatch.setattr(case_fold, '_sre', types.SimpleNamespace())
+    parsed = pattern_cache.sre_parser.parse(r'/wiki/User:', re.IGNORECASE)
+    assert fold_parsed(parsed) is None
+
+def test_private_compiler_changes_fall_back_to_re_compile(monkeypatch, tmp_path):
+    monkeypatch.setattr(pattern_cache, 'sre_compiler', types.SimpleNamespace())
+    monkeypatch.setattr(pattern_cache, '_memory_cache', {})
+    sets = {'blacklist': [r'/wiki/User:']}
+    compiled = load_compiled_patterns(sets, cache_dir=tmp_path)
+    folded = load_compiled_patterns(sets, cache_dir=tmp_path, fold=True)
+    assert compiled['blacklist'][0].search('/wiki/USER:Foo')
+    assert folded['blacklist'] == [None]
@@ -0,0 +1,62 @@
+import gzip
+import json
+
+import pytest
+
+from corpus_diff import diff_runs
+from url_classifier import write_rule_ids
+
+def make_run(run_dir, kept, blacklisted, categories=None, rules=None, compress=False):
+    """Write a run directory like final_filter's; rules maps each URL to a 'list\\tpattern' rule or None."""
+    run_dir.mkdir()
+
+    def write(name, urls):
+        text = ''.join(url + '\n' for url in urls)
+        if compress:
+            with gzip.open(run_dir / (name + '.gz'), 'wt', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            (run_dir / name).write_text(text, encoding='utf-8')
+
+    write('filtered_urls.txt', kept)
+    write('blacklisted_urls.txt', blacklisted)
+    for category, urls in (categories or {}).items():
+        write(f'{category}_urls.txt', urls)
+    if rules is not None:
+        table = sorted({rule for rule in rules.values() if rule})
+        (run_dir / 'rules.tsv').write_text(''.join(f'{i}\t{rule}\n' for i, rule in enumerate(table)), encoding='utf-8')
+        all_urls = list(rules)
+        write('all_urls.txt', all_urls)
+        write_rule_ids(run_dir / 'rule_ids.i32', [table.index(rules[url]) if rules[url] else -1 for url in all_urls])
+    return run_dir
+
+@pytest.mark.parametrize('chunk_size, compress', [(1_000_000, False), (1, True)])
+def test_diff_reports_every_kind_of_change(tmp_path, chunk_size, compress):
+    old = make_run(tmp_path / 'old', kept=['u/a', 'u/b'], blacklisted=['u/c', 'u/gone'],
+                   categories={'champions': ['u/a'], 'items': ['u/b']},
+                   rules={'u/a': None, 'u/b': None, 'u/c': 'blacklist\t/c', 'u/gone': 'blacklist\t/gone'})
+    new = make_run(tmp_path / 'new', kept=['u/a', 'u/c', 'u/new'], blacklisted=['u/b'],
+                   categories={'champions': ['u/a', 'u/c']},
+                   rules={'u/a': None, 'u/b': 'blacklist\t/b', 'u/c': 'whitelist\t/c', 'u/new': None},
+                   compress=compress)
+    output_dir = tmp_path / 'diff'
+    result = diff_runs(old, new, output_dir, chunk_size=chunk_size)
+
+    assert (result['added'], result['removed'], result['common']) == (1, 1, 3)
+    assert (result['moved_to_blacklisted'], result['moved_to_kept']) == (1, 1)
+    assert {(c['from'], c['to']) for c in result['category_changes']} == {('items', '-'), ('-', 'champions')}
+    assert result['rules_compared']
+    assert {(c['from'], c['to']) for c in result['rule_changes']} == {
+        ('none', 'blacklist:/b'), ('blacklist:/c', 'whitelist:/c')}
+    assert (output_dir / 'added_urls.txt').read_text() == 'u/new\n'
+    assert (output_dir / 'removed_urls.txt').read_text() == 'u/gone\n'
+    assert (output_dir / 'moved_to_kept.txt').read_text() == 'u/c\n'
+    assert json.loads((output_dir / 'diff_summary.json').read_text()) == result
+
+def test_rules_are_only_compared_when_both_runs_have_them(tmp_path):
+    old = make_run(tmp_path / 'old', kept=['u/a'], blacklisted=[], rules={'u/a': 'whitelist\t/a'})
+    new = make_run(tmp_path / 'new', kept=['u/a'], blacklisted=[])
+    result = diff_runs(old, new, tmp_path / 'diff')
+    assert not result['rules_compared']
+    assert result['rule_changes'] == []
+    assert result['common'] == 1
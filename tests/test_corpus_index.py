@@ -0,0 +1,45 @@
+import re
+
+import pytest
+
+from corpus_index import CorpusIndex, coverage_counts, open_corpus_index
+
+URLS = [
+    'https://x.com/wiki/Ahri', 'https://x.com/wiki/Ahri/LoL', 'https://x.com/wiki/ahri/Skins',
+    'https://x.com/wiki/User:Foo', 'https://x.com/wiki/User_talk:Foo', 'https://x.com/wiki/Teemo',
+    'https://x.com/wiki/Kaï', 'https://x.com/Special:Random', 'https://x.com/wiki/a/wiki/User:b',
+]
+PATTERNS = [r'/wiki/Ahri', r'/wiki/Ahri$', r'/wiki/User', r'/wiki/User:', r'/wiki/Ka', r'Special:',
+            r'/LoL$', r'/wiki/Zed', r'/wiki/User:b']
+
+def reference_count(pattern, urls):
+    return sum(1 for url in urls if re.search(pattern, url, re.IGNORECASE))
+
+def test_coverage_counts_equal_a_regex_scan():
+    counts = coverage_counts(PATTERNS, URLS, cache_dir=None)
+    assert counts == {pattern: reference_count(pattern, URLS) for pattern in PATTERNS}
+
+def test_range_queries_only_for_wiki_prefix_and_exact_rules():
+    index = CorpusIndex.build(URLS)
+    assert index.coverage(r'/wiki/Ahri') == 3
+    assert index.coverage(r'/wiki/Ahri$') == 1
+    # Non-ASCII and double /wiki/ URLs are checked by regex
+    assert index.coverage(r'/wiki/Ka') == 1
+    assert index.coverage(r'/wiki/User:b') == 1
+    assert index.coverage(r'Special:') is None
+    assert index.coverage(r'/wiki/A.ri') is None
+
+def test_memory_mapped_index_answers_like_the_built_one(tmp_path):
+    path = CorpusIndex.write(URLS, tmp_path / 'corpus.idx')
+    built = CorpusIndex.build(URLS)
+    with open_corpus_index(path) as index:
+        assert index.total == len(URLS)
+        for pattern in PATTERNS:
+            assert index.coverage(pattern) == built.coverage(pattern)
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'not-an-index'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        with open_corpus_index(path):
+            pass
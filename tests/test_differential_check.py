@@ -0,0 +1,24 @@
+from conftest import REPO_ROOT
+from differential_check import adversarial_urls, check_all, reference_decisions
+from final_filter import DEFAULT_BLACKLIST, WHITELIST
+from regex_backends import read_benchmark_urls
+from url_classifier import read_patterns
+
+def test_engines_agree_with_the_reference(sitemap_dir):
+    blacklist = list(DEFAULT_BLACKLIST) + read_patterns(REPO_ROOT / 'enhanced_blacklist.txt')
+    whitelist = list(WHITELIST) + read_patterns(REPO_ROOT / 'enhanced_whitelist.txt')
+    corpus = read_benchmark_urls(sorted(sitemap_dir.glob('sitemap-[0-9]*.xml')))
+    generated = adversarial_urls(corpus, whitelist + blacklist, seed=0)
+    assert corpus and generated
+    urls = list(dict.fromkeys(corpus + generated))
+    differences = []
+    assert check_all(urls, whitelist, blacklist, differences.append) == 0, '\n'.join(differences[:20])
+
+def test_adversarial_urls_are_reproducible():
+    corpus = ['https://leagueoflegends.fandom.com/wiki/Ahri/LoL']
+    patterns = [r'/wiki/User:', r'\(TFT\)']
+    assert adversarial_urls(corpus, patterns, 3, seed=1) == adversarial_urls(corpus, patterns, 3, seed=1)
+
+def test_reference_whitelist_rescues_blacklisted_urls():
+    decisions = reference_decisions(['/wiki/Ahri/LoL', '/wiki/Ahri/TFT', '/wiki/Ahri'], [r'/LoL$'], [r'/wiki/Ahri'])
+    assert [keep for keep, _ in decisions] == [True, False, False]
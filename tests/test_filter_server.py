@@ -0,0 +1,60 @@
+import os
+import time
+
+from filter_server import FilterState, PatternWatcher
+
+URLS = ['https://example.com/wiki/Ahri/LoL', 'https://example.com/wiki/User:Someone',
+        'https://example.com/wiki/Talk:Ahri']
+
+def make_watcher(tmp_path, blacklist):
+    pattern_file = tmp_path / 'blacklist.txt'
+    pattern_file.write_text(blacklist, encoding='utf-8')
+    state = FilterState(URLS, cache_dir=None)
+    watcher = PatternWatcher(state, [pattern_file], [], use_default_blacklist=False)
+    assert watcher.load()
+    return state, watcher, pattern_file
+
+def touch_with(pattern_file, data):
+    pattern_file.write_bytes(data)
+    # Make the change visible to the size/mtime signature even on coarse clocks
+    stat = pattern_file.stat()
+    os.utime(pattern_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+def test_reload_applies_changed_patterns(tmp_path):
+    state, watcher, pattern_file = make_watcher(tmp_path, '/wiki/User:\n')
+    assert state.classify(URLS[1])['decision'] == 'drop'
+    touch_with(pattern_file, b'/wiki/Talk:\n')
+    assert watcher.poll()
+    assert state.classify(URLS[1])['decision'] == 'keep'
+    assert state.classify(URLS[2])['decision'] == 'drop'
+
+def test_invalid_files_keep_the_last_good_patterns(tmp_path):
+    state, watcher, pattern_file = make_watcher(tmp_path, '/wiki/User:\n')
+    for data in (b'/wiki/\xff\xfeUser\n', b'/wiki/(unclosed\n'):
+        touch_with(pattern_file, data)
+        assert watcher.poll() is False
+        assert state.classify(URLS[1])['decision'] == 'drop'
+    # The same broken file is not reloaded again
+    assert watcher.poll() is False
+
+def test_watch_thread_survives_failed_reloads(tmp_path, monkeypatch):
+    state, watcher, pattern_file = make_watcher(tmp_path, '/wiki/User:\n')
+    calls = []
+    original_load = watcher.load
+
+    def flaky_load():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError('unexpected')
+        return original_load()
+
+    monkeypatch.setattr(watcher, 'load', flaky_load)
+    thread = watcher.watch(interval=0.01)
+    touch_with(pattern_file, b'/wiki/Talk:\n')
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        # Change the file again so the next poll reloads after the failure
+        time.sleep(0.05)
+        touch_with(pattern_file, b'/wiki/Talk:\n')
+    assert thread.is_alive()
+    assert len(calls) >= 2
@@ -0,0 +1,98 @@
+import gzip
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT, sitemapindex, urlset
+from url_classifier import NO_RULE, read_rule_ids
+
+def run_final_filter(*args):
+    result = subprocess.run([sys.executable, 'final_filter.py', *map(str, args)],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result
+
+def output_urls(output_dir):
+    urls = []
+    for name in ('filtered_urls.txt', 'blacklisted_urls.txt'):
+        urls.extend((output_dir / name).read_text(encoding='utf-8').split())
+    return sorted(urls)
+
+@pytest.mark.parametrize('mode', [[], ['--workers', '2'], ['--recursive']])
+def test_children_sharing_a_file_name_are_all_ingested(page_server, tmp_path, mode):
+    page_a = 'https://leagueoflegends.fandom.com/wiki/Page_a'
+    page_b = 'https://leagueoflegends.fandom.com/wiki/Page_b'
+    page_server.pages['/a/sitemap.xml'] = urlset(page_a)
+    page_server.pages['/b/sitemap.xml'] = urlset(page_b)
+    index = tmp_path / 'index.xml'
+    index.write_bytes(sitemapindex(page_server.url('/a/sitemap.xml'), page_server.url('/b/sitemap.xml')))
+
+    output_dir = tmp_path / 'out'
+    run_final_filter(index, '-o', output_dir, '--no-pattern-cache', *mode)
+    assert output_urls(output_dir) == [page_a, page_b]
+    assert len(list(output_dir.glob('*sitemap.xml'))) == 2
+
+def test_explain_attributes_every_url_to_its_rule(tmp_path):
+    urls = ['https://x.com/wiki/User:Foo', 'https://x.com/wiki/Champion', 'https://x.com/wiki/Teemo']
+    child = tmp_path / 'sitemap-1.xml'
+    child.write_bytes(urlset(*urls))
+    index = tmp_path / 'index.xml'
+    index.write_bytes(sitemapindex('https://x.com/sitemap-1.xml'))
+    blacklist = tmp_path / 'blacklist.txt'
+    blacklist.write_text('/wiki/User:\n', encoding='utf-8')
+    output_dir = tmp_path / 'out'
+    run_final_filter(index, '-o', output_dir, '--local-dir', '--no-default-blacklist', '--no-pattern-cache',
+                     '--blacklist-file', blacklist, '--explain')
+
+    assert (output_dir / 'all_urls.txt').read_text(encoding='utf-8').split() == urls
+    rules = {}
+    for line in (output_dir / 'rules.tsv').read_text(encoding='utf-8').splitlines():
+        rule_id, list_name, pattern = line.split('\t')
+        rules[int(rule_id)] = (list_name, pattern)
+    decided = [rules[rule_id] if rule_id != NO_RULE else None for rule_id in read_rule_ids(output_dir / 'rule_ids.i32')]
+    assert decided == [('blacklist', '/wiki/User:'), ('whitelist', '/wiki/Champion$'), None]
+
+def test_saved_rule_stats_do_not_change_the_outputs(sitemap_dir, tmp_path):
+    stats = tmp_path / 'stats.json'
+    outputs = []
+    for run in ('first', 'second'):
+        output_dir = tmp_path / run
+        run_final_filter(sitemap_dir / 'sitemap-index.xml', '-o', output_dir, '--local-dir', '--no-pattern-cache',
+                         '--blacklist-file', REPO_ROOT / 'enhanced_blacklist.txt', '--rule-stats', stats)
+        outputs.append([(output_dir / name).read_bytes() for name in ('filtered_urls.txt', 'blacklisted_urls.txt')])
+    assert stats.exists()
+    assert outputs[0] == outputs[1]
+
+def test_bytes_mode_writes_the_same_outputs(sitemap_dir, tmp_path):
+    outputs = []
+    for mode in ([], ['--bytes']):
+        output_dir = tmp_path / ('bytes' if mode else 'text')
+        run_final_filter(sitemap_dir / 'sitemap-index.xml', '-o', output_dir, '--local-dir', '--no-pattern-cache',
+                         '--blacklist-file', REPO_ROOT / 'enhanced_blacklist.txt', '--url-categories', '--explain',
+                         '--dedup', 'exact', *mode)
+        outputs.append({path.name: path.read_bytes() for path in sorted(output_dir.glob('*.txt')) +
+                        [output_dir / 'rule_ids.i32']})
+    assert outputs[0] == outputs[1]
+
+@pytest.mark.parametrize('option', [['--recursive'], ['--url-categories'], ['--explain'], ['--rule-stats', 'x.json'],
+                                    ['--compress', 'gzip'], ['--output-workers', '2'], ['--parse-cache']])
+def test_async_rejects_options_it_cannot_honour(tmp_path, option):
+    result = subprocess.run([sys.executable, 'final_filter.py', 'index.xml', '-o', tmp_path, '--async', *option],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 2
+    assert f'{option[0]} is not supported with --async' in result.stderr
+
+def test_all_urls_are_saved_before_classification(sitemap_dir, tmp_path):
+    # A pattern that does not compile stops the run after ingestion
+    blacklist_file = tmp_path / 'blacklist.txt'
+    blacklist_file.write_text('(\n', encoding='utf-8')
+    output_dir = tmp_path / 'out'
+    result = subprocess.run([sys.executable, 'final_filter.py', sitemap_dir / 'sitemap-index.xml',
+                             '-o', output_dir, '--local-dir', '--no-pattern-cache',
+                             '--blacklist-file', blacklist_file, '--compress', 'gzip'],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert not (output_dir / 'filtered_urls.txt.gz').exists()
+    with gzip.open(output_dir / 'all_urls.txt.gz', 'rt', encoding='utf-8') as f:
+        assert len(f.read().split()) > 0
@@ -0,0 +1,51 @@
+import urllib.parse
+
+import pytest
+
+from final_filter import parse_urls_from_sitemap
+from find_organizational_pages import OrganizationalPageMatcher
+
+def reference_categories(path):
+    """The per-category checks the matcher replaced."""
+    page_name = path.split('/')[-1]
+    lower = page_name.lower()
+    checks = {
+        'disambiguation': '(disambiguation)' in page_name or '_disambiguation' in page_name,
+        'list_pages': page_name.startswith('List_of_') or '_list' in lower or '/List_' in path,
+        'index_pages': page_name.endswith('_index') or page_name.startswith('Index_of_') or '_index_' in page_name,
+        'category_pages': page_name.startswith('Category:') or '_category' in lower or '_categories' in lower,
+        'collection_pages': any(t in lower for t in ['collection', 'group', 'series', 'set', 'related', 'overview']),
+        'admin_pages': any(t in lower for t in ['admin', 'policy', 'guideline', 'rules', 'help', 'sandbox']),
+        'stub_pages': '_stub' in lower or 'stub_' in lower,
+        'template_pages': page_name.startswith('Template:') or '_template' in lower,
+        'portal_pages': page_name.startswith('Portal:') or 'portal_' in lower or '_portal' in lower,
+        'organizational': any(t in lower for t in [
+            'navigation', 'redirect', 'table_of_contents', 'toc', 'sitemap', 'contents',
+            'directory', 'glossary', 'terminology', 'classifications', 'catalog']),
+    }
+    return [category for category, hit in checks.items() if hit]
+
+PATHS = [
+    '/wiki/Ahri_(disambiguation)', '/wiki/List_of_champions', '/wiki/Champion_LIST', '/List_of/Ahri',
+    '/wiki/Item_index', '/wiki/item_INDEX', '/wiki/Index_of_items', '/wiki/Category:Champions',
+    '/wiki/Skin_Sets_overview', '/wiki/Help:Contents', '/wiki/Stub_page', '/wiki/Template:Infobox',
+    '/wiki/portal_Runeterra', '/wiki/Portal:Lore', '/wiki/Stocktoc', '/wiki/Redirect/Ahri', '/wiki/Ahri', '/',
+]
+
+@pytest.mark.parametrize('path', PATHS)
+def test_matcher_agrees_with_the_per_category_checks(path):
+    assert OrganizationalPageMatcher().match(path) == reference_categories(path)
+
+def test_matcher_agrees_on_the_bundled_sitemaps(sitemap_dir):
+    matcher = OrganizationalPageMatcher()
+    for url in parse_urls_from_sitemap(str(sitemap_dir / 'sitemap-3.xml')):
+        path = urllib.parse.urlparse(url).path
+        assert matcher.match(path) == reference_categories(path), url
+
+def test_custom_categories():
+    matcher = OrganizationalPageMatcher({'tft': {'isuffix': ['_(tft)']}, 'lists': {'ipath_contains': ['/LIST_']}})
+    assert matcher.match('/wiki/Ahri_(TFT)') == ['tft']
+    assert matcher.match('/list_of/Ahri') == ['lists']
+    assert OrganizationalPageMatcher({}).match('/wiki/Ahri') == []
+    with pytest.raises(ValueError):
+        OrganizationalPageMatcher({'bad': {'regex': ['x']}})
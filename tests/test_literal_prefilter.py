@@ -0,0 +1,44 @@
+import re
+
+import pytest
+
+from literal_prefilter import PrefilteredPattern, PrefilterIndex, required_literals
+
+PATTERNS = [r'/wiki/Legendary_.*_Item', r'/wiki/(Runeterra|Universe)', r'\d+$', r'ab?c', r'(foo)?bar',
+            r'x{2}y', r'(?:Kai|Kha)\'?Zix', r'[A-C]hri', r'(?i:TFT)', r'^https://x\.com/wiki/\w+$']
+URLS = ['https://x.com/wiki/Legendary_Sword_Item', 'https://x.com/wiki/legendary_item', 'https://x.com/wiki/UNIVERSE',
+        'https://x.com/wiki/Runeterra_Map', 'https://x.com/ac/abc', 'https://x.com/foobar', 'https://x.com/xxy',
+        "https://x.com/wiki/Kha'Zix", 'https://x.com/wiki/KaiZix', 'https://x.com/wiki/Ahri', 'https://x.com/tft/42',
+        'https://x.com/wiki/Ahrí', 'https://x.com/wiki/Teemo']
+
+def test_required_literals():
+    assert required_literals(r'/wiki/Legendary_.*_Item') == [('/wiki/legendary_', '_item')]
+    assert required_literals(r'(foo)?bar') == [('bar',)]
+    assert required_literals(r'\d+') is None
+    assert required_literals(r'/wiki/(Runeterra|Universe)') == [('/wiki/', 'runeterra'), ('/wiki/', 'universe')]
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_prefiltered_search_agrees_with_re(pattern):
+    regex = re.compile(pattern, re.IGNORECASE)
+    prefiltered = PrefilteredPattern(regex)
+    for url in URLS:
+        assert bool(prefiltered.search(url)) == bool(regex.search(url)), url
+        if url.isascii():
+            assert bool(prefiltered.search(url, url.lower())) == bool(regex.search(url)), url
+
+def test_index_candidates_include_every_matching_pattern_in_rank_order():
+    entries = [(rule_id, PrefilteredPattern(re.compile(pattern, re.IGNORECASE)))
+               for rule_id, pattern in enumerate(PATTERNS)]
+    index = PrefilterIndex(entries)
+    ranks = {rule_id: len(PATTERNS) - rule_id for rule_id in range(len(PATTERNS))}
+    reversed_index = PrefilterIndex(entries, ranks)
+    for url in URLS:
+        if not url.isascii():
+            continue
+        lower = url.lower()
+        candidates = [rule_id for rule_id, _ in index.candidates(lower)]
+        assert candidates == sorted(candidates)
+        matching = [rule_id for rule_id, pattern in entries if pattern.regex.search(url)]
+        assert set(matching) <= set(candidates), url
+        reversed_candidates = [rule_id for rule_id, _ in reversed_index.candidates(lower)]
+        assert reversed_candidates == sorted(candidates, reverse=True)
@@ -0,0 +1,40 @@
+import pytest
+
+import output_writer
+from output_writer import open_input, output_path, write_lines, write_outputs
+
+URLS = ['https://x.com/wiki/A', 'https://x.com/wiki/Ï']
+
+def read_lines(path):
+    with open_input(path) as f:
+        return f.read().splitlines()
+
+def test_output_path_adds_the_compression_suffix(tmp_path):
+    assert output_path(tmp_path / 'kept.txt') == tmp_path / 'kept.txt'
+    assert output_path(tmp_path / 'kept.txt', 'gzip') == tmp_path / 'kept.txt.gz'
+    assert output_path(tmp_path / 'kept.txt', 'zstd') == tmp_path / 'kept.txt.zst'
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_str_and_bytes_lines_round_trip(tmp_path, compression):
+    text_path = write_lines(tmp_path / 'text.txt', URLS, compression)
+    bytes_path = write_lines(tmp_path / 'bytes.txt', [url.encode('utf-8') for url in URLS], compression)
+    assert read_lines(text_path) == URLS
+    assert read_lines(bytes_path) == URLS
+    if compression is None:
+        assert text_path.read_bytes() == bytes_path.read_bytes()
+
+def test_lines_are_written_across_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(output_writer, 'BATCH_SIZE', 3)
+    urls = [f'https://x.com/{i}' for i in range(10)]
+    assert read_lines(write_lines(tmp_path / 'urls.txt', iter(urls))) == urls
+    assert write_lines(tmp_path / 'empty.txt', []).read_bytes() == b''
+
+def test_write_outputs_keeps_the_order_of_outputs(tmp_path):
+    outputs = {tmp_path / f'out{i}.txt': [f'https://x.com/{i}'] for i in range(4)}
+    paths = write_outputs(outputs, 'gzip', workers=4)
+    assert paths == [output_path(path, 'gzip') for path in outputs]
+    assert [read_lines(path) for path in paths] == list(outputs.values())
+
+def test_unknown_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        output_writer.open_output(tmp_path / 'x.txt', 'lz4')
@@ -0,0 +1,57 @@
+from conftest import urlset
+from parse_cache import load_sitemap_columns, read_parse_cache, sitemap_digest, write_parse_cache
+from sitemap_scanner import scan_sitemap_lastmods, scan_sitemap_locs
+
+def test_cache_file_round_trip(tmp_path):
+    cache_file = tmp_path / 'entry.bin'
+    write_parse_cache(cache_file, ['https://x.com/a', 'https://x.com/ï'], [b'2025-01-01', b''])
+    assert read_parse_cache(cache_file) == (['https://x.com/a', 'https://x.com/ï'], ['2025-01-01', ''])
+    assert read_parse_cache(cache_file, as_bytes=True) == (
+        [b'https://x.com/a', 'https://x.com/ï'.encode()], [b'2025-01-01', b''])
+    write_parse_cache(cache_file, [])
+    assert read_parse_cache(cache_file) == ([], None)
+
+def test_damaged_cache_files_miss(tmp_path):
+    cache_file = tmp_path / 'entry.bin'
+    assert read_parse_cache(cache_file) is None
+    write_parse_cache(cache_file, ['https://x.com/a', 'https://x.com/b'])
+    data = cache_file.read_bytes()
+    for damaged in (data[:-1], b'XXXX' + data[4:], data[:10]):
+        cache_file.write_bytes(damaged)
+        assert read_parse_cache(cache_file) is None
+
+def counting(calls, parse_func):
+    def parse(file_path):
+        calls.append(file_path)
+        return parse_func(file_path)
+    return parse
+
+def test_sitemaps_are_parsed_once_per_content(tmp_path):
+    body = urlset('https://x.com/a', 'https://x.com/b')
+    first, second = tmp_path / 'first.xml', tmp_path / 'second.xml'
+    first.write_bytes(body)
+    second.write_bytes(body)
+    cache_dir = tmp_path / 'cache'
+    calls = []
+    parse = counting(calls, scan_sitemap_locs)
+    assert load_sitemap_columns(first, parse, 'scan', cache_dir) == (['https://x.com/a', 'https://x.com/b'], ['', ''])
+    assert load_sitemap_columns(second, parse, 'scan', cache_dir)[0] == ['https://x.com/a', 'https://x.com/b']
+    assert calls == [first]
+    assert sitemap_digest(first) == sitemap_digest(second)
+    # A different parser or changed content misses
+    load_sitemap_columns(first, parse, 'lxml', cache_dir)
+    second.write_bytes(urlset('https://x.com/c'))
+    assert load_sitemap_columns(second, parse, 'scan', cache_dir)[0] == ['https://x.com/c']
+    assert calls == [first, first, second]
+
+def test_lastmods_are_cached_with_their_locs(tmp_path):
+    sitemap = tmp_path / 'sitemap.xml'
+    sitemap.write_bytes(b'<urlset><url><loc>https://x.com/a</loc><lastmod> 2025-01-01 </lastmod></url>'
+                        b'<url><loc>https://x.com/b</loc></url></urlset>')
+    assert scan_sitemap_lastmods(sitemap) == [b'2025-01-01', b'']
+    cache_dir = tmp_path / 'cache'
+    expected = (['https://x.com/a', 'https://x.com/b'], ['2025-01-01', ''])
+    assert load_sitemap_columns(sitemap, scan_sitemap_locs, 'scan', cache_dir) == expected
+    calls = []
+    assert load_sitemap_columns(sitemap, counting(calls, scan_sitemap_locs), 'scan', cache_dir) == expected
+    assert calls == []
@@ -0,0 +1,68 @@
+import re
+
+import pytest
+
+import pattern_cache
+from pattern_cache import DEFAULT_CACHE_DIR, clear_memory_cache, freeze_pattern, load_compiled_patterns, thaw_pattern
+
+PATTERNS = {'blacklist': [r'/wiki/User:', r'_\(Season_\d+\)$'], 'whitelist': [r'/LoL$']}
+
+@pytest.fixture(autouse=True)
+def fresh_process_cache():
+    clear_memory_cache()
+
+def test_frozen_patterns_match_like_re():
+    for pattern in [r'/wiki/User:', r'(?P<name>\w+)/LoL$', r'_\(Season_\d+\)$']:
+        thawed = thaw_pattern(freeze_pattern(pattern, re.IGNORECASE))
+        expected = re.compile(pattern, re.IGNORECASE)
+        assert thawed.pattern == expected.pattern
+        assert thawed.flags == expected.flags
+        assert thawed.groupindex == expected.groupindex
+        for url in ['/wiki/user:Foo', '/wiki/Ahri/LoL', '/wiki/Ahri_(Season_3)', '/wiki/Ahri']:
+            assert bool(thawed.search(url)) == bool(expected.search(url))
+
+def test_patterns_are_cached_on_disk(tmp_path):
+    first = load_compiled_patterns(PATTERNS, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob('*.pickle'))) == 1
+    clear_memory_cache()
+    second = load_compiled_patterns(PATTERNS, cache_dir=tmp_path)
+    assert {name: [p.pattern for p in patterns] for name, patterns in second.items()} == PATTERNS
+    assert second['blacklist'][0].search('/wiki/USER:Foo') and first['blacklist'][0].search('/wiki/USER:Foo')
+
+def test_changed_patterns_miss_the_cache(tmp_path):
+    load_compiled_patterns(PATTERNS, cache_dir=tmp_path)
+    load_compiled_patterns(dict(PATTERNS, whitelist=[r'/TFT$']), cache_dir=tmp_path)
+    assert len(list(tmp_path.glob('*.pickle'))) == 2
+
+def test_unreadable_cache_file_is_rebuilt(tmp_path):
+    load_compiled_patterns(PATTERNS, cache_dir=tmp_path)
+    for cache_file in tmp_path.glob('*.pickle'):
+        cache_file.write_bytes(b'not a pickle')
+    clear_memory_cache()
+    compiled = load_compiled_patterns(PATTERNS, cache_dir=tmp_path)
+    assert compiled['whitelist'][0].search('/wiki/Ahri/lol')
+
+def test_memory_only_cache_writes_nothing():
+    before = sorted(DEFAULT_CACHE_DIR.rglob('*')) if DEFAULT_CACHE_DIR.exists() else []
+    load_compiled_patterns({'trial': [r'/wiki/Trial_pattern_only$']}, cache_dir=None)
+    after = sorted(DEFAULT_CACHE_DIR.rglob('*')) if DEFAULT_CACHE_DIR.exists() else []
+    assert before == after
+
+def test_folded_patterns_match_lowered_urls():
+    folded = load_compiled_patterns(PATTERNS, cache_dir=None, fold=True)
+    assert folded['blacklist'][0].flags & re.IGNORECASE == 0
+    assert folded['blacklist'][0].search('/wiki/user:foo')
+    assert folded['whitelist'][0].search('/wiki/ahri/lol')
+
+def test_process_cache_keeps_only_recent_artifacts(monkeypatch):
+    monkeypatch.setattr(pattern_cache, 'MEMORY_CACHE_SIZE', 2)
+    builds = []
+
+    def load(key):
+        return pattern_cache.cached_artifact(key, lambda: builds.append(key) or key, cache_dir=None)
+
+    for key in ['a', 'b', 'a', 'c', 'a', 'b']:
+        load(key)
+    # 'a' stays cached as the most recently used; 'b' was evicted by 'c'
+    assert builds == ['a', 'b', 'c', 'b']
+    assert list(pattern_cache._memory_cache) == ['a', 'b']
@@ -0,0 +1,43 @@
+import gzip
+import re
+
+import pytest
+
+from regex_backends import available_backends, build_matcher, read_benchmark_urls, supports
+from sitemap_ingest import read_corpus
+
+PATTERNS = [r'/wiki/User:', r'/wiki/Talk:', r'_\(Season_\d+\)$', r'/LoL$', r'Ahri', r'']
+URLS = ['https://x.com/wiki/User:Foo', 'https://x.com/wiki/talk:Ahri', 'https://x.com/wiki/Ahri/LoL',
+        'https://x.com/wiki/Teemo_(Season_3)', 'https://x.com/wiki/Ahrí', 'https://x.com/wiki/Teemo']
+
+def reference_first_match(patterns, url):
+    for rule_id, pattern in enumerate(patterns):
+        if re.search(pattern, url, re.IGNORECASE):
+            return rule_id
+    return -1
+
+@pytest.mark.parametrize('backend', available_backends())
+@pytest.mark.parametrize('patterns', [PATTERNS, PATTERNS[:2] + PATTERNS[4:5], PATTERNS[3:5]])
+def test_backends_agree_with_re(backend, patterns):
+    matcher = build_matcher(patterns, backend, cache_dir=None)
+    for url in URLS:
+        assert matcher.first_match(url) == reference_first_match(patterns, url), url
+
+def test_supports():
+    assert supports('literal', ['/wiki/User:', 'Ahri'])
+    assert not supports('literal', [r'/LoL$'])
+    with pytest.raises(ValueError):
+        supports('nope', [])
+
+def test_read_corpus_reads_plain_and_compressed_lists(tmp_path):
+    (tmp_path / 'a.txt').write_text('https://x.com/a\n\nhttps://x.com/b\n', encoding='utf-8')
+    with gzip.open(tmp_path / 'b.txt.gz', 'wt', encoding='utf-8') as f:
+        f.write('https://x.com/c\n')
+    assert read_corpus([tmp_path / 'a.txt', tmp_path / 'b.txt.gz']) == [
+        'https://x.com/a', 'https://x.com/b', 'https://x.com/c']
+
+def test_benchmark_urls_from_sitemaps_and_lists(sitemap_dir, tmp_path):
+    (tmp_path / 'urls.txt').write_text('https://x.com/a\n', encoding='utf-8')
+    urls = read_benchmark_urls([sitemap_dir / 'sitemap-1.xml', tmp_path / 'urls.txt'])
+    assert urls[0].startswith('https://leagueoflegends.fandom.com/wiki/')
+    assert urls[-1] == 'https://x.com/a'
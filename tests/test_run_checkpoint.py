@@ -0,0 +1,90 @@
+import subprocess
+import sys
+
+from conftest import REPO_ROOT, sitemapindex, urlset
+from final_filter import parse_urls_from_sitemap
+from run_checkpoint import RunCheckpoint, classify_with_checkpoint, parse_with_checkpoint
+from url_classifier import URLClassifier
+
+def write_children(tmp_path, contents):
+    files = []
+    for name, urls in contents:
+        path = tmp_path / name / 'sitemap.xml'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(urlset(*urls))
+        files.append(path)
+    return files
+
+def open_checkpoint(tmp_path, resume, classify_key='c1'):
+    return RunCheckpoint(tmp_path / 'out', 'index.xml', 'p1', classify_key, resume=resume)
+
+def counting_parser(calls):
+    def parse(file_path):
+        calls.append(file_path)
+        return parse_urls_from_sitemap(file_path)
+    return parse
+
+def test_resume_skips_parsed_children_sharing_a_file_name(tmp_path):
+    files = write_children(tmp_path, [('a', ['https://x.com/a']), ('b', ['https://x.com/b'])])
+    calls = []
+    checkpoint = open_checkpoint(tmp_path, resume=False)
+    first = [urls for _, urls in parse_with_checkpoint(checkpoint, counting_parser(calls), files)]
+    assert first == [['https://x.com/a'], ['https://x.com/b']]
+
+    calls.clear()
+    checkpoint = open_checkpoint(tmp_path, resume=True)
+    resumed = [urls for _, urls in parse_with_checkpoint(checkpoint, counting_parser(calls), files)]
+    assert resumed == first
+    assert calls == []
+
+def test_changed_content_is_parsed_again(tmp_path):
+    files = write_children(tmp_path, [('a', ['https://x.com/a'])])
+    open_checkpoint(tmp_path, resume=False).parse(files[0], parse_urls_from_sitemap)
+    files[0].write_bytes(urlset('https://x.com/changed'))
+    calls = []
+    checkpoint = open_checkpoint(tmp_path, resume=True)
+    assert checkpoint.parse(files[0], counting_parser(calls)) == ['https://x.com/changed']
+    assert calls == [files[0]]
+
+def test_torn_progress_line_is_ignored(tmp_path):
+    files = write_children(tmp_path, [('a', ['https://x.com/a']), ('b', ['https://x.com/b'])])
+    checkpoint = open_checkpoint(tmp_path, resume=False)
+    checkpoint.parse(files[0], parse_urls_from_sitemap)
+    checkpoint._progress.close()
+    with open(checkpoint.directory / 'progress.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"stage": "parsed", "dig')
+    checkpoint = open_checkpoint(tmp_path, resume=True)
+    checkpoint.parse(files[1], parse_urls_from_sitemap)
+    checkpoint.finish()
+    calls = []
+    checkpoint = open_checkpoint(tmp_path, resume=True)
+    for file_path in files:
+        checkpoint.parse(file_path, counting_parser(calls))
+    assert calls == []
+
+def test_classified_slices_are_reused_only_for_the_same_urls_and_patterns(tmp_path):
+    urls = ['https://x.com/wiki/User:A', 'https://x.com/wiki/Ahri', 'https://x.com/wiki/User:A']
+    slices = [('a.xml', 0, 2), ('b.xml', 2, 3)]
+    classifier = URLClassifier([r'/wiki/User:'], cache_dir=None)
+    kept, dropped, rule_ids = classify_with_checkpoint(open_checkpoint(tmp_path, resume=False), classifier, urls, slices)
+    assert kept == ['https://x.com/wiki/Ahri']
+    assert list(rule_ids) == [0, -1, 0]
+
+    checkpoint = open_checkpoint(tmp_path, resume=True)
+    assert list(checkpoint.load_classified(urls[:2])) == [0, -1]
+    assert checkpoint.load_classified(['https://x.com/other', urls[1]]) is None
+    assert open_checkpoint(tmp_path, resume=True, classify_key='c2').load_classified(urls[:2]) is None
+
+def test_final_filter_resume_with_colliding_children(page_server, tmp_path):
+    page_server.pages['/a/sitemap.xml'] = urlset('https://x.com/wiki/Page_a')
+    page_server.pages['/b/sitemap.xml'] = urlset('https://x.com/wiki/Page_b')
+    index = tmp_path / 'index.xml'
+    index.write_bytes(sitemapindex(page_server.url('/a/sitemap.xml'), page_server.url('/b/sitemap.xml')))
+    output_dir = tmp_path / 'out'
+    for flag in ('--checkpoint', '--resume'):
+        result = subprocess.run([sys.executable, 'final_filter.py', str(index), '-o', str(output_dir), '--workers', '2',
+                                 '--no-pattern-cache', '--explain', flag], cwd=REPO_ROOT, capture_output=True, text=True)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert (output_dir / 'all_urls.txt').read_text(encoding='utf-8').split() == [
+            'https://x.com/wiki/Page_a', 'https://x.com/wiki/Page_b']
+    assert 'Loaded 2 parsed sitemaps from the checkpoint' in result.stdout
@@ -0,0 +1,94 @@
+import pytest
+
+from final_filter import parse_urls_from_sitemap
+from sitemap_scanner import recover_sitemap_locs, scan_sitemap_lastmods, scan_sitemap_locs
+
+HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+def write_sitemap(tmp_path, body, header=HEADER, footer=b'</urlset>\n'):
+    path = tmp_path / 'sitemap.xml'
+    path.write_bytes(header + body + footer)
+    return path
+
+def test_scanner_matches_the_xml_parser_on_the_bundled_sitemaps(sitemap_dir):
+    for path in sorted(sitemap_dir.glob('sitemap-[0-9]*.xml')):
+        urls = scan_sitemap_locs(path)
+        assert urls == parse_urls_from_sitemap(path)
+        assert scan_sitemap_locs(path, as_bytes=True) == [url.encode('utf-8') for url in urls]
+
+def test_entities_and_non_ascii_are_decoded(tmp_path):
+    path = write_sitemap(tmp_path, '<url><loc>https://x.com/a?b=1&amp;c=&#39;d&#x27;</loc></url>'
+                                   '<url><loc>https://x.com/Kaï</loc><lastmod>2025-01-01</lastmod></url>'.encode())
+    assert scan_sitemap_locs(path) == ["https://x.com/a?b=1&c='d'", 'https://x.com/Kaï']
+    assert scan_sitemap_locs(path, as_bytes=True) == [b"https://x.com/a?b=1&c='d'", 'https://x.com/Kaï'.encode()]
+    assert scan_sitemap_lastmods(path) == [b'', b'2025-01-01']
+
+STRUCTURALLY_IRREGULAR = [
+    (b'<!-- comment --><url><loc>https://x.com/a</loc></url>', HEADER),
+    (b'<url><loc><![CDATA[https://x.com/a]]></loc></url>', HEADER),
+    (b'<url><loc>https://x.com/a</loc></url>', HEADER.replace(b'UTF-8', b'ISO-8859-1')),
+]
+
+@pytest.mark.parametrize('body, header', STRUCTURALLY_IRREGULAR + [
+    (b'<url><loc>https://x.com/a&nbsp;</loc></url>', HEADER),
+    (b'<url><loc>https://x.com/a &amp</loc></url>', HEADER),
+    (b'<url><loc>https://x.com/a</loc><loc>https://x.com/b</loc></url>', HEADER),
+    (b'<url><loc>https://x.com/\xe9</loc></url>', HEADER),
+])
+def test_irregular_documents_are_left_to_the_parser(tmp_path, body, header):
+    path = write_sitemap(tmp_path, body, header)
+    assert scan_sitemap_locs(path) is None
+    assert scan_sitemap_locs(path, as_bytes=True) is None
+
+@pytest.mark.parametrize('body, header', STRUCTURALLY_IRREGULAR + [
+    (b'<url><loc>a</loc><lastmod>1</lastmod><lastmod>2</lastmod></url>', HEADER),
+])
+def test_lastmods_of_irregular_documents_are_not_scanned(tmp_path, body, header):
+    assert scan_sitemap_lastmods(write_sitemap(tmp_path, body, header)) is None
+
+def test_carriage_returns_in_locs_are_left_to_the_parser(tmp_path):
+    path = write_sitemap(tmp_path, b'<url><loc>https://x.com/a\r\nb</loc></url>\r\n')
+    assert scan_sitemap_locs(path) is None
+    assert scan_sitemap_locs(path, as_bytes=True) is None
+    path = write_sitemap(tmp_path, b'<url>\r\n<loc>https://x.com/a</loc>\r\n</url>\r\n')
+    assert scan_sitemap_locs(path) == parse_urls_from_sitemap(path) == ['https://x.com/a']
+
+def test_trailing_garbage_and_empty_files_are_rejected(tmp_path):
+    assert scan_sitemap_locs(write_sitemap(tmp_path, b'<url><loc>a</loc></url>', footer=b'</urlset>x')) is None
+    empty = tmp_path / 'empty.xml'
+    empty.write_bytes(b'')
+    assert scan_sitemap_locs(empty) is None
+
+@pytest.mark.parametrize('chunk_size', [7, 64, 1 << 20])
+def test_recovery_matches_the_scanner_at_any_chunk_size(sitemap_dir, chunk_size):
+    path = sitemap_dir / 'sitemap-1.xml'
+    urls, skipped = recover_sitemap_locs(path, chunk_size=chunk_size)
+    assert urls == scan_sitemap_locs(path)
+    assert skipped == 0
+
+def test_recovery_salvages_malformed_documents(tmp_path):
+    body = (b'<url><loc>https://x.com/a</loc></url>'
+            b'<url><loc><![CDATA[https://x.com/b?c=1&d=2]]></loc></url>'
+            b'<url><loc>https://x.com/<b>broken</b></loc></url>'
+            b'<url><loc>https://x.com/\xff</loc></url>'
+            b'<url><loc>https://x.com/c&amp;d</loc></url>'
+            b'<url><loc>https://x.com/unterminated')
+    path = write_sitemap(tmp_path, body, footer=b'')
+    urls, skipped = recover_sitemap_locs(path, chunk_size=16)
+    assert urls == ['https://x.com/a', 'https://x.com/b?c=1&d=2', 'https://x.com/c&d']
+    assert skipped == (len(b'<loc>https://x.com/<b>broken</b></loc>') + len(b'<loc>https://x.com/\xff</loc>')
+                       + len(b'<loc>https://x.com/unterminated'))
+
+def test_recovery_bounds_oversized_locs(tmp_path):
+    long_loc = b'<loc>https://x.com/' + b'a' * 500
+    path = write_sitemap(tmp_path, b'<url>' + long_loc + b'<url><loc>https://x.com/b</loc></url>')
+    urls, skipped = recover_sitemap_locs(path, chunk_size=64, max_loc_size=128)
+    assert urls == ['https://x.com/b']
+    assert skipped > 0
+
+def test_recovery_can_drop_sitemap_index_locs(tmp_path):
+    path = tmp_path / 'mixed.xml'
+    path.write_bytes(b'<sitemapindex><sitemap><loc>https://x.com/child.xml</loc></sitemap>'
+                     b'<url><loc>https://x.com/page</loc></url></sitemapindex>')
+    assert recover_sitemap_locs(path)[0] == ['https://x.com/child.xml', 'https://x.com/page']
+    assert recover_sitemap_locs(path, include_sitemap_locs=False)[0] == ['https://x.com/page']
@@ -0,0 +1,81 @@
+import io
+
+from url_classifier import (
+    NO_RULE, URLClassifier, iter_rule_ids, read_rule_ids, read_rule_stats, write_rule_ids, write_rule_stats
+)
+
+BLACKLIST = [r'/wiki/User:', r'/wiki/.*\(TFT\)', r'/Gallery$']
+WHITELIST = [r'/wiki/Ahri', r'/LoL$']
+URLS = ['https://x.com/wiki/User:Foo', 'https://x.com/wiki/Ahri_(TFT)', 'https://x.com/wiki/Teemo_(TFT)',
+        'https://x.com/wiki/Teemo/LoL', 'https://x.com/wiki/Teemo/Gallery', 'https://x.com/wiki/Teemo',
+        'https://x.com/wiki/Kaï_(TFT)']
+
+def make_classifier():
+    return URLClassifier(BLACKLIST, WHITELIST, cache_dir=None)
+
+def test_whitelist_overrides_blacklist_and_rules_share_one_table():
+    classifier = make_classifier()
+    assert classifier.classify_batch(URLS) == [
+        (False, 2), (True, 0), (False, 3), (True, 1), (False, 4), (True, NO_RULE), (False, 3)]
+    assert classifier.rule(0) == ('whitelist', r'/wiki/Ahri')
+    assert classifier.rule(3) == ('blacklist', r'/wiki/.*\(TFT\)')
+    assert classifier.rule(NO_RULE) is None
+
+def test_split_preserves_order():
+    kept, dropped = make_classifier().split(URLS)
+    assert kept == [URLS[1], URLS[3], URLS[5]]
+    assert dropped == [URLS[0], URLS[2], URLS[4], URLS[6]]
+
+def test_classify_stream_skips_blank_lines_across_batches():
+    stream = io.StringIO('\n'.join(URLS[:3]) + '\n\n  \n' + URLS[3] + '\n')
+    results = list(make_classifier().classify_stream(stream, batch_size=2))
+    assert [(url, keep) for url, keep, _ in results] == [
+        (URLS[0], False), (URLS[1], True), (URLS[2], False), (URLS[3], True)]
+
+def test_split_explained_records_the_deciding_rule_per_url():
+    kept, dropped, rule_ids = make_classifier().split_explained(URLS)
+    assert (kept, dropped) == make_classifier().split(URLS)
+    assert list(rule_ids) == [2, 0, 3, 1, 4, NO_RULE, 3]
+
+def test_rule_id_sidecar_round_trip(tmp_path):
+    rule_ids = [2, 0, NO_RULE, 70000] * 5
+    write_rule_ids(tmp_path / 'rule_ids.i32', rule_ids)
+    assert (tmp_path / 'rule_ids.i32').stat().st_size == 4 * len(rule_ids)
+    assert list(read_rule_ids(tmp_path / 'rule_ids.i32')) == rule_ids
+    assert list(iter_rule_ids(tmp_path / 'rule_ids.i32', chunk_size=3)) == rule_ids
+
+def test_rules_table(tmp_path):
+    make_classifier().write_rules(tmp_path / 'rules.tsv')
+    lines = (tmp_path / 'rules.tsv').read_text(encoding='utf-8').splitlines()
+    assert lines[0] == '0\twhitelist\t/wiki/Ahri'
+    assert lines[-1] == '4\tblacklist\t/Gallery$'
+
+def test_reordering_by_hit_counts_keeps_every_decision():
+    classifier = make_classifier()
+    expected = classifier.classify_batch(URLS)
+    stats = classifier.rule_stats(classifier.split_explained(URLS)[2])
+    assert stats == {'whitelist': {r'/wiki/Ahri': 1, r'/LoL$': 1},
+                     'blacklist': {r'/wiki/User:': 1, r'/wiki/.*\(TFT\)': 2, r'/Gallery$': 1}}
+    classifier.reorder(stats)
+    assert classifier.blacklist.order[0] == 1
+    assert classifier.classify_batch(URLS) == expected
+    # Reversing the preference must not change decisions either
+    classifier.reorder({'blacklist': {r'/Gallery$': 100, r'/wiki/User:': 50}})
+    assert classifier.classify_batch(URLS) == expected
+    assert classifier.warm_up(URLS, sample_size=3)['blacklist']
+
+def test_rule_stats_files(tmp_path):
+    stats = {'whitelist': {'/LoL$': 3}, 'blacklist': {'/wiki/User:': 7}}
+    write_rule_stats(tmp_path / 'stats.json', stats)
+    assert read_rule_stats(tmp_path / 'stats.json') == stats
+    assert read_rule_stats(tmp_path / 'missing.json') is None
+    (tmp_path / 'old.json').write_text('{"version": 0}', encoding='utf-8')
+    assert read_rule_stats(tmp_path / 'old.json') is None
+
+def test_bytes_urls_get_the_same_decisions():
+    classifier = make_classifier()
+    encoded = [url.encode('utf-8') for url in URLS]
+    assert [classifier.classify_bytes(url) for url in encoded] == classifier.classify_batch(URLS)
+    kept, dropped, rule_ids = classifier.split_explained(encoded, as_bytes=True)
+    assert (kept, dropped) == tuple([url.encode('utf-8') for url in urls] for urls in classifier.split(URLS))
+    assert rule_ids == classifier.split_explained(URLS)[2]
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from regex_backends import read_benchmark_urls
+from url_fields import FieldRuleSet, parse_literal, parse_url_fields
+
+# One rule of each shape, in an order where earlier rules must win ties
+PATTERNS = [
+    r'/wiki/Ahri$',               # exact page
+    r'/wiki/User:',               # page prefix
+    r'\(TFT\)',                   # URL qualifier
+    r'/wiki/.*\(Universe\)',      # page qualifier
+    r'/wiki/.*Gallery',           # page contains
+    r"/wiki/[\w%']+/Trivia$",     # exact subpage
+    r"/wiki/[\w%']+/Skins",       # subpage prefix
+    r'Special:',                  # URL contains
+    r'_\(Season_\d+\)$',          # irregular regex
+    r'/wiki/ahri',                # prefix shadowed by the exact rule
+]
+URLS = [
+    'https://x.com/wiki/Ahri', 'https://x.com/wiki/AHRI', 'https://x.com/wiki/Ahri/LoL', 'https://x.com/wiki/user:Foo',
+    'https://x.com/wiki/Teemo_(TFT)', 'https://x.com/wiki/Ahri_(Universe)', 'https://x.com/wiki/Ahri/Gallery',
+    'https://x.com/wiki/Ahri/Trivia', 'https://x.com/wiki/Ahri/Trivia/More', 'https://x.com/wiki/Ahri/Skins/Old',
+    'https://x.com/Special:Random', 'https://x.com/wiki/Teemo_(Season_3)', 'https://x.com/wiki/Teemo',
+    'https://x.com/wiki/a/wiki/User:x', 'https://x.com/wiki/Kaï/Trivia', 'https://x.com/no-wiki/Ahri',
+    'https://x.com/wiki/Ahri\n', 'https://x.com/(TFT)/other',
+]
+
+def reference_first_match(patterns, url):
+    for rule_id, pattern in enumerate(patterns):
+        if re.search(pattern, url, re.IGNORECASE):
+            return rule_id
+    return -1
+
+def build(patterns):
+    return FieldRuleSet(patterns, [re.compile(pattern, re.IGNORECASE) for pattern in patterns])
+
+def test_rules_are_compiled_into_field_tables():
+    rules = build(PATTERNS)
+    assert rules.page_exact == {'ahri': 0}
+    assert rules.url_qualifiers == {'tft': 2}
+    assert rules.page_qualifiers == {'universe': 3}
+    assert rules.page_contains == [('gallery', 4)]
+    assert rules.url_contains == [('special:', 7)]
+    assert [rule_id for rule_id, _ in rules.irregular] == [8]
+    assert len(rules.subpages) == 1
+
+@pytest.mark.parametrize('url', URLS)
+def test_first_match_agrees_with_re(url):
+    assert build(PATTERNS).first_match(url) == reference_first_match(PATTERNS, url)
+
+def test_first_match_agrees_with_re_on_the_bundled_sitemaps(sitemap_dir):
+    from final_filter import DEFAULT_BLACKLIST
+    rules = build(DEFAULT_BLACKLIST)
+    for url in read_benchmark_urls([sitemap_dir / 'sitemap-2.xml']):
+        assert rules.first_match(url) == reference_first_match(DEFAULT_BLACKLIST, url), url
+
+@pytest.mark.parametrize('source, literal', [
+    (r'/wiki/User:', '/wiki/User:'), (r'\(TFT\)', '(TFT)'), (r'a\.b', 'a.b'),
+    (r'a.b', None), (r'\d', None), (r'x$', None), ('é', None), ('\\', None),
+])
+def test_parse_literal(source, literal):
+    assert parse_literal(source) == literal
+
+def test_parse_url_fields():
+    assert parse_url_fields('https://x.com/wiki/Ahri/Skins/Old') == (
+        'https://x.com/wiki/ahri/skins/old', 'ahri/skins/old', 'ahri', 'skins/old')
+    assert parse_url_fields('https://x.com/Special:Random').page is None
+    assert parse_url_fields('https://x.com/wiki/a/wiki/b') is None
+    assert parse_url_fields('https://x.com/wiki/Kaï') is None
@@ -0,0 +1,260 @@
+"""Reusable keep/drop classification of URLs against blacklist and whitelist patterns.
+
+Rules are numbered in one table: whitelist patterns first, then blacklist
+patterns. Every decision is a (keep, rule_id) pair, where rule_id is the
+first rule in table order that decided the URL, or NO_RULE when nothing
+matched and the URL is kept by default.
+
+Example:
+  python url_classifier.py --blacklist-file enhanced_blacklist.txt \\
+      --whitelist-file enhanced_whitelist.txt < candidate_urls.txt
+"""
+from array import array
+from collections import Counter
+from itertools import islice
+import argparse
+import json
+import sys
+
+from pattern_cache import DEFAULT_CACHE_DIR
+from regex_backends import BACKENDS, build_matcher
+from url_fields import parse_url_fields
+
+NO_RULE = -1
+BATCH_SIZE = 10000
+WARM_UP_SAMPLE = 10000
+RULE_STATS_VERSION = 1
+
+class URLClassifier:
+    """Classifies URLs as keep or drop, whitelist matches overriding the blacklist."""
+
+    def __init__(self, blacklist_patterns, whitelist_patterns=None, cache_dir=DEFAULT_CACHE_DIR,
+                 backend='re', sample_urls=None):
+        """backend names a regex_backends matcher for both lists ('auto' times them on sample_urls)."""
+        whitelist_patterns = list(whitelist_patterns or [])
+        blacklist_patterns = list(blacklist_patterns)
+        self.rules = [('whitelist', pattern) for pattern in whitelist_patterns]
+        self.rules += [('blacklist', pattern) for pattern in blacklist_patterns]
+        self.blacklist_offset = len(whitelist_patterns)
+        # With the default re backend most rules become field table lookups and the
+        # rest literal-prefiltered, case-folded regexes
+        self.whitelist = build_matcher(whitelist_patterns, backend, cache_dir, sample_urls)
+        self.blacklist = build_matcher(blacklist_patterns, backend, cache_dir, sample_urls)
+
+    @classmethod
+    def from_files(cls, blacklist_files=(), whitelist_files=(), use_default_blacklist=True,
+                   cache_dir=DEFAULT_CACHE_DIR, backend='re'):
+        """Build a classifier from the default patterns plus pattern files."""
+        from final_filter import DEFAULT_BLACKLIST, WHITELIST
+        blacklist_patterns = list(DEFAULT_BLACKLIST) if use_default_blacklist else []
+        for file_path in blacklist_files:
+            blacklist_patterns.extend(read_patterns(file_path))
+        whitelist_patterns = list(WHITELIST)
+        for file_path in whitelist_files:
+            whitelist_patterns.extend(read_patterns(file_path))
+        return cls(blacklist_patterns, whitelist_patterns, cache_dir, backend)
+
+    def rule(self, rule_id):
+        """Return the (list name, pattern) for a rule ID, or None for NO_RULE."""
+        return self.rules[rule_id] if rule_id != NO_RULE else None
+
+    def classify(self, url):
+        """Return (keep, rule_id) for a single URL."""
+        fields = parse_url_fields(url)
+        if fields is None:
+            rule_id = self.whitelist.regex_first_match(url)
+            if rule_id >= 0:
+                return True, rule_id
+            rule_id = self.blacklist.regex_first_match(url)
+        else:
+            rule_id = self.whitelist.first_match(url, fields)
+            if rule_id >= 0:
+                return True, rule_id
+            rule_id = self.blacklist.first_match(url, fields)
+        if rule_id >= 0:
+            return False, rule_id + self.blacklist_offset
+        return True, NO_RULE
+
+    def classify_bytes(self, url):
+        """Return (keep, rule_id) for a UTF-8 encoded URL.
+
+        The rules run on a transient decoded copy: str lookups and substring
+        tests are several times faster than their bytes counterparts, and
+        decoding an ASCII URL is a plain copy.
+        """
+        return self.classify(url.decode('utf-8'))
+
+    def classify_batch(self, urls):
+        """Return a list of (keep, rule_id) decisions, one per URL."""
+        classify = self.classify
+        return [classify(url) for url in urls]
+
+    def classify_iter(self, urls, batch_size=BATCH_SIZE):
+        """Classify any iterable of URLs lazily, yielding (url, keep, rule_id)."""
+        urls = iter(urls)
+        while True:
+            batch = list(islice(urls, batch_size))
+            if not batch:
+                break
+            for url, (keep, rule_id) in zip(batch, self.classify_batch(batch)):
+                yield url, keep, rule_id
+
+    def classify_stream(self, stream, batch_size=BATCH_SIZE):
+        """Classify a newline-delimited text stream, skipping blank lines."""
+        urls = (line.strip() for line in stream)
+        return self.classify_iter((url for url in urls if url), batch_size)
+
+    def split(self, urls, as_bytes=False):
+        """Split URLs into (kept, dropped) lists, preserving their order.
+
+        With as_bytes the URLs are UTF-8 bytes (see classify_bytes).
+        """
+        kept = []
+        dropped = []
+        classify = self.classify_bytes if as_bytes else self.classify
+        for url in urls:
+            if classify(url)[0]:
+                kept.append(url)
+            else:
+                dropped.append(url)
+        return kept, dropped
+
+    def split_explained(self, urls, as_bytes=False):
+        """Like split, but also return an int32 array of the deciding rule ID per input URL."""
+        kept = []
+        dropped = []
+        rule_ids = array('i')
+        classify = self.classify_bytes if as_bytes else self.classify
+        for url in urls:
+            keep, rule_id = classify(url)
+            rule_ids.append(rule_id)
+            if keep:
+                kept.append(url)
+            else:
+                dropped.append(url)
+        return kept, dropped, rule_ids
+
+    def rule_stats(self, rule_ids):
+        """Count the URLs each rule decided, as {list name: {pattern: count}}.
+
+        rule_ids are the deciding rule IDs returned by split_explained.
+        Patterns rather than rule IDs are stored, so the counts still apply
+        after the pattern files are edited.
+        """
+        stats = {'whitelist': {}, 'blacklist': {}}
+        for rule_id, count in Counter(rule_ids).items():
+            if rule_id != NO_RULE:
+                list_name, pattern = self.rules[rule_id]
+                stats[list_name][pattern] = stats[list_name].get(pattern, 0) + count
+        return stats
+
+    def reorder(self, stats):
+        """Evaluate the rules of each list most-hit first, using rule_stats output.
+
+        Whitelist rules still run before blacklist rules, and decisions and
+        rule IDs are unchanged; only the work to reach them is.
+        """
+        for list_name, rule_set in (('whitelist', self.whitelist), ('blacklist', self.blacklist)):
+            hits = stats.get(list_name, {})
+            rule_set.reorder([hits.get(pattern, 0) for pattern in rule_set.patterns])
+
+    def warm_up(self, urls, sample_size=WARM_UP_SAMPLE, as_bytes=False):
+        """Reorder the rules by their hits on an evenly spaced sample of urls; return the stats."""
+        step = max(1, len(urls) // sample_size)
+        _, _, rule_ids = self.split_explained(urls[::step][:sample_size], as_bytes)
+        stats = self.rule_stats(rule_ids)
+        self.reorder(stats)
+        return stats
+
+    def write_rules(self, file_path):
+        """Write the rule ID table as tab-separated rule ID, list name and pattern."""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for rule_id, (list_name, pattern) in enumerate(self.rules):
+                f.write(f"{rule_id}\t{list_name}\t{pattern}\n")
+
+def write_rule_ids(file_path, rule_ids):
+    """Write rule IDs as little-endian int32 values, one per URL."""
+    rule_ids = array('i', rule_ids)
+    if sys.byteorder == 'big':
+        rule_ids.byteswap()
+    with open(file_path, 'wb') as f:
+        rule_ids.tofile(f)
+
+def read_rule_ids(file_path):
+    """Read a rule ID sidecar written by write_rule_ids."""
+    rule_ids = array('i')
+    with open(file_path, 'rb') as f:
+        rule_ids.frombytes(f.read())
+    if sys.byteorder == 'big':
+        rule_ids.byteswap()
+    return rule_ids
+
+def iter_rule_ids(file_path, chunk_size=1 << 16):
+    """Yield the rule IDs of a sidecar file in order, reading it in chunks."""
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size * 4)
+            if not data:
+                break
+            rule_ids = array('i')
+            rule_ids.frombytes(data)
+            if sys.byteorder == 'big':
+                rule_ids.byteswap()
+            yield from rule_ids
+
+def write_rule_stats(file_path, stats):
+    """Save rule_stats output as JSON for reorder in a later run."""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': RULE_STATS_VERSION, **stats}, f, indent=2)
+
+def read_rule_stats(file_path):
+    """Load statistics saved by write_rule_stats, or return None if missing or unusable."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stats.get('version') != RULE_STATS_VERSION:
+        return None
+    return {list_name: stats.get(list_name, {}) for list_name in ('whitelist', 'blacklist')}
+
+def read_patterns(file_path):
+    """Read patterns from a file, skipping blank lines and comments."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify newline-delimited URLs from stdin as keep or drop.')
+    parser.add_argument('--blacklist-file', action='append', default=[],
+                        help='Additional blacklist pattern file (can be repeated)')
+    parser.add_argument('--whitelist-file', action='append', default=[],
+                        help='Additional whitelist pattern file (can be repeated)')
+    parser.add_argument('--no-default-blacklist', action='store_true',
+                        help='Do not use the default blacklist patterns')
+    parser.add_argument('--kept-only', action='store_true',
+                        help='Only print the URLs that are kept, one per line')
+    parser.add_argument('--rules', action='store_true',
+                        help='Print the rule ID table and exit')
+    parser.add_argument('--backend', choices=BACKENDS, default='re',
+                        help='Matching backend (see regex_backends.py)')
+    args = parser.parse_args()
+
+    classifier = URLClassifier.from_files(args.blacklist_file, args.whitelist_file,
+                                          use_default_blacklist=not args.no_default_blacklist,
+                                          backend=args.backend)
+    out = sys.stdout
+    if args.rules:
+        for rule_id, (list_name, pattern) in enumerate(classifier.rules):
+            out.write(f"{rule_id}\t{list_name}\t{pattern}\n")
+        return
+
+    # Output lines: keep|drop <TAB> rule ID <TAB> URL
+    for url, keep, rule_id in classifier.classify_stream(sys.stdin):
+        if args.kept_only:
+            if keep:
+                out.write(url + '\n')
+        else:
+            out.write(f"{'keep' if keep else 'drop'}\t{rule_id}\t{url}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Field-dispatched evaluation of wiki URL patterns.
+
+Nearly every rule targets one part of a wiki URL: the page after /wiki/
+(an exact title, a title or namespace prefix, a subpage of any page) or a
+parenthesized title qualifier such as (TFT). Rules of those shapes are
+compiled into hash tables and a URL is split into its fields once, so
+most decisions are dictionary lookups. Everything else stays a regex and
+is run against the full URL, once its required literals are present.
+
+Lookups give exactly the result of re.search(pattern, url, re.IGNORECASE)
+for ASCII URLs with a single /wiki/; other URLs go through the regexes.
+The remaining regexes run in case-folded form on the lowered URL when
+they have one.
+"""
+from collections import namedtuple
+import re
+
+from case_fold import fold_url
+from literal_prefilter import PrefilteredPattern, PrefilterIndex
+from pattern_cache import freeze_pattern, thaw_pattern
+
+WIKI_PREFIX = '/wiki/'
+_META = set('.^$*+?{}[]|()\\')
+_QUALIFIER = re.compile(r'\(([^()]*)\)')
+_SUBPAGE_RULE = re.compile(r"^/wiki/(\[[^\]]*\])\+/(.*?)(\$?)$", re.DOTALL)
+
+URLFields = namedtuple('URLFields', 'lower page base subpage')
+
+def parse_literal(source):
+    """Return the text a regex matches if it is a plain ASCII literal, else None."""
+    chars = []
+    escaped = False
+    for c in source:
+        if not c.isascii():
+            return None
+        if escaped:
+            if c.isalnum() or c == '_':
+                # \w, \d, \1 and friends are not literals
+                return None
+            chars.append(c)
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c in _META:
+            return None
+        else:
+            chars.append(c)
+    if escaped:
+        return None
+    return ''.join(chars)
+
+def parse_url_fields(url):
+    """Split a URL into case-folded fields, or return None if lookups would be inexact.
+
+    page is everything after /wiki/ (None without it), base its first
+    segment and subpage the rest after the first slash (None for
+    top-level pages).
+    """
+    if not url.isascii() or '\n' in url:
+        return None
+    lower = url.lower()
+    start = lower.find(WIKI_PREFIX)
+    if start < 0:
+        return URLFields(lower, None, None, None)
+    if lower.find(WIKI_PREFIX, start + 1) >= 0:
+        return None
+    page = lower[start + len(WIKI_PREFIX):]
+    slash = page.find('/')
+    if slash < 0:
+        return URLFields(lower, page, page, None)
+    return URLFields(lower, page, page[:slash], page[slash + 1:])
+
+def _add_prefix(tables, prefix, rule_id):
+    tables.setdefault(len(prefix), {}).setdefault(prefix, rule_id)
+
+def _prefix_lookup(tables, text, best):
+    for length, table in tables:
+        rule_id = table.get(text[:length])
+        if rule_id is not None and rule_id < best:
+            best = rule_id
+    return best
+
+def _qualifier_lookup(table, text, best):
+    for qualifier in _QUALIFIER.findall(text):
+        rule_id = table.get(qualifier)
+        if rule_id is not None and rule_id < best:
+            best = rule_id
+    return best
+
+class FieldRuleSet:
+    """An ordered list of patterns, evaluated through field tables where possible.
+
+    first_match returns the index of the first pattern that matches a URL,
+    like scanning the compiled patterns in order.
+    """
+
+    def __init__(self, patterns, compiled, folded=None):
+        # folded: case-folded versions of compiled (None entries where unavailable)
+        self.patterns = list(patterns)
+        self.compiled = compiled
+        if folded is None:
+            folded = [None] * len(compiled)
+        self.folded = folded
+        self.page_exact = {}
+        page_prefixes = {}
+        self.page_contains = []
+        self.page_qualifiers = {}
+        self.url_contains = []
+        self.url_qualifiers = {}
+        subpages = {}
+        self.irregular = []
+
+        for rule_id, (pattern, regex, folded_regex) in enumerate(zip(patterns, compiled, folded)):
+            literal = parse_literal(pattern)
+            exact = parse_literal(pattern[:-1]) if pattern.endswith('$') else None
+            page_contains = (parse_literal(pattern[len('/wiki/.*'):])
+                             if pattern.startswith('/wiki/.*') else None)
+            subpage = _SUBPAGE_RULE.match(pattern)
+            if literal is not None and literal.lower().startswith(WIKI_PREFIX):
+                _add_prefix(page_prefixes, literal.lower()[len(WIKI_PREFIX):], rule_id)
+            elif literal is not None and _QUALIFIER.fullmatch(literal):
+                self.url_qualifiers.setdefault(literal.lower()[1:-1], rule_id)
+            elif literal is not None:
+                self.url_contains.append((literal.lower(), rule_id))
+            elif exact is not None and exact.lower().startswith(WIKI_PREFIX):
+                self.page_exact.setdefault(exact.lower()[len(WIKI_PREFIX):], rule_id)
+            elif page_contains is not None and _QUALIFIER.fullmatch(page_contains):
+                self.page_qualifiers.setdefault(page_contains.lower()[1:-1], rule_id)
+            elif page_contains is not None:
+                self.page_contains.append((page_contains.lower(), rule_id))
+            elif subpage and self._subpage_literal(subpage) is not None:
+                char_class, text, anchored = subpage.groups()
+                tables = subpages.setdefault(char_class, ({}, {}))
+                text = self._subpage_literal(subpage).lower()
+                if anchored:
+                    tables[0].setdefault(text, rule_id)
+                else:
+                    _add_prefix(tables[1], text, rule_id)
+            else:
+                self.irregular.append((rule_id, PrefilteredPattern(regex, pattern, folded_regex)))
+
+        self.page_prefixes = sorted(page_prefixes.items())
+        # Base segments are already lowered, so the classes match case-sensitively when foldable
+        self.subpages = [(self._base_class(char_class), exact, sorted(prefixes.items()))
+                         for char_class, (exact, prefixes) in subpages.items()]
+        # Irregular rules only run when their key literals occur in the URL
+        self.irregular_index = PrefilterIndex(self.irregular)
+        self._set_order(range(len(compiled)))
+
+    @staticmethod
+    def _subpage_literal(match):
+        char_class, text, _ = match.groups()
+        literal = parse_literal(text)
+        try:
+            base = re.compile(char_class)
+        except re.error:
+            return None
+        # The base segment must stop at the first slash
+        if literal is None or base.fullmatch('/') or base.fullmatch('\n'):
+            return None
+        return literal
+
+    @staticmethod
+    def _base_class(char_class):
+        folded = thaw_pattern(freeze_pattern(char_class + '+', re.IGNORECASE, fold=True), fold=True)
+        return folded or re.compile(char_class + '+', re.IGNORECASE)
+
+    def reorder(self, hits):
+        """Run the regexes of frequently hitting rules first.
+
+        hits gives a count per rule ID. Rules are tried by descending count,
+        then shortest pattern first. Only the evaluation order changes: once
+        a rule matches, just the rules before it are still tried, so the
+        first matching rule in list order is returned as before.
+        """
+        self._set_order(sorted(range(len(self.compiled)),
+                               key=lambda rule_id: (-hits[rule_id], len(self.patterns[rule_id]), rule_id)))
+        ranks = {rule_id: rank for rank, rule_id in enumerate(self.order)}
+        self.irregular_index = PrefilterIndex(self.irregular, ranks)
+
+    def _set_order(self, order):
+        self.order = list(order)
+        # Each entry carries the lowest rule ID from its position on, to stop once a match can't improve
+        self._regex_order = []
+        rest_min = len(self.order)
+        for rule_id in reversed(self.order):
+            rest_min = min(rest_min, rule_id)
+            self._regex_order.append((rule_id, self.compiled[rule_id], self.folded[rule_id], rest_min))
+        self._regex_order.reverse()
+
+    def regex_first_match(self, url):
+        """Index of the first pattern matching url, by running every regex."""
+        lower = fold_url(url)
+        best = -1
+        for rule_id, regex, folded, rest_min in self._regex_order:
+            if best >= 0:
+                if best < rest_min:
+                    break
+                if rule_id > best:
+                    continue
+            if folded is not None and lower is not None:
+                hit = folded.search(lower)
+            else:
+                hit = regex.search(url)
+            if hit:
+                best = rule_id
+        return best
+
+    def first_match(self, url, fields=None):
+        """Index of the first pattern matching url, or -1."""
+        if fields is None:
+            fields = parse_url_fields(url)
+            if fields is None:
+                return self.regex_first_match(url)
+        best = len(self.compiled)
+
+        page = fields.page
+        if page is not None:
+            rule_id = self.page_exact.get(page)
+            if rule_id is not None:
+                best = rule_id
+            best = _prefix_lookup(self.page_prefixes, page, best)
+            if fields.subpage is not None:
+                for base_class, exact, prefixes in self.subpages:
+                    if base_class.fullmatch(fields.base):
+                        rule_id = exact.get(fields.subpage)
+                        if rule_id is not None and rule_id < best:
+                            best = rule_id
+                        best = _prefix_lookup(prefixes, fields.subpage, best)
+            if self.page_qualifiers and '(' in page:
+                best = _qualifier_lookup(self.page_qualifiers, page, best)
+            for text, rule_id in self.page_contains:
+                if rule_id < best and text in page:
+                    best = rule_id
+
+        lower = fields.lower
+        if self.url_qualifiers and '(' in lower:
+            best = _qualifier_lookup(self.url_qualifiers, lower, best)
+        for text, rule_id in self.url_contains:
+            if rule_id < best and text in lower:
+                best = rule_id
+
+        if self.irregular:
+            for rule_id, pattern in self.irregular_index.candidates(lower):
+                if rule_id < best and pattern.search(url, lower):
+                    best = rule_id
+
+        return best if best < len(self.compiled) else -1